@@ -1,20 +1,21 @@
 from datetime import datetime, timedelta
 
-from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr, model_validator
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
-from typing import Optional, List, Dict, Any
+from typing import Any, ClassVar, Dict, List, Optional, Union
 import uvicorn
 import time
 import json
 import logging
 import os
+from collections import Counter
 import numpy as np
 from dotenv import load_dotenv
 
@@ -29,13 +30,29 @@ except ImportError:
 
 # mia_models — all analytics capabilities
 from mia_models import (
+    alert_engine,
+    ColumnarFrame,
+    ColumnarSeries,
     pattern_recognizer,
     predictive_alerts,
     nlp_processor,
+    query_executor,
+    QueryError,
     smart_categorizer,
     report_generator,
+    streaming_anomaly_detector,
+    StreamingTableAnalyzer,
 )
 
+from runtime import (
+    DatasetNotFound,
+    WorkerPoolSaturated,
+    dataset_registry,
+    result_cache,
+    worker_pools,
+)
+from runtime import jobs
+
 # ─── Logging ────────────────────────────────────────────────────────────
 
 logging.basicConfig(
@@ -152,6 +169,78 @@ async def _log_requests(request: Request, call_next):
     )
     return response
 
+@app.on_event("shutdown")
+def _shutdown_workers():
+    worker_pools.shutdown()
+
+
+async def _offload(request: Request, fn, *args, kind: str = "thread", **kwargs):
+    """
+    Run CPU-bound work on the worker pools instead of the event loop.
+
+    kind="thread" for NumPy-heavy work, kind="process" for Python-heavy work
+    (fn must then be picklable — see runtime/jobs.py). A full queue → 503.
+    """
+    try:
+        return await worker_pools.run(
+            request.url.path, fn, *args, kind=kind, **kwargs)
+    except WorkerPoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy: {e}",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _cache_bypassed(request: Request) -> bool:
+    """`X-Cache-Bypass: 1` or `Cache-Control: no-cache` skips the cache lookup."""
+    if request.headers.get("x-cache-bypass", "").lower() in ("1", "true", "yes"):
+        return True
+    cache_control = request.headers.get("cache-control", "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+
+def _cache_lookup(endpoint: str, payload: Dict[str, Any], bypass: bool):
+    key = result_cache.make_key(endpoint, payload)
+    if bypass:
+        return key, False, None
+    hit, value = result_cache.get(key)
+    return key, hit, value
+
+
+async def _cached_offload(request: Request, response: Response, body: BaseModel,
+                          fn, *args, kind: str = "thread", **kwargs):
+    """
+    `_offload` behind the content-addressed result cache.
+
+    Key = sha256(endpoint, canonical JSON body); hashing runs off the event
+    loop too. Bypassed requests recompute and refresh the entry. The outcome
+    is reported in the `X-Cache` header (HIT / MISS / BYPASS). Cached values
+    are shared between requests — callers must not mutate them.
+    """
+    bypass = _cache_bypassed(request)
+    try:
+        key, hit, value = await worker_pools.run(
+            "result_cache", _cache_lookup,
+            request.url.path, body.model_dump(), bypass)
+    except WorkerPoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy: {e}",
+            headers={"Retry-After": "1"},
+        )
+    if hit:
+        response.headers["X-Cache"] = "HIT"
+        return value
+
+    value = await _offload(request, fn, *args, kind=kind, **kwargs)
+    if result_cache.disk_dir:
+        await worker_pools.run("result_cache", result_cache.set, key, value)
+    else:
+        result_cache.set(key, value)
+    response.headers["X-Cache"] = "BYPASS" if bypass else "MISS"
+    return value
+
 # ─── Pydantic Models ────────────────────────────────────────────────────
 
 
@@ -166,19 +255,105 @@ class OptimizationRequest(BaseModel):
     coefficients: Optional[List[float]] = None
 
 
-class DataAnalysisRequest(BaseModel):
-    data: List[Dict[str, Any]]
+class TabularPayload(BaseModel):
+    """
+    Table input in one of three shapes:
+    - data: [{"col": value, ...}, ...] (row objects)
+    - header + column_values: ["date", "revenue"], [[...dates], [...revenues]]
+    - sheet_values: Google Sheets values grid, first row = header
+    - dataset_id: a table stored earlier with POST /ai/datasets
+
+    The columnar shapes decode straight into NumPy arrays (ColumnarFrame)
+    without building or validating per-row dicts; stored datasets are
+    memory-mapped and only the columns an analysis uses are read.
+    """
+    data: Optional[List[Dict[str, Any]]] = None
+    header: Optional[List[str]] = None
+    column_values: Optional[List[List[Any]]] = None
+    sheet_values: Optional[List[List[Any]]] = None
+    dataset_id: Optional[str] = None
+
+    _table_required: ClassVar[bool] = True
+    _frame: Optional[ColumnarFrame] = PrivateAttr(default=None)
+
+    @model_validator(mode="after")
+    def _check_table(self):
+        if (self.header is None) != (self.column_values is None):
+            raise ValueError("'header' and 'column_values' must be sent together")
+        if self.header is not None and len(self.header) != len(self.column_values):
+            raise ValueError("'header' and 'column_values' must have the same length")
+        if self._table_required and not self.has_table():
+            raise ValueError(
+                "Provide 'data', 'header' + 'column_values', 'sheet_values' or 'dataset_id'")
+        return self
+
+    def has_table(self) -> bool:
+        return (self.data is not None or self.column_values is not None
+                or self.sheet_values is not None or self.dataset_id is not None)
+
+    def table(self) -> Union[List[Dict[str, Any]], ColumnarFrame]:
+        """Rows as sent, or the decoded ColumnarFrame for columnar payloads."""
+        if self.data is not None:
+            return self.data
+        if self._frame is None:
+            if self.dataset_id is not None:
+                try:
+                    self._frame = dataset_registry.load(self.dataset_id)
+                except DatasetNotFound:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Dataset '{self.dataset_id}' not found")
+            elif self.column_values is not None:
+                self._frame = ColumnarFrame.from_columns(self.header, self.column_values)
+            else:
+                self._frame = ColumnarFrame.from_grid(self.sheet_values or [])
+        return self._frame
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Row dicts, for models that still iterate rows."""
+        table = self.table()
+        return table.to_rows() if isinstance(table, ColumnarFrame) else table
+
+
+class DataAnalysisRequest(TabularPayload):
     value_column: str
     date_column: Optional[str] = None
 
 
-class CorrelationRequest(BaseModel):
-    data: List[Dict[str, Any]]
+class CycleAnalysisRequest(DataAnalysisRequest):
+    top_k: int = 3
+    min_confidence: float = 0.3
+    max_period: Optional[int] = None
+
+
+class AnomalyStreamRequest(BaseModel):
+    metric: str
+    values: List[Optional[float]]
+    timestamps: Optional[List[Any]] = None
+    window: int = 60
+    threshold: float = 3.5
+    min_points: int = 8
+
+
+class BatchAnalysisRequest(TabularPayload):
+    """Many series in one call: either `series` or a table + `value_columns`."""
+    _table_required: ClassVar[bool] = False
+
+    series: Optional[Dict[str, List[Optional[float]]]] = None
+    value_columns: Optional[List[str]] = None
+    date_column: Optional[str] = None
+    analyses: List[str] = ["trends", "anomalies", "cycles"]
+    top_k: int = 3
+    min_confidence: float = 0.3
+
+
+class CorrelationRequest(TabularPayload):
     columns: List[str]
+    top_n: Optional[int] = None  # chỉ trả N cặp mạnh nhất
+    min_periods: int = 3
 
 
-class PredictionRequest(BaseModel):
-    data: List[Dict[str, Any]]
+class PredictionRequest(TabularPayload):
     value_column: str
     horizon: int = 5
 
@@ -186,41 +361,84 @@ class PredictionRequest(BaseModel):
 class ChatRequest(BaseModel):
     query: str
     context: Optional[Dict[str, Any]] = None
+    latency_budget: Optional[float] = None  # giây, chỉ rút ngắn được AI_CLAUDE_LATENCY_BUDGET
 
 
-class SearchRequest(BaseModel):
+class ChatBatchRequest(BaseModel):
+    queries: List[str]
+    context: Optional[Dict[str, Any]] = None
+    latency_budget: Optional[float] = None
+
+
+class QueryRequest(TabularPayload):
+    """query (natural language, parsed like /ai/chat) or a ready query_structure"""
+    query: Optional[str] = None
+    query_structure: Optional[Dict[str, Any]] = None
+    context: Optional[Dict[str, Any]] = None
+
+
+class SearchRequest(TabularPayload):
     query: str
-    data: List[Dict[str, Any]]
     columns: Optional[List[str]] = None
+    top_k: int = 50
+    mode: str = "keyword"  # "keyword" (BM25) | "vector" (char n-gram TF-IDF)
 
 
-class SummaryRequest(BaseModel):
-    data: List[Dict[str, Any]]
+class SummaryRequest(TabularPayload):
     max_length: int = 200
 
 
-class AlertRequest(BaseModel):
-    data: List[Dict[str, Any]]
+class AlertRequest(TabularPayload):
     value_column: str
     metric_name: Optional[str] = None
     threshold: Optional[float] = None
 
 
-class ReportRequest(BaseModel):
-    data: List[Dict[str, Any]]
+class AlertBatchRequest(TabularPayload):
+    value_columns: List[str]
+    metric_names: Optional[Dict[str, str]] = None  # column → tên hiển thị
+    thresholds: Optional[Dict[str, float]] = None  # column → ngưỡng
+
+
+class AlertStreamRequest(BaseModel):
+    metric: str
+    values: List[Optional[float]]
+    timestamps: Optional[List[Any]] = None
+    metric_name: Optional[str] = None  # tên hiển thị trong message
+    threshold: Optional[float] = None
+    direction: Optional[str] = None  # "above" | "below"
+    cooldown_seconds: Optional[float] = None  # mặc định AI_ALERT_COOLDOWN
+    window: int = 60
+    z_threshold: float = 3.5
+    min_points: int = 8
+
+
+class ReportRequest(TabularPayload):
     value_column: str
     date_column: Optional[str] = None
     title: Optional[str] = None
 
 
-class CategorizationRequest(BaseModel):
-    data: List[Dict[str, Any]]
+class CategorizationRequest(TabularPayload):
     category_rules: Optional[Dict[str, Any]] = None
+    output: str = "rows"  # "rows" (row copies + _categories) | "columns" (parallel arrays)
+
+
+class ColumnProfileRequest(TabularPayload):
+    columns: Optional[List[str]] = None
+    sample_size: Optional[int] = None  # mặc định AI_PROFILE_SAMPLE_SIZE
+
+
+class DatasetUploadRequest(TabularPayload):
+    name: Optional[str] = None
 
 
 class SLACheckRequest(BaseModel):
-    orders: List[Dict[str, Any]]
+    orders: Optional[List[Dict[str, Any]]] = None
     platform: str
+    # Hoặc: orders đã upload qua /ai/datasets, lọc theo cột platform
+    dataset_id: Optional[str] = None
+    platform_column: str = "platform"
     current_time: Optional[str] = None  # "HH:MM", defaults to now
 
 
@@ -271,19 +489,136 @@ async def health_check():
     }
 
 
+@app.get("/ai/runtime/metrics")
+async def runtime_metrics(_: Dict = Depends(_auth)):
+    """Worker pool queue depth, per-endpoint queue-wait / run times, cache stats."""
+    return {
+        **worker_pools.metrics(),
+        "result_cache": result_cache.stats(),
+        "claude_cache": nlp_processor.claude_stats(),
+        "timestamp": time.time(),
+    }
+
+
+@app.delete("/ai/runtime/cache")
+async def clear_result_cache(_: Dict = Depends(_auth)):
+    """Drop every cached analytics / report result (memory and disk tier)."""
+    await worker_pools.run("result_cache", result_cache.clear)
+    return {"cleared": True, "timestamp": time.time()}
+
+
+# ─── Datasets ───────────────────────────────────────────────────────────
+
+
+@app.post("/ai/datasets")
+@limiter.limit("30/minute")
+async def upload_dataset(
+    body: DatasetUploadRequest,
+    request: Request,
+    _: Dict = Depends(_auth),
+):
+    """
+    Store a table server-side and return its id.
+
+    Send it once (rows, header + column_values or sheet_values), then pass
+    `dataset_id` to /ai/analyze/*, /ai/predictions, /ai/alerts, /ai/reports/*
+    or /ai/sla/check instead of re-sending the rows. The id is a content hash:
+    uploading the same table again returns the same id.
+    """
+    if body.dataset_id is not None:
+        raise HTTPException(status_code=400,
+                            detail="Send the table itself, not a 'dataset_id'")
+    try:
+        meta = await _offload(request, dataset_registry.put, body.table(), body.name)
+        return {**meta, "timestamp": time.time()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/ai/datasets")
+async def list_datasets(_: Dict = Depends(_auth)):
+    return {
+        "datasets": dataset_registry.list(),
+        "registry": dataset_registry.stats(),
+        "timestamp": time.time(),
+    }
+
+
+@app.get("/ai/datasets/{dataset_id}")
+async def get_dataset(dataset_id: str, _: Dict = Depends(_auth)):
+    try:
+        return dataset_registry.describe(dataset_id)
+    except DatasetNotFound:
+        raise HTTPException(status_code=404,
+                            detail=f"Dataset '{dataset_id}' not found")
+
+
+@app.delete("/ai/datasets/{dataset_id}")
+async def delete_dataset(dataset_id: str, _: Dict = Depends(_auth)):
+    try:
+        deleted = dataset_registry.delete(dataset_id)
+    except DatasetNotFound:
+        deleted = False
+    if not deleted:
+        raise HTTPException(status_code=404,
+                            detail=f"Dataset '{dataset_id}' not found")
+    return {"dataset_id": dataset_id, "deleted": True}
+
+
 # ─── Pattern Analysis ───────────────────────────────────────────────────
 
+
+def _assess_anomalies(anomalies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Risk level + recommendations for a list of detected anomalies."""
+    if any(
+        a.get("severity") == "high" and a.get(
+            "z_score",
+            0) > 3 for a in anomalies):
+        risk_level = "critical"
+    elif any(a.get("severity") == "high" for a in anomalies):
+        risk_level = "high"
+    elif any(a.get("severity") == "medium" for a in anomalies):
+        risk_level = "medium"
+    else:
+        risk_level = "low"
+
+    recommendations = []
+    if anomalies:
+        spikes = [a for a in anomalies if a.get("type") == "spike"]
+        drops = [a for a in anomalies if a.get("type") == "drop"]
+        if spikes:
+            recommendations.append(
+                f"Investigate {len(spikes)} spike(s)"
+                " — may indicate exceptional events"
+            )
+        if drops:
+            recommendations.append(
+                f"Review {len(drops)} drop(s)"
+                " — may indicate data issues or failures"
+            )
+    else:
+        recommendations.append("System is running optimally")
+
+    return {"risk_level": risk_level, "recommendations": recommendations}
+
+
 @app.post("/ai/analyze/trends")
 @limiter.limit("60/minute")
 async def analyze_trends(
     body: DataAnalysisRequest,
     request: Request,
+    response: Response,
     _: Dict = Depends(_auth),
 ):
     try:
-        result = pattern_recognizer.recognize_trends(
-            body.data, body.value_column)
+        result = await _cached_offload(
+            request, response, body, pattern_recognizer.recognize_trends,
+            body.table(), body.value_column)
         return {"trend_analysis": result, "timestamp": time.time()}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -293,48 +628,21 @@ async def analyze_trends(
 async def analyze_anomalies(
     body: DataAnalysisRequest,
     request: Request,
+    response: Response,
     _: Dict = Depends(_auth),
 ):
     try:
-        anomalies = pattern_recognizer.detect_anomalies(
-            body.data, body.value_column)
-
-        if any(
-            a.get("severity") == "high" and a.get(
-                "z_score",
-                0) > 3 for a in anomalies):
-            risk_level = "critical"
-        elif any(a.get("severity") == "high" for a in anomalies):
-            risk_level = "high"
-        elif any(a.get("severity") == "medium" for a in anomalies):
-            risk_level = "medium"
-        else:
-            risk_level = "low"
-
-        recommendations = []
-        if anomalies:
-            spikes = [a for a in anomalies if a.get("type") == "spike"]
-            drops = [a for a in anomalies if a.get("type") == "drop"]
-            if spikes:
-                recommendations.append(
-                    f"Investigate {len(spikes)} spike(s)"
-                    " — may indicate exceptional events"
-                )
-            if drops:
-                recommendations.append(
-                    f"Review {len(drops)} drop(s)"
-                    " — may indicate data issues or failures"
-                )
-        else:
-            recommendations.append("System is running optimally")
-
+        anomalies = await _cached_offload(
+            request, response, body, pattern_recognizer.detect_anomalies,
+            body.table(), body.value_column)
         return {
             "anomalies": anomalies,
-            "risk_level": risk_level,
+            **_assess_anomalies(anomalies),
             "count": len(anomalies),
-            "recommendations": recommendations,
             "timestamp": time.time(),
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -342,14 +650,23 @@ async def analyze_anomalies(
 @app.post("/ai/analyze/cycles")
 @limiter.limit("60/minute")
 async def analyze_cycles(
-    body: DataAnalysisRequest,
+    body: CycleAnalysisRequest,
     request: Request,
+    response: Response,
     _: Dict = Depends(_auth),
 ):
     try:
-        result = pattern_recognizer.detect_cycles(
-            body.data, body.value_column, body.date_column)
+        result = await _cached_offload(
+            request, response, body, pattern_recognizer.detect_cycles,
+            body.table(),
+            body.value_column,
+            body.date_column,
+            top_k=body.top_k,
+            min_confidence=body.min_confidence,
+            max_period=body.max_period)
         return {"cycle_analysis": result, "timestamp": time.time()}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -359,12 +676,88 @@ async def analyze_cycles(
 async def analyze_correlations(
     body: CorrelationRequest,
     request: Request,
+    response: Response,
     _: Dict = Depends(_auth),
 ):
     try:
-        result = pattern_recognizer.find_correlations(
-            body.data, body.columns)
+        result = await _cached_offload(
+            request, response, body, pattern_recognizer.find_correlations,
+            body.table(),
+            body.columns,
+            top_n=body.top_n,
+            min_periods=body.min_periods)
         return {**result, "timestamp": time.time()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _run_batch_analysis(body: BatchAnalysisRequest) -> Dict[str, Any]:
+    if body.series is not None:
+        series_map = {
+            name: ColumnarSeries(np.array(values, dtype=float), name=name)
+            for name, values in body.series.items()
+        }
+    else:
+        table = body.table()
+        if isinstance(table, ColumnarFrame):
+            series_map = {
+                col: table.series(col, body.date_column)
+                for col in body.value_columns
+            }
+        else:
+            series_map = ColumnarSeries.many_from_rows(
+                table, body.value_columns, body.date_column)
+    results = pattern_recognizer.analyze_batch(
+        series_map,
+        body.analyses,
+        top_k=body.top_k,
+        min_confidence=body.min_confidence)
+    for result in results.values():
+        if "anomalies" in result:
+            result.update(_assess_anomalies(result["anomalies"]))
+            result["count"] = len(result["anomalies"])
+    return results
+
+
+@app.post("/ai/analyze/batch")
+@limiter.limit("30/minute")
+async def analyze_batch(
+    body: BatchAnalysisRequest,
+    request: Request,
+    response: Response,
+    _: Dict = Depends(_auth),
+):
+    """
+    Trend / anomaly / cycle analysis for many series in one request.
+
+    Body: { "series": {"revenue": [...], "orders": [...]} }
+       or { "data": [...rows], "value_columns": ["revenue", "orders"] }
+       (columnar tables — header + column_values / sheet_values — work too)
+    plus optional "analyses": ["trends", "anomalies", "cycles"].
+    """
+    unknown = set(body.analyses) - {"trends", "anomalies", "cycles"}
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown analyses: {sorted(unknown)}")
+    if body.series is None and not (body.has_table() and body.value_columns):
+        raise HTTPException(
+            status_code=400,
+            detail="Provide 'series', or 'data' / 'header' + 'column_values'"
+                   " / 'sheet_values' with 'value_columns'",
+        )
+    try:
+        results = await _cached_offload(
+            request, response, body, _run_batch_analysis, body)
+        return {
+            "results": results,
+            "series_count": len(results),
+            "analyses": body.analyses,
+            "timestamp": time.time(),
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -374,17 +767,90 @@ async def analyze_correlations(
 async def analyze_full(
     body: DataAnalysisRequest,
     request: Request,
+    response: Response,
     _: Dict = Depends(_auth),
 ):
     try:
-        return pattern_recognizer.analyze_patterns(
-            body.data, body.value_column, body.date_column)
+        return await _cached_offload(
+            request, response, body, pattern_recognizer.analyze_patterns,
+            body.table(), body.value_column, body.date_column)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+_NDJSON_BATCH_BYTES = 1 << 20  # gom ~1 MB dòng rồi mới parse trên worker
+
+
+@app.post("/ai/analyze/stream")
+@limiter.limit("10/minute")
+async def analyze_stream(
+    request: Request,
+    value_column: Optional[str] = None,
+    date_column: Optional[str] = None,
+    analyses: str = "summary,trends,anomalies",
+    window: int = 60,
+    threshold: float = 3.5,
+    max_anomalies: int = 100,
+    _: Dict = Depends(_auth),
+):
+    """
+    Constant-memory analysis of an NDJSON upload (Content-Type: application/x-ndjson).
+
+    One JSON object per line, or a header array followed by row arrays.
+    Rows are parsed batch by batch as the body arrives and folded into
+    online accumulators — the full body is never held in memory:
+    - summary: count / min / max / avg / sum / std per numeric column (Welford)
+    - trends: least-squares slope on `value_column` (same result as /ai/analyze/trends)
+    - anomalies: rolling median / MAD on `value_column` (as /ai/anomalies/stream)
+    """
+    selected = [a.strip() for a in analyses.split(",") if a.strip()]
+    unknown = set(selected) - set(StreamingTableAnalyzer.ANALYSES)
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown analyses: {sorted(unknown)}")
+    if not value_column and set(selected) & {"trends", "anomalies"}:
+        raise HTTPException(status_code=400,
+                            detail="'value_column' is required for trends / anomalies")
+    try:
+        analyzer = StreamingTableAnalyzer(
+            value_column, date_column, selected,
+            window=window, threshold=threshold, max_anomalies=max_anomalies)
+        pending: List[bytes] = []
+        pending_bytes = 0
+        tail = b""
+        async for chunk in request.stream():
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            pending.extend(lines)
+            pending_bytes += len(chunk)
+            if pending_bytes >= _NDJSON_BATCH_BYTES:
+                await _offload(request, analyzer.feed_lines, pending)
+                pending, pending_bytes = [], 0
+        pending.append(tail)
+        await _offload(request, analyzer.feed_lines, pending)
+
+        result = analyzer.result()
+        if "anomalies" in result:
+            result.update(_assess_anomalies(result["anomalies"]))
+        return {**result, "timestamp": time.time()}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # ─── Predictions ────────────────────────────────────────────────────────
 
+def _trend_with_series(data, value_column: str):
+    if isinstance(data, ColumnarFrame):
+        series = data.series(value_column)
+    else:
+        series = ColumnarSeries.from_rows(data, value_column)
+    return pattern_recognizer.recognize_trends(series, value_column), series
+
+
 @app.post("/ai/predictions")
 @limiter.limit("30/minute")
 async def get_predictions(
@@ -394,23 +860,19 @@ async def get_predictions(
 ):
     """Real predictions using linear regression on input data."""
     try:
-        trend = pattern_recognizer.recognize_trends(
-            body.data, body.value_column)
+        trend, series = await _offload(
+            request, _trend_with_series, body.table(), body.value_column)
         slope = trend.get("slope", 0)
-        values = [
-            float(row[body.value_column])
-            for row in body.data
-            if body.value_column in row
-        ]
+        values = series.valid_values
 
-        if not values:
+        if not len(values):
             col = body.value_column
             raise HTTPException(
                 status_code=400,
                 detail=f"Column '{col}' not found in data",
             )
 
-        last_value = values[-1]
+        last_value = float(values[-1])
         predicted = [round(last_value + slope * (i + 1), 2)
                      for i in range(body.horizon)]
 
@@ -442,6 +904,58 @@ async def get_predictions_legacy():
     }
 
 
+# ─── Streaming Anomalies ────────────────────────────────────────────────
+
+@app.post("/ai/anomalies/stream")
+@limiter.limit("120/minute")
+async def push_anomaly_stream(
+    body: AnomalyStreamRequest,
+    request: Request,
+    _: Dict = Depends(_auth),
+):
+    """
+    Append new observations to a metric and score only those points.
+
+    State (rolling median / MAD window) is kept per metric, so callers send
+    the newest batch instead of re-uploading the whole history.
+    window / threshold / min_points apply when the metric is first created.
+    """
+    try:
+        result = await _offload(
+            request, streaming_anomaly_detector.push,
+            body.metric,
+            body.values,
+            body.timestamps,
+            window=body.window,
+            threshold=body.threshold,
+            min_points=body.min_points,
+        )
+        return {
+            **result,
+            "count": len(result["anomalies"]),
+            "timestamp": time.time(),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/ai/anomalies/stream/{metric}")
+async def get_anomaly_stream(metric: str, request: Request, _: Dict = Depends(_auth)):
+    state = await _offload(request, streaming_anomaly_detector.state, metric)
+    if state is None:
+        raise HTTPException(status_code=404,
+                            detail=f"Metric '{metric}' has no state")
+    return {"metric": metric, "state": state}
+
+
+@app.delete("/ai/anomalies/stream/{metric}")
+async def reset_anomaly_stream(metric: str, request: Request, _: Dict = Depends(_auth)):
+    return {"metric": metric,
+            "reset": await _offload(request, streaming_anomaly_detector.reset, metric)}
+
+
 # ─── Anomalies (legacy GET redirects to new endpoint) ────────────────────────
 
 @app.get("/ai/anomalies")
@@ -463,8 +977,83 @@ async def chat_query(
     request: Request,
     _: Dict = Depends(_auth),
 ):
+    """
+    Regex parse, plus the Claude fallback (async client) when confidence is
+    low — bounded by the latency budget; a late answer is cached for next time.
+    """
     try:
-        return nlp_processor.process_chat_query(body.query, body.context)
+        return await nlp_processor.process_chat_query_async(
+            body.query, body.context, latency_budget=body.latency_budget)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ai/query")
+@limiter.limit("30/minute")
+async def run_query(
+    body: QueryRequest,
+    request: Request,
+    _: Dict = Depends(_auth),
+):
+    """
+    Execute a query_structure (or a natural-language query parsed into one)
+    against a table — inline or `dataset_id` — and return only the matching
+    rows / aggregates instead of shipping the whole dataset to the browser.
+    """
+    if body.query_structure is None and not body.query:
+        raise HTTPException(status_code=400,
+                            detail="Provide 'query' or 'query_structure'")
+    try:
+        parsed = None
+        structure = body.query_structure
+        if structure is None:
+            parsed = await nlp_processor.process_chat_query_async(body.query, body.context)
+            structure = parsed["query_structure"]
+        result = await _offload(
+            request, query_executor.execute,
+            structure, body.table(), dataset_key=body.dataset_id)
+        response = {"query_structure": structure, **result, "timestamp": time.time()}
+        if parsed is not None:
+            response["parsed"] = {k: parsed.get(k) for k in ("intent", "confidence", "source")}
+        return response
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+_CHAT_BATCH_MAX = 200
+
+
+@app.post("/ai/chat/batch")
+@limiter.limit("10/minute")
+async def chat_batch(
+    body: ChatBatchRequest,
+    request: Request,
+    _: Dict = Depends(_auth),
+):
+    """
+    Parse many queries in one request (saved queries, bulk jobs). Only the
+    low-confidence ones reach Claude, packed into a few batched prompts.
+    """
+    if len(body.queries) > _CHAT_BATCH_MAX:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {_CHAT_BATCH_MAX} queries per batch")
+    try:
+        results = await nlp_processor.process_chat_batch_async(
+            body.queries, body.context, latency_budget=body.latency_budget)
+        return {
+            "results": results,
+            "count": len(results),
+            "sources": dict(Counter(r["source"] for r in results)),
+            "timestamp": time.time(),
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -476,15 +1065,23 @@ async def smart_search(
     request: Request,
     _: Dict = Depends(_auth),
 ):
+    if body.mode not in nlp_processor.SEARCH_MODES:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown search mode '{body.mode}'")
     try:
-        results = nlp_processor.smart_search(
-            body.query, body.data, body.columns)
+        results = await _offload(
+            request, nlp_processor.smart_search,
+            body.query, body.table(), body.columns,
+            top_k=body.top_k, dataset_key=body.dataset_id, mode=body.mode)
         return {
             "results": results,
             "count": len(results),
             "query": body.query,
+            "mode": body.mode,
             "timestamp": time.time(),
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -497,9 +1094,12 @@ async def generate_summary(
     _: Dict = Depends(_auth),
 ):
     try:
-        summary = nlp_processor.generate_summary(
-            body.data, body.max_length)
+        summary = await _offload(
+            request, nlp_processor.generate_summary,
+            body.table(), body.max_length)
         return {"summary": summary, "timestamp": time.time()}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -514,14 +1114,44 @@ async def generate_alerts(
     _: Dict = Depends(_auth),
 ):
     try:
-        alerts = predictive_alerts.analyze_and_alert(
-            body.data, body.value_column, body.metric_name, body.threshold)
+        alerts = await _offload(
+            request, predictive_alerts.analyze_and_alert,
+            body.table(), body.value_column, body.metric_name, body.threshold)
         return {
             "alerts": alerts,
             "count": len(alerts),
             "has_critical": any(a.get("severity") == "high" for a in alerts),
             "timestamp": time.time(),
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ai/alerts/batch")
+@limiter.limit("30/minute")
+async def generate_alerts_batch(
+    body: AlertBatchRequest,
+    request: Request,
+    _: Dict = Depends(_auth),
+):
+    """Alerts for several metrics of one table (shared extraction, batched analyses)."""
+    if not body.value_columns:
+        raise HTTPException(status_code=400, detail="'value_columns' must not be empty")
+    try:
+        by_metric = await _offload(
+            request, predictive_alerts.analyze_and_alert_many,
+            body.table(), body.value_columns, body.metric_names, body.thresholds)
+        return {
+            "alerts": by_metric,
+            "count": sum(len(alerts) for alerts in by_metric.values()),
+            "has_critical": any(
+                a.get("severity") == "high" for alerts in by_metric.values() for a in alerts),
+            "timestamp": time.time(),
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -537,14 +1167,77 @@ async def predict_threshold(
         raise HTTPException(status_code=400,
                             detail="'threshold' field is required")
     try:
-        prediction = predictive_alerts.predict_threshold_crossing(
-            body.data, body.value_column, body.threshold
+        prediction = await _offload(
+            request, predictive_alerts.predict_threshold_crossing,
+            body.table(), body.value_column, body.threshold
         )
         return {"prediction": prediction, "timestamp": time.time()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ai/alerts/stream")
+@limiter.limit("120/minute")
+async def push_alert_stream(
+    body: AlertStreamRequest,
+    request: Request,
+    _: Dict = Depends(_auth),
+):
+    """
+    Append new observations to a metric and return only alert transitions.
+
+    Trend / threshold state is kept per metric (running regression), so
+    callers send the newest batch instead of the whole history. An alert is
+    returned once when it is raised and once when it resolves; the same
+    fingerprint is not re-sent within `cooldown_seconds`.
+    """
+    if body.direction is not None and body.direction not in alert_engine.DIRECTIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown direction '{body.direction}'")
+    try:
+        result = await _offload(
+            request, alert_engine.push,
+            body.metric,
+            body.values,
+            body.timestamps,
+            threshold=body.threshold,
+            direction=body.direction,
+            cooldown_seconds=body.cooldown_seconds,
+            window=body.window,
+            z_threshold=body.z_threshold,
+            min_points=body.min_points,
+            metric_name=body.metric_name,
+        )
+        return {
+            **result,
+            "count": len(result["events"]),
+            "has_critical": any(
+                e.get("severity") == "high" and e.get("status") == "raised"
+                for e in result["events"]),
+            "timestamp": time.time(),
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/ai/alerts/stream/{metric}")
+async def get_alert_stream(metric: str, request: Request, _: Dict = Depends(_auth)):
+    state = await _offload(request, alert_engine.state, metric)
+    if state is None:
+        raise HTTPException(status_code=404,
+                            detail=f"Metric '{metric}' has no state")
+    return {"metric": metric, "state": state}
+
+
+@app.delete("/ai/alerts/stream/{metric}")
+async def reset_alert_stream(metric: str, request: Request, _: Dict = Depends(_auth)):
+    return {"metric": metric, "reset": await _offload(request, alert_engine.reset, metric)}
+
+
 # ─── Categorization ─────────────────────────────────────────────────────
 
 @app.post("/ai/categorize")
@@ -554,14 +1247,52 @@ async def categorize_data(
     request: Request,
     _: Dict = Depends(_auth),
 ):
+    if body.output not in smart_categorizer.OUTPUT_MODES:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown output '{body.output}'")
     try:
-        categorized = smart_categorizer.categorize_rows(
-            body.data, body.category_rules)
+        table = body.table()
+        if body.output == "columns":
+            categories = await _offload(
+                request, smart_categorizer.categorize_table, table, body.category_rules)
+            return {
+                "categories": categories,
+                "count": len(categories["category"]),
+                "timestamp": time.time(),
+            }
+        categorized = await _offload(
+            request, smart_categorizer.categorize_rows, table, body.category_rules)
         return {
             "categorized": categorized,
             "count": len(categorized),
             "timestamp": time.time(),
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ai/categorize/columns")
+@limiter.limit("60/minute")
+async def profile_columns(
+    body: ColumnProfileRequest,
+    request: Request,
+    _: Dict = Depends(_auth),
+):
+    """Category / suggested type of every column in one request (sampled, cached)."""
+    if body.sample_size is not None and not (
+            1 <= body.sample_size <= smart_categorizer.MAX_PROFILE_SAMPLE):
+        raise HTTPException(
+            status_code=400,
+            detail=f"sample_size must be between 1 and {smart_categorizer.MAX_PROFILE_SAMPLE}")
+    try:
+        result = await _offload(
+            request, smart_categorizer.profile_columns,
+            body.table(), body.columns, body.sample_size, dataset_key=body.dataset_id)
+        return {**result, "timestamp": time.time()}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -573,11 +1304,15 @@ async def categorize_data(
 async def generate_summary_report(
     body: ReportRequest,
     request: Request,
+    response: Response,
     _: Dict = Depends(_auth),
 ):
     try:
-        return report_generator.generate_summary_report(
-            body.data, body.title or "Data Summary")
+        return await _cached_offload(
+            request, response, body, report_generator.generate_summary_report,
+            body.table(), body.title or "Data Summary")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -587,14 +1322,18 @@ async def generate_summary_report(
 async def generate_trend_report(
     body: ReportRequest,
     request: Request,
+    response: Response,
     _: Dict = Depends(_auth),
 ):
     try:
-        return report_generator.generate_trend_report(
-            body.data,
+        return await _cached_offload(
+            request, response, body, report_generator.generate_trend_report,
+            body.table(),
             body.value_column,
             body.date_column,
             body.title or "Trend Analysis")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -604,11 +1343,15 @@ async def generate_trend_report(
 async def generate_anomaly_report(
     body: ReportRequest,
     request: Request,
+    response: Response,
     _: Dict = Depends(_auth),
 ):
     try:
-        return report_generator.generate_anomaly_report(
-            body.data, body.value_column, body.title or "Anomaly Detection")
+        return await _cached_offload(
+            request, response, body, report_generator.generate_anomaly_report,
+            body.table(), body.value_column, body.title or "Anomaly Detection")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -618,14 +1361,18 @@ async def generate_anomaly_report(
 async def generate_comprehensive_report(
     body: ReportRequest,
     request: Request,
+    response: Response,
     _: Dict = Depends(_auth),
 ):
     try:
-        return report_generator.generate_comprehensive_report(
-            body.data,
+        return await _cached_offload(
+            request, response, body, report_generator.generate_comprehensive_report,
+            body.table(),
             body.value_column,
             body.date_column,
             body.title or "Comprehensive Report")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -637,6 +1384,17 @@ async def get_sla_config():
     return {"config": SLA_CONFIG, "platforms": list(SLA_CONFIG.keys())}
 
 
+def _platform_orders(body: SLACheckRequest) -> List[Dict[str, Any]]:
+    try:
+        frame = dataset_registry.load(body.dataset_id)
+    except DatasetNotFound:
+        raise HTTPException(status_code=404,
+                            detail=f"Dataset '{body.dataset_id}' not found")
+    platforms = np.char.lower(
+        np.asarray(frame.column(body.platform_column), dtype=str))
+    return frame.to_rows(np.flatnonzero(platforms == body.platform.lower()))
+
+
 @app.post("/ai/sla/check")
 @limiter.limit("60/minute")
 async def check_sla(
@@ -644,8 +1402,20 @@ async def check_sla(
     request: Request,
     _: Dict = Depends(_auth),
 ):
-    """Check orders against SLA deadlines for a given platform."""
+    """
+    Check orders against SLA deadlines for a given platform.
+
+    Orders come inline (`orders`) or from a stored dataset (`dataset_id`),
+    filtered to the rows whose `platform_column` matches `platform` — so
+    all platforms can be checked against one upload.
+    """
+    if body.orders is None and body.dataset_id is None:
+        raise HTTPException(status_code=400,
+                            detail="Provide 'orders' or 'dataset_id'")
     try:
+        orders = body.orders
+        if orders is None:
+            orders = await _offload(request, _platform_orders, body)
         platform_key = body.platform.lower()
         config = SLA_CONFIG.get(platform_key) or SLA_CONFIG.get(
             "other_platforms", {})
@@ -666,7 +1436,7 @@ async def check_sla(
             h, m = map(int, t.split(":"))
             return h * 60 + m
 
-        for order in body.orders:
+        for order in orders:
             order_id = order.get("id", "unknown")
             status = str(order.get("status", "")).lower()
             inactive = status not in {
@@ -707,14 +1477,15 @@ async def check_sla(
             "current_time": current_time_str,
             "violations": violations,
             "warnings": warnings,
-            "total_orders": len(
-                body.orders),
+            "total_orders": len(orders),
             "violation_count": len(violations),
             "warning_count": len(warnings),
             "status": "critical" if violations else (
                 "warning" if warnings else "ok"),
             "timestamp": time.time(),
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -728,6 +1499,9 @@ async def get_sla_alerts(
 ):
     """Get upcoming SLA deadlines within the warning window."""
     try:
+        orders = body.orders
+        if orders is None and body.dataset_id is not None:
+            orders = await _offload(request, _platform_orders, body)
         from datetime import datetime
 
         raw_time = body.current_time or datetime.now().strftime("%H:%M")
@@ -760,7 +1534,7 @@ async def get_sla_alerts(
                     "deadline_type": deadline_key,
                     "deadline_time": config[deadline_key],
                     "minutes_remaining": remaining,
-                    "affected_orders": len(body.orders),
+                    "affected_orders": len(orders or []),
                     "urgency": "high" if remaining <= 30 else "medium" if remaining <= 60 else "low",
                 })
 
@@ -770,6 +1544,8 @@ async def get_sla_alerts(
             "current_time": current_time_str,
             "timestamp": time.time(),
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -811,62 +1587,21 @@ async def solve_optimization(
                 detail="Optimization engine not available. COBYQA dependencies missing.",
             )
 
-        from scipy.optimize import Bounds
-
-        bounds_obj = None
-        if body.bounds:
-            bounds_array = np.array(body.bounds)
-            bounds_obj = Bounds(bounds_array[:, 0], bounds_array[:, 1])
-
-        def _make_objective(obj_type: str, coefficients=None):
-            if obj_type == "rosenbrock":
-                return lambda x: sum(
-                    100 * (x[i + 1] - x[i] ** 2) ** 2 + (1 - x[i]) ** 2
-                    for i in range(len(x) - 1)
-                )
-            elif obj_type == "linear" and coefficients:
-                c = np.array(coefficients)
-                return lambda x: float(np.dot(c, x))
-            else:  # "sum_squares" or fallback
-                return lambda x: float(np.sum(x ** 2))
-
-        objective = _make_objective(
+        result = await _offload(
+            request,
+            jobs.solve_optimization,
             body.objective_type,
-            body.coefficients)
-
-        result = cobyqa_minimize(
-            fun=objective,
-            x0=np.array(body.initial_guess),
-            bounds=bounds_obj,
-            constraints=body.constraints or [],
-            options=body.options or {},
+            body.initial_guess,
+            bounds=body.bounds,
+            constraints=body.constraints,
+            options=body.options,
+            coefficients=body.coefficients,
+            kind="process",
         )
 
-        r = result
         return {
             "status": "success",
-            "result": {
-                "optimal_point": (
-                    r.x.tolist() if hasattr(r, "x") else None
-                ),
-                "optimal_value": (
-                    float(r.fun) if hasattr(r, "fun") else None
-                ),
-                "success": (
-                    bool(r.success) if hasattr(r, "success") else False
-                ),
-                "message": (
-                    str(r.message)
-                    if hasattr(r, "message")
-                    else "Optimization completed"
-                ),
-                "iterations": (
-                    int(r.nit) if hasattr(r, "nit") else None
-                ),
-                "function_evaluations": (
-                    int(r.nfev) if hasattr(r, "nfev") else None
-                ),
-            },
+            "result": result,
             "method": "COBYQA",
             "objective_type": body.objective_type,
             "timestamp": time.time(),
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: NLPProcessor query parsing (intent + confidence + entities).
+
+Per-query cost of the single-pass scanner vs. the per-pattern re.search /
+re.findall calls it replaced (kept here as the reference implementation,
+which is also used to check that both give identical results).
+
+Usage (from ai-service/):
+    python benchmarks/bench_nlp_intent.py [--repeat 20000]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mia_models.nlp_processor import NLPProcessor  # noqa: E402
+
+QUERIES = [
+    "show me data",
+    "total revenue last month",
+    "compare shopee vs lazada orders 2024-01-05",
+    "how many orders were delivered yesterday",
+    "filter by status where amount > 500",
+    "trend of revenue column over this year",
+    "search for ao thun trang",
+    "find orders with refund where platform is tiktok",
+    "doanh thu hôm nay",
+    "average delivery time field duration for 12/03/2024 and 3.5 days",
+]
+
+_STOP_WORDS = {"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by"}
+
+
+def reference_parse(nlp: NLPProcessor, query: str):
+    """Per-pattern implementation (one re call per pattern)."""
+    scores = {}
+    for intent, patterns in nlp.intent_patterns.items():
+        scores[intent] = sum(1 for p in patterns if re.search(p, query, re.IGNORECASE))
+    intent = max(scores, key=scores.get) if scores else "unknown"
+
+    entities = {"dates": [], "numbers": [], "columns": [], "keywords": []}
+    for kind, key in (("date", "dates"), ("number", "numbers"), ("column", "columns")):
+        for pattern in nlp.entity_patterns[kind]:
+            entities[key].extend(re.findall(pattern, query, re.IGNORECASE))
+    words = re.findall(r"\b\w+\b", query.lower())
+    entities["keywords"] = [w for w in words if w not in _STOP_WORDS and len(w) > 2]
+
+    patterns = nlp.intent_patterns.get(intent, [])
+    matches = sum(1 for p in patterns if re.search(p, query, re.IGNORECASE))
+    confidence = min(matches / len(patterns), 1.0) if patterns else 0.0
+    return {"intent": intent, "confidence": confidence, "entities": entities}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    nlp = NLPProcessor()
+    queries = [q.lower() for q in QUERIES]
+    for q in queries:
+        expected = reference_parse(nlp, q)
+        actual = nlp.analyze_query(q)
+        assert actual == expected, (q, actual, expected)
+
+    for name, fn in (("per-pattern", lambda q: reference_parse(nlp, q)),
+                     ("single-pass", nlp.analyze_query)):
+        total = timeit.timeit(lambda: [fn(q) for q in queries], number=args.repeat // len(queries))
+        per_query = total / (args.repeat // len(queries) * len(queries))
+        print(f"{name:12s} {per_query * 1e6:8.2f} µs/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark: NLPProcessor.smart_search on a synthetic order table.
+
+Index build (once per dataset) and per-query latency of the BM25 inverted
+index (or the char n-gram vector index, --mode vector) vs. the row-by-row
+substring scan, for growing table sizes.
+
+Usage (from ai-service/):
+    python benchmarks/bench_search.py [--sizes 1000,10000,100000] [--queries 50]
+                                      [--mode keyword|vector]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mia_models.nlp_processor import NLPProcessor  # noqa: E402
+
+WORDS = ["đơn", "hàng", "giao", "trễ", "khách", "hủy", "thanh", "toán", "áo", "thun",
+         "trắng", "quần", "jean", "shopee", "lazada", "tiktok", "refund", "delivered"]
+QUERIES = ["don hang tre", "ao thun trang", "shopee refund", "khach huy", "quan jean"]
+
+
+def make_rows(n: int, rng: random.Random):
+    vocab = WORDS + [f"sku{i}" for i in range(5000)]
+    return [
+        {"id": i, "title": " ".join(rng.choices(vocab, k=6)),
+         "platform": rng.choice(["shopee", "lazada", "tiktok"])}
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--mode", choices=NLPProcessor.SEARCH_MODES, default="keyword")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    nlp = NLPProcessor()
+    for size in (int(s) for s in args.sizes.split(",")):
+        rows = make_rows(size, rng)
+        started = time.perf_counter()
+        nlp.smart_search(QUERIES[0], rows, dataset_key=f"bench-{size}", mode=args.mode)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(args.queries):
+            nlp.smart_search(QUERIES[i % len(QUERIES)], rows,
+                             dataset_key=f"bench-{size}", mode=args.mode)
+        indexed = (time.perf_counter() - started) / args.queries
+
+        scan_queries = max(1, args.queries // 10)
+        started = time.perf_counter()
+        for i in range(scan_queries):
+            nlp._scan_search(QUERIES[i % len(QUERIES)], rows)
+        scan = (time.perf_counter() - started) / scan_queries
+
+        print(f"{size:>8d} rows  build {build * 1e3:8.1f} ms  "
+              f"{args.mode} {indexed * 1e3:7.2f} ms/query  scan {scan * 1e3:8.1f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
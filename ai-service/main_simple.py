@@ -18,8 +18,10 @@ pattern_recognizer = None
 predictive_alerts = None
 smart_categorizer = None
 report_generator = None
+ColumnarFrame = None
 try:
     from mia_models import (
+        ColumnarFrame as _frame,
         nlp_processor as _nlp,
         pattern_recognizer as _pat,
         predictive_alerts as _alerts,
@@ -32,6 +34,7 @@ try:
     predictive_alerts = _alerts
     smart_categorizer = _cat
     report_generator = _rep
+    ColumnarFrame = _frame
     MIA_MODELS_AVAILABLE = True
 except Exception as exc:
     logger.warning("mia_models not loaded: %s", exc)
@@ -262,6 +265,8 @@ class NLPSearchRequest(BaseModel):
     query: str
     data: List[Dict[str, Any]]
     columns: Optional[List[str]] = None
+    top_k: int = 50
+    mode: str = "keyword"
 
 
 class DataColumnRequest(BaseModel):
@@ -301,6 +306,15 @@ class CategorizeColumnRequest(BaseModel):
     sample_values: Optional[List[Any]] = None
 
 
+class CategorizeColumnsRequest(BaseModel):
+    """Cả bảng: `data` (rows) hoặc `sheet_values` (grid, hàng đầu = header)."""
+
+    data: Optional[List[Dict[str, Any]]] = None
+    sheet_values: Optional[List[List[Any]]] = None
+    columns: Optional[List[str]] = None
+    sample_size: Optional[int] = Field(default=None, ge=1, le=10000)
+
+
 def _require_mia_models():
     if not MIA_MODELS_AVAILABLE:
         raise HTTPException(
@@ -577,7 +591,7 @@ async def mia_legacy_status():
 @app.post("/api/ml/legacy/nlp/parse")
 async def mia_nlp_parse(request: NLPQueryRequest):
     _require_mia_models()
-    return nlp_processor.process_chat_query(request.query, request.context or {})
+    return await nlp_processor.process_chat_query_async(request.query, request.context or {})
 
 
 @app.post("/api/ml/legacy/nlp/summary")
@@ -590,7 +604,11 @@ async def mia_nlp_summary(request: NLPSummaryRequest):
 @app.post("/api/ml/legacy/nlp/search")
 async def mia_nlp_search(request: NLPSearchRequest):
     _require_mia_models()
-    results = nlp_processor.smart_search(request.query, request.data, request.columns)
+    if request.mode not in nlp_processor.SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown search mode '{request.mode}'")
+    results = nlp_processor.smart_search(
+        request.query, request.data, request.columns,
+        top_k=request.top_k, mode=request.mode)
     return {"count": len(results), "results": results}
 
 
@@ -666,6 +684,19 @@ async def mia_categorize_column(request: CategorizeColumnRequest):
     )
 
 
+@app.post("/api/ml/legacy/categorize/columns")
+async def mia_categorize_columns(request: CategorizeColumnsRequest):
+    """Profile mọi cột của sheet trong 1 request (thay vì 1 request / cột)."""
+    _require_mia_models()
+    if request.data is not None:
+        table = request.data
+    elif request.sheet_values is not None:
+        table = ColumnarFrame.from_grid(request.sheet_values)
+    else:
+        raise HTTPException(status_code=400, detail="Provide 'data' or 'sheet_values'")
+    return smart_categorizer.profile_columns(table, request.columns, request.sample_size)
+
+
 # ---------------------------------------------------------------------------
 # Auth endpoint — API key → simple bearer token (dev/prod opt-in)
 # ---------------------------------------------------------------------------
@@ -767,7 +798,7 @@ async def ai_predictions_v2(request: AIPredictionsRequest):
 @app.post("/ai/chat")
 async def ai_chat(request: AIChatRequest):
     _require_mia_models()
-    return nlp_processor.process_chat_query(request.query, request.context or {})
+    return await nlp_processor.process_chat_query_async(request.query, request.context or {})
 
 
 @app.post("/ai/summary")
@@ -1,29 +1,74 @@
 """
 MIA / OAS legacy analytics modules (ai-service).
 
+- series: ColumnarSeries — value column extracted once per request (numpy);
+  ColumnarFrame — columnar payloads (header + arrays / sheet grid)
 - nlp_processor: intent parsing, summary, smart search (no extra deps)
+- llm_cache: normalized-query LRU/TTL (+ SQLite) with single-flight for the
+  Claude fallback (AI_CLAUDE_CACHE_SIZE / AI_CLAUDE_CACHE_TTL / AI_CLAUDE_CACHE_DB)
+- search_index: BM25 inverted index + char n-gram TF-IDF vector index behind
+  smart search (diacritic folding, numpy)
+- query_executor: runs NLP query_structure (filter / aggregate / group / order)
+  on a table server-side, cached per-column sort / code indexes (numpy)
 - pattern_recognizer: trends, anomalies, cycles (numpy)
-- predictive_alerts: trend / anomaly / threshold alerts
+- streaming_anomaly: per-metric rolling median/MAD anomaly state (push-based;
+  AI_ANOMALY_STATE_DB = SQLite file shared across workers)
+- state_store: per-metric state LRU + optional SQLite table (streaming_anomaly,
+  alert_engine)
+- accumulators: one-pass Welford stats / regression for streamed (NDJSON) uploads
+- column_stats: vectorized per-column count / sum / avg / min / max / std /
+  p50 / p95 / p99, memoized per table (TableStatistics) for the reports
+- predictive_alerts: trend / anomaly / threshold alerts from one memoized
+  AnalysisContext per metric (several metrics: one batched pass)
+- alert_engine: push-based per-metric alert state (running trend / threshold
+  ETA), raised / resolved transitions only, cool-down de-duplication
+  (AI_ALERT_COOLDOWN; AI_ALERT_STATE_DB = SQLite file shared across workers)
+- keyword_tagger: keyword → tag / priority vocabulary compiled into one
+  Aho-Corasick automaton, diacritic-insensitive (config/keyword_tags.json or
+  AI_KEYWORD_TAGS; pyahocorasick optional)
 - smart_categorizer: column & row categorization
-- report_generator: summary / trend / anomaly / comprehensive reports
+- report_generator: summary / trend / anomaly / comprehensive reports (one
+  TableStatistics + one AnalysisContext shared by every section)
 
 Not bundled here (need pandas + scikit-learn): retail_predictor, your_domain_predictor.
 See sklearn_templates/ if you add pandas+scikit-learn.
 """
 
+from .series import ColumnarFrame, ColumnarSeries
 from .nlp_processor import NLPProcessor, nlp_processor
+from .query_executor import QueryError, QueryExecutor, query_executor
 from .pattern_recognizer import PatternRecognizer, pattern_recognizer
+from .streaming_anomaly import StreamingAnomalyDetector, streaming_anomaly_detector
+from .accumulators import RunningRegression, RunningStats, StreamingTableAnalyzer
+from .column_stats import TableStatistics
 from .predictive_alerts import PredictiveAlerts, predictive_alerts
+from .alert_engine import AlertEngine, alert_engine
+from .keyword_tagger import KeywordTagger, keyword_tagger
 from .smart_categorizer import SmartCategorizer, smart_categorizer
 from .report_generator import ReportGenerator, report_generator
 
 __all__ = [
+    "ColumnarFrame",
+    "ColumnarSeries",
     "NLPProcessor",
     "nlp_processor",
+    "QueryError",
+    "QueryExecutor",
+    "query_executor",
     "PatternRecognizer",
     "pattern_recognizer",
+    "StreamingAnomalyDetector",
+    "streaming_anomaly_detector",
+    "RunningStats",
+    "RunningRegression",
+    "StreamingTableAnalyzer",
+    "TableStatistics",
     "PredictiveAlerts",
     "predictive_alerts",
+    "AlertEngine",
+    "alert_engine",
+    "KeywordTagger",
+    "keyword_tagger",
     "SmartCategorizer",
     "smart_categorizer",
     "ReportGenerator",
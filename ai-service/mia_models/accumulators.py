@@ -0,0 +1,299 @@
+"""
+Online Accumulators
+Thống kê một lượt (constant memory) cho dữ liệu đọc dạng stream (NDJSON)
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .pattern_recognizer import _trend_result
+from .series import to_float_array
+from .streaming_anomaly import RobustWindow
+
+
+class RunningStats:
+    """
+    Count / sum / min / max / mean / variance in one pass:
+    - Welford update per value, Chan et al. merge per NumPy batch
+    - population variance (same as np.std in PatternRecognizer)
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max", "total")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.total = 0.0
+
+    def push(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.total += value
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+
+    def push_many(self, values: np.ndarray) -> None:
+        """Merge a batch (NaN already removed) without a Python loop"""
+        n_b = len(values)
+        if not n_b:
+            return
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        self._merge(n_b, mean_b, m2_b, float(values.min()), float(values.max()),
+                    float(values.sum()))
+
+    def merge(self, other: "RunningStats") -> None:
+        if other.count:
+            self._merge(other.count, other.mean, other.m2, other.min, other.max, other.total)
+
+    def _merge(self, n_b: int, mean_b: float, m2_b: float,
+               min_b: float, max_b: float, total_b: float) -> None:
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * n_a * n_b / n
+        self.count = n
+        self.total += total_b
+        self.min = min_b if self.min is None else min(self.min, min_b)
+        self.max = max_b if self.max is None else max(self.max, max_b)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(max(self.variance, 0.0)))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "avg": self.mean if self.count else None,
+            "sum": self.total,
+            "std": self.std,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.min, "max": self.max, "total": self.total}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "RunningStats":
+        stats = cls()
+        for name in cls.__slots__:
+            setattr(stats, name, state.get(name, getattr(stats, name)))
+        return stats
+
+
+class RunningRegression:
+    """
+    Online least squares of y on its sample index x = 0, 1, 2, …:
+    - y moments in a RunningStats
+    - x moments are closed-form (x is the index), only the co-moment
+      Σ(x − x̄)(y − ȳ) is accumulated (batch merge, numerically stable)
+    - same slope as np.polyfit(arange(n), y, 1) in recognize_trends
+    """
+
+    __slots__ = ("y", "cxy", "first", "last")
+
+    def __init__(self):
+        self.y = RunningStats()
+        self.cxy = 0.0
+        self.first = None
+        self.last = None
+
+    def push(self, value: float) -> None:
+        """Append one observation, O(1)"""
+        n = self.y.count
+        if n:
+            # x mới = n, x̄ cũ = (n − 1) / 2 → co-moment tăng n/2 · (y − ȳ cũ)
+            self.cxy += n / 2.0 * (value - self.y.mean)
+        else:
+            self.first = value
+        self.y.push(value)
+        self.last = value
+
+    def push_many(self, values: np.ndarray) -> None:
+        n_b = len(values)
+        if not n_b:
+            return
+        n_a = self.y.count
+        mean_xa = (n_a - 1) / 2.0
+        mean_xb = n_a + (n_b - 1) / 2.0
+        mean_yb = float(values.mean())
+        x_b = np.arange(n_b, dtype=float) - (n_b - 1) / 2.0
+        cxy_b = float(np.dot(x_b, values - mean_yb))
+        if n_a:
+            n = n_a + n_b
+            self.cxy += cxy_b + (mean_xb - mean_xa) * (mean_yb - self.y.mean) * n_a * n_b / n
+        else:
+            self.cxy = cxy_b
+            self.first = float(values[0])
+        self.y.push_many(values)
+        self.last = float(values[-1])
+
+    @property
+    def slope(self) -> float:
+        n = self.y.count
+        cxx = n * (n * n - 1) / 12.0  # Σ(x − x̄)² cho x = 0..n-1
+        return self.cxy / cxx if cxx else 0.0
+
+    def trend(self) -> Dict[str, Any]:
+        """recognize_trends result shape from the accumulated moments"""
+        if self.y.count < 2:
+            return {"trend": "insufficient_data", "confidence": 0}
+        return _trend_result(self.slope, self.y.mean, self.y.std, self.first, self.last)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"y": self.y.to_dict(), "cxy": self.cxy, "first": self.first, "last": self.last}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "RunningRegression":
+        regression = cls()
+        regression.y = RunningStats.from_dict(state.get("y", {}))
+        regression.cxy = float(state.get("cxy", 0.0))
+        regression.first = state.get("first")
+        regression.last = state.get("last")
+        return regression
+
+
+class StreamingTableAnalyzer:
+    """
+    Constant-memory analysis of rows fed in batches (NDJSON upload):
+    - summary: RunningStats per numeric column
+    - trends: RunningRegression on `value_column`
+    - anomalies: RobustWindow (rolling median / MAD) on `value_column`;
+      at most `max_anomalies` records are kept, all are counted
+    Memory depends on the number of columns and the anomaly window,
+    not on the number of rows.
+    """
+
+    ANALYSES = ("summary", "trends", "anomalies")
+
+    def __init__(self, value_column: str = None, date_column: str = None,
+                 analyses: List[str] = None, window: int = 60,
+                 threshold: float = 3.5, max_anomalies: int = 100):
+        self.value_column = value_column
+        self.date_column = date_column
+        self.analyses = list(analyses or self.ANALYSES)
+        self.max_anomalies = max_anomalies
+        self.rows = 0
+        self.bad_lines = 0
+        self.columns: Dict[str, RunningStats] = {}
+        self.regression = RunningRegression()
+        self.scorer = RobustWindow(window, threshold)
+        self.anomalies: List[Dict[str, Any]] = []
+        self.anomaly_count = 0
+        self.earliest = None
+        self.latest = None
+        self._header: Optional[List[str]] = None
+
+    def feed_lines(self, lines: Iterable[bytes]) -> int:
+        """Parse NDJSON lines (row objects, or a header array then row arrays)"""
+        rows = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                self.bad_lines += 1
+                continue
+            if isinstance(item, dict):
+                rows.append(item)
+            elif isinstance(item, list):
+                if self._header is None:
+                    self._header = [str(h) for h in item]
+                else:
+                    rows.append(dict(zip(self._header, item)))
+            else:
+                self.bad_lines += 1
+        self.feed_rows(rows)
+        return len(rows)
+
+    def feed_rows(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        offset = self.rows
+        self.rows += len(rows)
+
+        if "summary" in self.analyses:
+            numeric: Dict[str, List[float]] = {}
+            for row in rows:
+                for key, value in row.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        numeric.setdefault(key, []).append(value)
+            for key, values in numeric.items():
+                values = np.array(values, dtype=float)
+                values = values[np.isfinite(values)]
+                if not values.size:
+                    continue
+                stats = self.columns.get(key)
+                if stats is None:
+                    stats = self.columns[key] = RunningStats()
+                stats.push_many(values)
+
+        if self.date_column:
+            stamps = _date_cells([row.get(self.date_column) for row in rows], self.earliest)
+            if stamps:
+                low, high = min(stamps), max(stamps)
+                self.earliest = low if self.earliest is None else min(self.earliest, low)
+                self.latest = high if self.latest is None else max(self.latest, high)
+
+        if not self.value_column:
+            return
+        values = to_float_array([row.get(self.value_column) for row in rows])
+        valid = ~np.isnan(values)
+        if "trends" in self.analyses:
+            self.regression.push_many(values[valid])
+        if "anomalies" in self.analyses:
+            date_column = self.date_column
+            for k in np.flatnonzero(valid):
+                row = rows[k]
+                timestamp = row.get(date_column) if date_column else (
+                    row.get("timestamp") or row.get("date"))
+                anomaly = self.scorer.push(values[k], timestamp)
+                if anomaly:
+                    self.anomaly_count += 1
+                    if len(self.anomalies) < self.max_anomalies:
+                        anomaly["index"] = offset + int(k)
+                        self.anomalies.append(anomaly)
+
+    def result(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"rows": self.rows, "bad_lines": self.bad_lines}
+        if "summary" in self.analyses:
+            result["columns"] = {col: s.as_dict() for col, s in self.columns.items()}
+            if self.date_column:
+                result["date_range"] = {"earliest": self.earliest, "latest": self.latest}
+        if self.value_column and "trends" in self.analyses:
+            result["trend_analysis"] = self.regression.trend()
+        if self.value_column and "anomalies" in self.analyses:
+            result["anomalies"] = self.anomalies
+            result["anomaly_count"] = self.anomaly_count
+            result["anomalies_truncated"] = self.anomaly_count > len(self.anomalies)
+        return result
+
+
+def _date_cells(stamps: List[Any], reference: Any = None) -> List[Any]:
+    """
+    Date cells of one comparable kind, so min / max cannot raise on mixed cells:
+    the kind of `reference` (range seen so far) if set, else text if the batch
+    has any, else finite numbers
+    """
+    text = [s for s in stamps if isinstance(s, str) and s]
+    numbers = [s for s in stamps
+               if isinstance(s, (int, float)) and not isinstance(s, bool) and s == s]
+    if reference is None:
+        return text or numbers
+    return text if isinstance(reference, str) else numbers
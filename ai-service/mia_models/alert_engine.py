@@ -0,0 +1,319 @@
+"""
+Alert Engine
+Cảnh báo có state theo metric: đẩy điểm mới (không gửi lại lịch sử), slope / ETA
+vượt ngưỡng cập nhật O(1), chỉ phát sự kiện khi trạng thái đổi, có cool-down
+chống gửi lặp (Telegram...). State lưu trong bộ nhớ, thêm file SQLite (tùy chọn).
+"""
+
+import math
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .accumulators import RunningRegression
+from .predictive_alerts import steps_to_threshold, trend_recommendation
+from .state_store import MetricStateStore
+from .streaming_anomaly import RobustWindow
+
+_SEVERITY_RANK = {"high": 3, "medium": 2, "low": 1}
+
+
+class MetricAlertState:
+    """
+    Alert state of one metric:
+    - RunningRegression sufficient statistics (slope, trend, last value)
+    - RobustWindow for point anomalies (rolling median / MAD)
+    - active alerts by kind ("trend", "threshold") with their fingerprint
+    - last notification time per fingerprint (cool-down)
+    """
+
+    def __init__(self, cooldown_seconds: float = 3600, threshold: float = None,
+                 direction: str = "above", window: int = 60, z_threshold: float = 3.5,
+                 min_points: int = 8):
+        self.cooldown_seconds = float(cooldown_seconds)
+        self.threshold = threshold
+        self.direction = direction
+        self.regression = RunningRegression()
+        self.window = RobustWindow(window, z_threshold, min_points)
+        self.active: Dict[str, Dict[str, Any]] = {}
+        self.last_sent: Dict[str, float] = {}
+        self.suppressed = 0
+
+    def push(self, metric: str, values: List[Optional[float]], timestamps: List[Any] = None,
+             now: float = None) -> List[Dict[str, Any]]:
+        """Absorb new observations; returns the raised / resolved events to notify"""
+        now = time.time() if now is None else now
+        events = []
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            value = float(value)
+            if not math.isfinite(value):  # NaN / inf
+                continue
+            timestamp = timestamps[i] if timestamps and i < len(timestamps) else None
+            anomaly = self.window.push(value, timestamp)
+            self.regression.push(value)
+            if anomaly:
+                event = self._anomaly_event(metric, anomaly, now)
+                if event:
+                    events.append(event)
+
+        trend = self.regression.trend()
+        events.extend(self._transition("trend", self._trend_alert(metric, trend), now))
+        events.extend(self._transition("threshold", self._threshold_alert(metric, trend), now))
+        self._prune(now)
+        return events
+
+    # ─── Alert conditions ───────────────────────────────────────────────
+
+    def _trend_alert(self, metric: str, trend: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Same rule as PredictiveAlerts.generate_trend_alerts, on the running fit"""
+        change_pct = trend.get("change_percentage", 0)
+        confidence = trend.get("confidence", 0)
+        if not (abs(change_pct) > 20 and confidence > 0.7):
+            return None
+        direction = trend.get("trend")
+        severity = "high" if abs(change_pct) > 50 else "medium"
+        return {
+            "type": "trend",
+            "fingerprint": f"trend:{direction}:{severity}",
+            "metric": metric,
+            "severity": severity,
+            "alert_type": "warning" if change_pct < -20 else "info",
+            "message": f"{metric} shows {direction} trend with {change_pct:.1f}% change",
+            "trend": direction,
+            "change_percentage": change_pct,
+            "confidence": confidence,
+            "recommendation": trend_recommendation(direction, change_pct),
+        }
+
+    def _threshold_alert(self, metric: str, trend: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.threshold is None or self.regression.last is None:
+            return None
+        last_value = self.regression.last
+        crossed = (last_value >= self.threshold if self.direction == "above"
+                   else last_value <= self.threshold)
+        base = {
+            "metric": metric,
+            "threshold": self.threshold,
+            "direction": self.direction,
+            "current_value": last_value,
+        }
+        if crossed:
+            return {
+                **base,
+                "type": "threshold_crossed",
+                "fingerprint": f"threshold:{self.direction}:{self.threshold}:crossed",
+                "severity": "high",
+                "alert_type": "critical",
+                "message": f"{metric} crossed {self.direction} threshold {self.threshold}",
+                "recommendation": "Act now: threshold already crossed",
+            }
+
+        steps = steps_to_threshold(self.regression.slope, last_value, self.threshold, self.direction)
+        if trend.get("trend") == "insufficient_data" or not steps or not 0 < steps < 365:
+            return None
+        return {
+            **base,
+            "type": "threshold_prediction",
+            "fingerprint": f"threshold:{self.direction}:{self.threshold}:predicted",
+            "severity": "medium",
+            "alert_type": "warning",
+            "message": f"{metric} predicted to cross threshold in {int(steps)} days",
+            "days_until_crossing": int(steps),
+            "confidence": min(trend.get("confidence", 0.5) * 0.8, 0.9),
+            "recommendation": "Plan preventive actions",
+        }
+
+    # ─── Transitions / cool-down ────────────────────────────────────────
+
+    def _transition(self, kind: str, alert: Optional[Dict[str, Any]],
+                    now: float) -> List[Dict[str, Any]]:
+        current = self.active.get(kind)
+        fingerprint = alert["fingerprint"] if alert else None
+        if current is not None and current["fingerprint"] == fingerprint:
+            current["alert"] = alert  # ETA / % thay đổi mới nhất, không phát lại
+            if current["notified"] or not self._may_notify(fingerprint, now):
+                return []
+            # Bị chặn do cool-down lúc raise, vẫn active → gửi khi hết cool-down
+            current["notified"] = True
+            return [{**alert, "status": "raised", "active_since": current["since"],
+                     "timestamp": datetime.fromtimestamp(now).isoformat()}]
+
+        events = []
+        if current is not None:
+            del self.active[kind]
+            if current["notified"]:
+                events.append({**current["alert"], "status": "resolved",
+                               "active_since": current["since"],
+                               "timestamp": datetime.fromtimestamp(now).isoformat()})
+        if alert is not None:
+            notify = self._may_notify(fingerprint, now)
+            self.active[kind] = {"fingerprint": fingerprint, "since": now,
+                                 "notified": notify, "alert": alert}
+            if notify:
+                events.append({**alert, "status": "raised",
+                               "timestamp": datetime.fromtimestamp(now).isoformat()})
+        return events
+
+    def _anomaly_event(self, metric: str, anomaly: Dict[str, Any],
+                       now: float) -> Optional[Dict[str, Any]]:
+        fingerprint = f"anomaly:{anomaly['type']}"
+        if not self._may_notify(fingerprint, now):
+            return None
+        return {
+            "type": "anomaly",
+            "status": "raised",
+            "fingerprint": fingerprint,
+            "metric": metric,
+            "severity": anomaly["severity"],
+            "alert_type": "warning" if anomaly["type"] == "drop" else "info",
+            "message": f"Anomaly detected in {metric}: {anomaly['type']} value",
+            "anomaly_details": anomaly,
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "recommendation": "Review data point and investigate cause",
+        }
+
+    def _may_notify(self, fingerprint: str, now: float) -> bool:
+        """True (and start the cool-down) unless fingerprint was sent < cooldown_seconds ago"""
+        last = self.last_sent.get(fingerprint)
+        if last is not None and now - last < self.cooldown_seconds:
+            self.suppressed += 1
+            return False
+        self.last_sent[fingerprint] = now
+        return True
+
+    def _prune(self, now: float) -> None:
+        expired = [fp for fp, sent in self.last_sent.items() if now - sent >= self.cooldown_seconds]
+        for fp in expired:
+            del self.last_sent[fp]
+
+    # ─── State ──────────────────────────────────────────────────────────
+
+    def summary(self) -> Dict[str, Any]:
+        trend = self.regression.trend()
+        steps = None
+        if self.threshold is not None and self.regression.last is not None:
+            steps = steps_to_threshold(
+                self.regression.slope, self.regression.last, self.threshold, self.direction)
+        return {
+            "observations": self.regression.y.count,
+            "last_value": self.regression.last,
+            "trend": trend,
+            "threshold": self.threshold,
+            "direction": self.direction,
+            "steps_until_crossing": steps,
+            "active_alerts": [
+                {"type": kind, "fingerprint": a["fingerprint"], "since": a["since"],
+                 "severity": a["alert"].get("severity")}
+                for kind, a in self.active.items()
+            ],
+            "cooldown_seconds": self.cooldown_seconds,
+            "suppressed": self.suppressed,
+            "anomaly_window": self.window.summary(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cooldown_seconds": self.cooldown_seconds,
+            "threshold": self.threshold,
+            "direction": self.direction,
+            "regression": self.regression.to_dict(),
+            "window": self.window.to_dict(),
+            "active": self.active,
+            "last_sent": self.last_sent,
+            "suppressed": self.suppressed,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "MetricAlertState":
+        metric_state = cls(state.get("cooldown_seconds", 3600), state.get("threshold"),
+                           state.get("direction", "above"))
+        metric_state.regression = RunningRegression.from_dict(state.get("regression", {}))
+        if "window" in state:
+            metric_state.window = RobustWindow.from_dict(state["window"])
+        metric_state.active = state.get("active", {})
+        metric_state.last_sent = state.get("last_sent", {})
+        metric_state.suppressed = int(state.get("suppressed", 0))
+        return metric_state
+
+
+class AlertEngine:
+    """
+    Per-metric incremental alerting:
+    - push new observations; trend slope / threshold ETA update in O(1) per point
+    - only transitions are returned (raised / resolved), each fingerprint
+      at most once per cool-down window — re-running an automation does not
+      re-send the same alert
+    - bounded number of metrics in memory (LRU)
+    - optional SQLite file (`db_path`): state survives restarts and is shared
+      by uvicorn workers (read-modify-write in one IMMEDIATE transaction)
+    """
+
+    DIRECTIONS = ("above", "below")
+
+    def __init__(self, db_path: Optional[str] = None, max_metrics: int = 1000,
+                 cooldown_seconds: float = 3600):
+        self.cooldown_seconds = cooldown_seconds
+        self._store = MetricStateStore("alert_state", MetricAlertState.from_dict,
+                                       db_path, max_metrics)
+
+    def push(self, metric: str, values: List[Optional[float]], timestamps: List[Any] = None,
+             threshold: float = None, direction: str = None, cooldown_seconds: float = None,
+             window: int = 60, z_threshold: float = 3.5, min_points: int = 8,
+             metric_name: str = None, now: float = None) -> Dict[str, Any]:
+        """
+        Append observations to a metric (metric_name: display name in messages,
+        defaults to the metric key). threshold / direction / cooldown_seconds
+        update the metric's config when given; the anomaly window settings
+        apply when the metric is first created.
+        """
+        if direction is not None and direction not in self.DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(self.DIRECTIONS)}")
+        with self._store.transaction():
+            state = self._store.load(metric)
+            if state is None:
+                state = MetricAlertState(
+                    self.cooldown_seconds if cooldown_seconds is None else cooldown_seconds,
+                    threshold, direction or "above", window, z_threshold, min_points)
+            else:
+                if threshold is not None:
+                    state.threshold = threshold
+                if direction is not None:
+                    state.direction = direction
+                if cooldown_seconds is not None:
+                    state.cooldown_seconds = float(cooldown_seconds)
+
+            events = state.push(metric_name or metric, values, timestamps, now)
+            self._store.store(metric, state)
+            summary = state.summary()
+
+        events.sort(key=lambda e: _SEVERITY_RANK.get(e.get("severity"), 0), reverse=True)
+        return {"metric": metric, "events": events, "state": summary}
+
+    def state(self, metric: str) -> Optional[Dict[str, Any]]:
+        with self._store.transaction():
+            state = self._store.load(metric)
+            return state.summary() if state else None
+
+    def reset(self, metric: str) -> bool:
+        with self._store.transaction():
+            return self._store.delete(metric)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Serializable state of every in-memory metric (restore with `restore`)"""
+        with self._store.transaction():
+            return {metric: state.to_dict() for metric, state in self._store.cached().items()}
+
+    def restore(self, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        with self._store.transaction():
+            for metric, data in snapshot.items():
+                self._store.store(metric, MetricAlertState.from_dict(data))
+
+
+# Singleton instance (AI_ALERT_STATE_DB = file SQLite, AI_ALERT_COOLDOWN = giây)
+alert_engine = AlertEngine(
+    db_path=os.getenv("AI_ALERT_STATE_DB") or None,
+    cooldown_seconds=float(os.getenv("AI_ALERT_COOLDOWN", "3600")),
+)
@@ -0,0 +1,165 @@
+"""
+Column Statistics
+Thống kê mô tả theo cột trong một lượt NumPy: count / sum / avg / min / max / std
+và p50 / p95 / p99 (partition, không sort toàn bộ). Kết quả memo theo bảng để
+các section của report dùng chung.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .series import ColumnarFrame, ColumnarSeries
+
+QUANTILES = (50, 95, 99)
+
+_NUMBER_TYPES = (int, float)  # như isinstance trong report cũ: bool tính là số
+
+
+def describe(values: np.ndarray) -> Optional[Dict[str, Any]]:
+    """
+    Descriptive statistics of a 1-D numeric array (NaN ignored), None if empty.
+    Integer input keeps integer min / max / sum; std is the population std
+    (as PatternRecognizer); percentiles use linear interpolation.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == "b":
+        values = values.astype(np.int64)
+    elif values.dtype.kind not in "iuf":
+        values = values.astype(float)
+    if values.dtype.kind == "f":
+        values = values[~np.isnan(values)]
+    count = len(values)
+    if not count:
+        return None
+
+    integral = values.dtype.kind in "iu"
+    total = values.sum()
+    # Một lần partition (introselect, O(n)) cho cả min / max và các percentile
+    low, *percentiles, high = np.percentile(values, (0,) + QUANTILES + (100,))
+    result = {
+        "count": int(count),
+        "min": _scalar(values.min() if integral else low, integral),
+        "max": _scalar(values.max() if integral else high, integral),
+        "avg": float(total) / count,
+        "sum": _scalar(total, integral),
+        "std": float(values.std()) if count > 1 else 0.0,
+    }
+    for q, value in zip(QUANTILES, percentiles):
+        result[f"p{q}"] = float(value)
+    return result
+
+
+class TableStatistics:
+    """
+    Statistics of one table, each column computed at most once:
+    - numeric(): describe() of every column with number cells (strings ignored,
+      like the row-based summary) — typed columns (dataset registry) stay
+      vectorized end to end
+    - date_ranges(): earliest / latest of "date" / "time" columns
+    - series(): value column view for PatternRecognizer / AnalysisContext
+
+    Build it once per request (`of`) and hand it to every report section.
+    """
+
+    __slots__ = ("frame", "_numeric", "_date_ranges")
+
+    def __init__(self, frame: ColumnarFrame):
+        self.frame = frame
+        self._numeric: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._date_ranges: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @classmethod
+    def of(cls, data) -> "TableStatistics":
+        """`data` itself if it already is one, else rows / ColumnarFrame → statistics"""
+        if isinstance(data, cls):
+            return data
+        if isinstance(data, ColumnarFrame):
+            return cls(data)
+        return cls(ColumnarFrame.from_rows(data or []))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def column(self, name: str) -> Optional[Dict[str, Any]]:
+        """describe() of the number cells of a column (None if it has none)"""
+        if name not in self._numeric:
+            self._numeric[name] = describe(_number_cells(self.frame.column(name)))
+        return self._numeric[name]
+
+    def numeric(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for col in self.frame.header:
+            stats = self.column(col)
+            if stats is not None:
+                result[col] = stats
+        return result
+
+    def date_ranges(self) -> Dict[str, Dict[str, Any]]:
+        if self._date_ranges is None:
+            self._date_ranges = {}
+            for col in self.frame.header:
+                if "date" not in col.lower() and "time" not in col.lower():
+                    continue
+                dates = _date_cells(self.frame.column(col))
+                if not dates:
+                    continue
+                earliest, latest = min(dates), max(dates)
+                self._date_ranges[col] = {
+                    "earliest": earliest,
+                    "latest": latest,
+                    "span_days": _span_days(earliest, latest),
+                }
+        return self._date_ranges
+
+    def series(self, value_column: str, date_column: str = None) -> ColumnarSeries:
+        return self.frame.series(value_column, date_column)
+
+
+def _number_cells(raw) -> np.ndarray:
+    """Number cells of a column: typed arrays as-is, lists filtered by type"""
+    if isinstance(raw, np.ndarray) and raw.dtype.kind in "biuf":
+        return raw
+    numbers = [v for v in raw if isinstance(v, _NUMBER_TYPES)]
+    if not numbers:
+        return np.empty(0)
+    values = np.array(numbers)
+    if values.dtype.kind not in "biuf":  # int ngoài int64
+        values = values.astype(float)
+    return values
+
+
+def _present_cells(raw) -> List[Any]:
+    """Truthy cells as Python values (typed text arrays: non-empty strings)"""
+    if isinstance(raw, np.ndarray):
+        if raw.dtype.kind == "f":
+            raw = raw[~np.isnan(raw)]
+        raw = raw.tolist()
+    return [v for v in raw if v]
+
+
+def _date_cells(raw) -> List[Any]:
+    """
+    Present cells of one comparable kind (the most common cell type, int / float
+    counted together), so min / max cannot raise on a mixed column
+    """
+    cells = _present_cells(raw)
+    kinds = [float if type(v) in _NUMBER_TYPES else type(v) for v in cells]
+    counts: Dict[Any, int] = {}
+    for kind in kinds:
+        counts[kind] = counts.get(kind, 0) + 1
+    if len(counts) <= 1:
+        return cells
+    kind = max(counts, key=counts.get)
+    return [v for v, k in zip(cells, kinds) if k is kind]
+
+
+def _span_days(earliest: Any, latest: Any) -> Optional[int]:
+    try:
+        return (latest - earliest).days
+    except (TypeError, AttributeError):
+        return None
+
+
+def _scalar(value: Any, integral: bool):
+    return int(value) if integral else float(value)
@@ -0,0 +1,173 @@
+"""
+Keyword Tagger
+Từ khóa → tag / priority cho SmartCategorizer: toàn bộ từ vựng biên dịch thành
+một automaton Aho-Corasick, mỗi chuỗi chỉ quét 1 lần (không dấu, không phân biệt hoa thường).
+Từ vựng đọc từ config/keyword_tags.json (hoặc AI_KEYWORD_TAGS).
+"""
+
+import json
+import logging
+import os
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from .text_fold import fold_text
+
+try:
+    import ahocorasick  # pyahocorasick (C), tùy chọn
+    HAS_PYAHOCORASICK = True
+except ImportError:
+    HAS_PYAHOCORASICK = False
+
+logger = logging.getLogger(__name__)
+
+# Mức priority, thấp → cao (index = level)
+PRIORITIES = ("normal", "medium", "high")
+
+DEFAULT_VOCABULARY: Dict[str, Any] = {
+    "priority": {
+        "high": ["urgent", "critical", "asap"],
+        "medium": ["important", "soon"],
+    },
+    "tags": {
+        "sales": ["sale", "discount", "promo"],
+        "issues": ["error", "issue", "problem"],
+        "new": ["new", "created"],
+    },
+}
+
+DEFAULT_VOCABULARY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "keyword_tags.json")
+
+
+class KeywordTagger:
+    """
+    Multi-pattern keyword matcher:
+    - vocabulary {"priority": {level: [words]}, "tags": {tag: [words]}}
+    - keywords and text are folded (lowercase, Vietnamese diacritics stripped),
+      so "khẩn" matches "KHAN" and "Khẩn cấp"; matches are substrings, like `in`
+    - scan(text) → (priority level, tag bitmask), one pass over the text
+      whatever the vocabulary size (pyahocorasick if installed, else pure Python)
+    """
+
+    def __init__(self, vocabulary: Optional[Dict[str, Any]] = None):
+        vocabulary = DEFAULT_VOCABULARY if vocabulary is None else vocabulary
+        self.tags: List[str] = list(vocabulary.get("tags", {}))
+
+        outputs: Dict[str, List[int]] = {}  # folded keyword → [level, tag bits]
+        for level_name, words in vocabulary.get("priority", {}).items():
+            if level_name not in PRIORITIES:
+                raise ValueError(
+                    f"Unknown priority '{level_name}' (expected one of {', '.join(PRIORITIES)})")
+            level = PRIORITIES.index(level_name)
+            for word in self._fold_words(words):
+                out = outputs.setdefault(word, [0, 0])
+                out[0] = max(out[0], level)
+        for bit, tag in enumerate(self.tags):
+            for word in self._fold_words(vocabulary["tags"][tag]):
+                outputs.setdefault(word, [0, 0])[1] |= 1 << bit
+        self.keyword_count = len(outputs)
+
+        self._automaton = None
+        if HAS_PYAHOCORASICK and outputs:
+            self._automaton = ahocorasick.Automaton()
+            for word, (level, bits) in outputs.items():
+                self._automaton.add_word(word, (level, bits))
+            self._automaton.make_automaton()
+        else:
+            self._build_trie(outputs)
+        self._tag_lists: Dict[int, List[str]] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> "KeywordTagger":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _fold_words(words) -> List[str]:
+        if isinstance(words, str):
+            words = [words]
+        return [folded for folded in (fold_text(str(w)).strip() for w in words) if folded]
+
+    def scan(self, text: str) -> Tuple[int, int]:
+        """(highest priority level, OR of tag bits) over every keyword found in text"""
+        text = fold_text(text)
+        level = bits = 0
+        if self._automaton is not None:
+            for _, (match_level, match_bits) in self._automaton.iter(text):
+                if match_level > level:
+                    level = match_level
+                bits |= match_bits
+            return level, bits
+
+        goto, fail, out_level, out_bits = self._goto, self._fail, self._out_level, self._out_bits
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out_level[node] > level:
+                level = out_level[node]
+            bits |= out_bits[node]
+        return level, bits
+
+    def tag_names(self, bits: int) -> List[str]:
+        """Tag bitmask → tag names, in vocabulary order (shared list: do not mutate)"""
+        names = self._tag_lists.get(bits)
+        if names is None:
+            names = self._tag_lists[bits] = [
+                tag for bit, tag in enumerate(self.tags) if bits >> bit & 1]
+        return names
+
+    def _build_trie(self, outputs: Dict[str, List[int]]) -> None:
+        """Pure-Python Aho-Corasick: trie + failure links, outputs merged along the links"""
+        goto: List[Dict[str, int]] = [{}]
+        out_level = [0]
+        out_bits = [0]
+        for word, (level, bits) in outputs.items():
+            node = 0
+            for ch in word:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = goto[node][ch] = len(goto)
+                    goto.append({})
+                    out_level.append(0)
+                    out_bits.append(0)
+                node = nxt
+            out_level[node] = max(out_level[node], level)
+            out_bits[node] |= bits
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f].get(ch, 0)
+                # khớp ở node con ⊇ khớp ở node fail (hậu tố)
+                out_level[child] = max(out_level[child], out_level[fail[child]])
+                out_bits[child] |= out_bits[fail[child]]
+
+        self._goto, self._fail = goto, fail
+        self._out_level, self._out_bits = out_level, out_bits
+
+
+def load_keyword_tagger(path: Optional[str] = None) -> KeywordTagger:
+    """Tagger from AI_KEYWORD_TAGS / config/keyword_tags.json, built-in vocabulary if unreadable"""
+    path = path or os.getenv("AI_KEYWORD_TAGS") or DEFAULT_VOCABULARY_PATH
+    try:
+        tagger = KeywordTagger.from_file(path)
+        logger.info("Keyword tagger: %d keywords, %d tags from %s",
+                    tagger.keyword_count, len(tagger.tags), path)
+        return tagger
+    except Exception as exc:
+        logger.warning("Keyword tagger: could not load %s (%s) — using built-in vocabulary",
+                       path, exc)
+        return KeywordTagger()
+
+
+# Singleton instance (AI_KEYWORD_TAGS = đường dẫn file từ vựng)
+keyword_tagger = load_keyword_tagger()
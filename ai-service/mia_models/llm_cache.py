@@ -0,0 +1,279 @@
+"""
+LLM Response Cache
+Cache cho Claude fallback của NLPProcessor: query chuẩn hóa → kết quả parse,
+LRU + TTL trong bộ nhớ, thêm file SQLite (tùy chọn), gộp các request trùng đang chạy.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PUNCT = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """NFC + casefold, punctuation dropped, whitespace collapsed (diacritics kept: "bán" ≠ "bàn")"""
+    text = unicodedata.normalize("NFC", query).casefold()
+    return _SPACES.sub(" ", _PUNCT.sub(" ", text)).strip()
+
+
+class _Flight:
+    """One in-progress call that identical concurrent queries wait on."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class LLMResponseCache:
+    """
+    Cache for LLM calls keyed by normalized query (+ context):
+    - in-memory LRU with TTL
+    - optional SQLite file (`db_path`) shared across restarts / workers
+    - single-flight: concurrent callers of the same key wait for the one
+      call already in flight instead of issuing their own
+    - *_async methods keep SQLite I/O off the event loop (asyncio.to_thread)
+    - failures are not cached (the next caller retries)
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 db_path: Optional[str] = None, wait_timeout: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.wait_timeout = wait_timeout
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._counters = {"hits": 0, "db_hits": 0, "misses": 0, "coalesced": 0,
+                          "stores": 0, "errors": 0, "evictions": 0}
+        if db_path:
+            self._open_db()
+
+    @staticmethod
+    def make_key(query: str, context: Optional[Dict[str, Any]] = None) -> str:
+        if not context:
+            return normalize_query(query)
+        return f"{normalize_query(query)}\x1f{json.dumps(context, sort_keys=True, default=str)}"
+
+    def lookup(self, key: str, count_miss: bool = True) -> Tuple[bool, Any]:
+        """
+        Non-blocking read (memory, then SQLite) — for callers that run the call
+        themselves (count_miss=False: they count misses / coalesced via count())
+        """
+        now = time.time()
+        hit, value = self._memory_get(key, now)
+        if hit:
+            return hit, value
+        return self._resolve(key, self._db_get(key, now), count_miss)
+
+    async def lookup_async(self, key: str, count_miss: bool = True) -> Tuple[bool, Any]:
+        """lookup() for the event loop: the SQLite read runs in a worker thread"""
+        hits = await self.lookup_many_async([key], count_miss)
+        return (True, hits[key]) if key in hits else (False, None)
+
+    async def lookup_many_async(self, keys: List[str],
+                                count_miss: bool = True) -> Dict[str, Any]:
+        """Cached values for the keys that hit; SQLite misses read in one worker-thread call"""
+        now = time.time()
+        found: Dict[str, Any] = {}
+        remaining = []
+        for key in keys:
+            hit, value = self._memory_get(key, now)
+            if hit:
+                found[key] = value
+            else:
+                remaining.append(key)
+        if not remaining:
+            return found
+        stored = ([None] * len(remaining) if self._db is None else await asyncio.to_thread(
+            lambda: [self._db_get(key, now) for key in remaining]))
+        for key, row in zip(remaining, stored):
+            hit, value = self._resolve(key, row, count_miss)
+            if hit:
+                found[key] = value
+        return found
+
+    def _memory_get(self, key: str, now: float) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return True, entry[1]
+                del self._entries[key]
+        return False, None
+
+    def _resolve(self, key: str, stored: Optional[Tuple[float, Any]],
+                 count_miss: bool) -> Tuple[bool, Any]:
+        with self._lock:
+            if stored is not None:
+                self._remember(key, *stored)
+                self._counters["db_hits"] += 1
+                return True, stored[1]
+            if count_miss:
+                self._counters["misses"] += 1
+        return False, None
+
+    def count(self, counter: str, n: int = 1) -> None:
+        """Bump a counter reported by stats() (e.g. coalesced / errors from an async caller)"""
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + n
+
+    def get_or_call(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Cached value for key, else fn() — at most one fn() per key at a time"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                raise TimeoutError(f"LLM call for {key[:60]!r} still running")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            stored = self._db_get(key, now)
+            if stored is not None:
+                with self._lock:
+                    self._remember(key, *stored)
+                    self._counters["db_hits"] += 1
+                flight.value = stored[1]
+                return flight.value
+
+            with self._lock:
+                self._counters["misses"] += 1
+            try:
+                value = fn()
+            except BaseException as exc:
+                with self._lock:
+                    self._counters["errors"] += 1
+                flight.error = exc
+                raise
+            if value is not None:
+                self.set(key, value)
+            flight.value = value
+            return value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def set(self, key: str, value: Any) -> None:
+        self._db_set(key, self._store_memory(key, value), value)
+
+    async def set_async(self, key: str, value: Any) -> None:
+        """set() for the event loop: the SQLite write runs in a worker thread"""
+        expires_at = self._store_memory(key, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, expires_at, value)
+
+    def _store_memory(self, key: str, value: Any) -> float:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._counters["stores"] += 1
+        return expires_at
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._counters["hits"] + self._counters["db_hits"] + self._counters["coalesced"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "in_flight": len(self._flights),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ─── SQLite tier ────────────────────────────────────────────────────
+
+    def _open_db(self) -> None:
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")  # nhiều worker uvicorn đọc/ghi cùng file
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)")
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+        except sqlite3.Error as exc:
+            logger.warning("LLM cache: SQLite disabled (%s): %s", self.db_path, exc)
+            self._db = None
+
+    def _db_get(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT expires_at, value FROM llm_cache WHERE key = ? AND expires_at > ?",
+                    (key, now)).fetchone()
+            return (row[0], json.loads(row[1])) if row else None
+        except (sqlite3.Error, ValueError) as exc:
+            logger.warning("LLM cache: read failed: %s", exc)
+            return None
+
+    def _db_set(self, key: str, expires_at: float, value: Any) -> None:
+        if self._db is None:
+            return
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                    (key, expires_at, payload))
+                self._db.commit()
+        except (sqlite3.Error, TypeError, ValueError) as exc:
+            logger.warning("LLM cache: write failed: %s", exc)
@@ -6,14 +6,25 @@ Hybrid mode: regex-first, Claude API fallback when confidence < 0.6.
 Set ANTHROPIC_API_KEY to enable; falls back gracefully if not set.
 """
 
+import asyncio
+import copy
 import json
 import logging
 import os
 import re
-from collections import Counter
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+try:
+    from re import _parser as _sre_parse  # Python ≥ 3.11
+except ImportError:  # pragma: no cover
+    try:
+        import sre_parse as _sre_parse
+    except ImportError:
+        _sre_parse = None  # _prefilter → không lọc trước
+
+from .llm_cache import LLMResponseCache
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -21,14 +32,17 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 
 _claude_client = None
+_claude_async_client = None  # /ai/chat: không chặn event loop
 _CLAUDE_MODEL = "claude-haiku-4-5-20251001"
 _CONFIDENCE_THRESHOLD = 0.6  # Below this → use Claude fallback
+_CLAUDE_BATCH_SIZE = 20  # queries per prompt in process_chat_batch_async
 
 try:
     import anthropic as _anthropic
     _api_key = os.getenv("ANTHROPIC_API_KEY", "")
     if _api_key:
         _claude_client = _anthropic.Anthropic(api_key=_api_key)
+        _claude_async_client = _anthropic.AsyncAnthropic(api_key=_api_key)
         logger.info("NLP hybrid: Claude API enabled (%s)", _CLAUDE_MODEL)
     else:
         logger.info("NLP hybrid: ANTHROPIC_API_KEY not set — regex-only mode")
@@ -53,6 +67,226 @@ except ImportError:
             variance = sum((x - mean_val) ** 2 for x in arr) / len(arr)
             return variance ** 0.5
 
+try:
+    from .search_index import BM25Index, NgramVectorIndex, SearchIndexCache, table_fingerprint
+    from .series import ColumnarFrame
+    HAS_SEARCH_INDEX = True
+except ImportError:
+    HAS_SEARCH_INDEX = False
+
+
+_STOP_WORDS = frozenset({"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by"})
+
+_ENTITY_KEYS = {"date": "dates", "number": "numbers", "column": "columns"}
+_DIGIT = re.compile(r"\d")
+_WORD = re.compile(r"\b\w+\b")
+
+
+class _QueryScanner:
+    """
+    Intent + entity patterns compiled once, scanned in one call per query.
+
+    Each pattern gets a prefilter derived from its parse tree: a literal
+    substring it cannot match without, and whether it needs a digit. A
+    pattern only runs when its prefilter passes (`in` is a C substring
+    search), so most of the ~40 patterns cost a few dozen nanoseconds.
+    Intent scores, confidence and entities all come out of the same scan —
+    nothing is matched twice. Results are identical to calling re.search /
+    re.findall per pattern.
+    """
+
+    def __init__(self, intent_patterns: Dict[str, List[str]],
+                 entity_patterns: Dict[str, List[str]]):
+        self.intents = list(intent_patterns)
+        self.intent_sizes = [len(p) for p in intent_patterns.values()]
+        self.intent_rules = [
+            (i, re.compile(pattern, re.IGNORECASE), *_prefilter(pattern))
+            for i, patterns in enumerate(intent_patterns.values())
+            for pattern in patterns
+        ]
+        self.entity_rules = [
+            (_ENTITY_KEYS.get(kind, kind), re.compile(pattern, re.IGNORECASE), *_prefilter(pattern))
+            for kind, patterns in entity_patterns.items()
+            for pattern in patterns
+        ]
+        self.entity_keys = list(dict.fromkeys(key for key, *_ in self.entity_rules))
+
+    def scan(self, query: str):
+        """Lowercased query → (intent scores, entities by key, words)"""
+        has_digit = _DIGIT.search(query) is not None
+
+        scores = [0] * len(self.intents)
+        for i, regex, gate, needs_digit in self.intent_rules:
+            if (gate is None or any(map(query.__contains__, gate))) and (has_digit or not needs_digit):
+                if regex.search(query):
+                    scores[i] += 1
+
+        entities = {key: [] for key in self.entity_keys}
+        for key, regex, gate, needs_digit in self.entity_rules:
+            if (gate is None or any(map(query.__contains__, gate))) and (has_digit or not needs_digit):
+                entities[key].extend(regex.findall(query))
+
+        return scores, entities, _WORD.findall(query)
+
+
+def _prefilter(pattern: str):
+    """
+    (required literals, needs digit) for a pattern. The pattern cannot match
+    unless at least one of the literals occurs in the query — a plain
+    substring, or one per alternative of a required (a|b|c) group.
+    Conservative: anything the parse tree does not guarantee is left out.
+    """
+    try:
+        return _literal_gate(pattern)
+    except Exception:
+        # re._parser là API nội bộ: nếu đổi cấu trúc thì bỏ prefilter, regex vẫn chạy
+        return None, False
+
+
+def _literal_gate(pattern: str):
+    parsed = _sre_parse.parse(pattern)
+    candidates: List[tuple] = []
+    needs_digit = False
+
+    def runs_of(items, required: bool, out: List[str]):
+        nonlocal needs_digit
+        current: List[str] = []
+        for op, av in items:
+            if op is _sre_parse.LITERAL and required:
+                current.append(chr(av))
+                continue
+            if current:
+                out.append("".join(current))
+                current = []
+            if op is _sre_parse.SUBPATTERN:
+                runs_of(av[-1], required, out)
+            elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT):
+                runs_of(av[2], required and av[0] >= 1, out)
+            elif op is _sre_parse.BRANCH and required:
+                best = []
+                for alternative in av[1]:
+                    alt_runs: List[str] = []
+                    runs_of(alternative, True, alt_runs)
+                    best.append(max(alt_runs, key=len) if alt_runs else "")
+                if all(best):
+                    candidates.append(tuple(best))
+            elif op is _sre_parse.IN and required and out is top:
+                if av == [(_sre_parse.CATEGORY, _sre_parse.CATEGORY_DIGIT)]:
+                    needs_digit = True
+        if current:
+            out.append("".join(current))
+
+    top: List[str] = []
+    runs_of(parsed, True, top)
+    candidates.extend((run,) for run in top)
+    if not candidates:
+        return None, needs_digit
+    # Cổng chọn lọc nhất: literal ngắn nhất trong nhóm càng dài càng tốt
+    gate = max(candidates, key=lambda c: min(len(x) for x in c))
+    return tuple(x.lower() for x in gate), needs_digit
+
+
+def _parse_claude_json(raw: str) -> Dict[str, Any]:
+    raw = raw.strip()
+    # Strip markdown code fences if present
+    if raw.startswith("```"):
+        raw = re.sub(r"^```[a-z]*\n?", "", raw).rstrip("`").strip()
+    return json.loads(raw)
+
+
+def _is_date_field(name: str) -> bool:
+    name = str(name).lower()
+    return "date" in name or "time" in name
+
+
+def _summarize_rows(rows: List[Dict[str, Any]]):
+    """
+    {field: [count, sum, min, max]} for int/float values + (min, max) of the
+    first date-like field, in one pass over row dicts
+    """
+    numeric: Dict[str, list] = {}
+    dates: Dict[str, list] = {}  # field → [min, max]; thứ tự = lần đầu gặp
+    date_like: Dict[str, bool] = {}
+    is_date_like = date_like.get
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, (int, float)):
+                stats = numeric.get(key)
+                if stats is None:
+                    numeric[key] = [1, value, value, value]
+                else:
+                    stats[0] += 1
+                    stats[1] += value
+                    if value < stats[2]:
+                        stats[2] = value
+                    if value > stats[3]:
+                        stats[3] = value
+            is_date = is_date_like(key)
+            if is_date is None:
+                is_date = date_like[key] = _is_date_field(key)
+                if is_date:
+                    dates[key] = None
+            if is_date and value and value == value:  # value == value: bỏ NaN
+                _widen(dates, key, value)
+    first_date = next(iter(dates.values()), None)
+    return numeric, tuple(first_date) if first_date else None
+
+
+def _widen(bounds_by_field: Dict[str, list], key: str, value: Any) -> None:
+    bounds = bounds_by_field[key]
+    if bounds is None:
+        bounds_by_field[key] = [value, value]
+        return
+    try:
+        if value < bounds[0]:
+            bounds[0] = value
+        if value > bounds[1]:
+            bounds[1] = value
+    except TypeError:  # kiểu lẫn lộn — bỏ qua giá trị này
+        pass
+
+
+def _summarize_cells(cells) -> Optional[list]:
+    """[count, sum, min, max] of the int/float cells of one column (None if there are none)"""
+    count, total, low, high = 0, 0, None, None
+    for value in cells:
+        if isinstance(value, (int, float)):
+            if count:
+                total += value
+                if value < low:
+                    low = value
+                if value > high:
+                    high = value
+            else:
+                total, low, high = value, value, value
+            count += 1
+    return [count, total, low, high] if count else None
+
+
+def _summarize_columns(frame):
+    """_summarize_rows for a ColumnarFrame: typed NumPy columns reduce without a Python loop"""
+    numeric: Dict[str, list] = {}
+    date_range = None
+    date_field = next((col for col in frame.header if _is_date_field(col)), None)
+    for col in frame.header:
+        raw = frame.column(col)
+        if isinstance(raw, np.ndarray) and raw.dtype.kind in "fiu":
+            values = raw[~np.isnan(raw)] if raw.dtype.kind == "f" else raw
+            if len(values):
+                numeric[col] = [len(values), values.sum().item(),
+                                values.min().item(), values.max().item()]
+        elif not (isinstance(raw, np.ndarray) and raw.dtype.kind in "UO"):
+            stats = _summarize_cells(raw)
+            if stats is not None:
+                numeric[col] = stats
+        if col == date_field:
+            bounds = {col: None}
+            for value in (raw.tolist() if isinstance(raw, np.ndarray) else raw):
+                if value and value == value:  # NaN truthy nhưng không so sánh được
+                    _widen(bounds, col, value)
+            date_range = tuple(bounds[col]) if bounds[col] else None
+    return numeric, date_range
+
 
 class NLPProcessor:
     """
@@ -60,10 +294,28 @@ class NLPProcessor:
     - Chat interface for data queries
     - Voice commands processing
     - Auto-generated summaries
-    - Smart search across all data
+    - Smart search across all data (BM25 inverted index, diacritic-insensitive;
+      "vector" mode for similar wording)
     """
 
-    def __init__(self):
+    SEARCH_MODES = ("keyword", "vector")
+
+    def __init__(self, claude_client=None, claude_cache: LLMResponseCache = None,
+                 claude_async_client=None):
+        # claude_client / claude_async_client: object có .messages.create(...) (stub khi test)
+        self.claude_client = claude_client if claude_client is not None else _claude_client
+        self.claude_async_client = (claude_async_client if claude_async_client is not None
+                                    else _claude_async_client)
+        self.claude_latency_budget = float(os.getenv("AI_CLAUDE_LATENCY_BUDGET", "2.5"))
+        self.claude_max_concurrency = int(os.getenv("AI_CLAUDE_MAX_CONCURRENCY", "4"))
+        self._claude_tasks: Dict[str, "asyncio.Future"] = {}  # key → kết quả đang chờ
+        self._claude_calls = 0  # LLM call đang chạy (1 batch = 1 call)
+        self._claude_batches: set = set()
+        self.claude_cache = claude_cache if claude_cache is not None else LLMResponseCache(
+            max_entries=int(os.getenv("AI_CLAUDE_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("AI_CLAUDE_CACHE_TTL", "3600")),
+            db_path=os.getenv("AI_CLAUDE_CACHE_DB") or None,
+        )
         self.intent_patterns = {
             "query_data": [
                 r"show (me )?data",
@@ -128,27 +380,40 @@ class NLPProcessor:
                 r"([\w]+) field",
             ],
         }
+        self.compile_patterns()
+        self._search_indexes = SearchIndexCache() if HAS_SEARCH_INDEX else None
 
-    def process_chat_query(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Process natural language query — regex first, Claude fallback if confidence < threshold."""
-        query_lower = query.lower().strip()
+    def compile_patterns(self) -> None:
+        """(Re)build the single-pass scanner — call again after editing the pattern dicts"""
+        self._scanner = _QueryScanner(self.intent_patterns, self.entity_patterns)
 
-        intent = self._detect_intent(query_lower)
-        entities = self._extract_entities(query_lower)
-        confidence = self._calculate_confidence(query_lower, intent)
+    def analyze_query(self, query: str) -> Dict[str, Any]:
+        """Intent, confidence and entities of a query from one scan (benchmarks/bench_nlp_intent.py)"""
+        scores, found, keywords = self._scanner.scan(query.lower())
 
-        parsed = {
-            "intent": intent,
-            "entities": entities,
-            "original_query": query,
-            "confidence": confidence,
-            "timestamp": datetime.now().isoformat(),
-            "source": "regex",
+        intent = "unknown"
+        confidence = 0.0
+        if scores:
+            # max() giữ intent đầu tiên khi hòa — như bản cũ
+            best = max(range(len(scores)), key=scores.__getitem__)
+            intent = self._scanner.intents[best]
+            size = self._scanner.intent_sizes[best]
+            confidence = min(scores[best] / size, 1.0) if size else 0.0
+
+        entities = {
+            "dates": found.get("dates", []),
+            "numbers": found.get("numbers", []),
+            "columns": found.get("columns", []),
+            "keywords": [w for w in keywords if w not in _STOP_WORDS and len(w) > 2],
         }
-        parsed["query_structure"] = self._generate_query_structure(parsed, context)
+        return {"intent": intent, "confidence": confidence, "entities": entities}
+
+    def process_chat_query(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Process natural language query — regex first, Claude fallback if confidence < threshold."""
+        parsed = self._regex_parse(query, context)
 
         # Hybrid fallback: use Claude when regex confidence is too low
-        if confidence < _CONFIDENCE_THRESHOLD and _claude_client is not None:
+        if parsed["confidence"] < _CONFIDENCE_THRESHOLD and self.claude_client is not None:
             try:
                 claude_result = self._claude_parse(query, context)
                 if claude_result:
@@ -159,8 +424,274 @@ class NLPProcessor:
 
         return parsed
 
+    async def process_chat_query_async(self, query: str, context: Dict[str, Any] = None,
+                                       latency_budget: float = None) -> Dict[str, Any]:
+        """
+        process_chat_query for async handlers: the Claude fallback uses the
+        async client and waits at most `latency_budget` seconds. A slower call
+        keeps running in the background and fills the cache for the next
+        identical query; this one gets the regex result.
+        """
+        parsed = self._regex_parse(query, context)
+        if parsed["confidence"] >= _CONFIDENCE_THRESHOLD or self.claude_async_client is None:
+            return parsed
+
+        key = self.claude_cache.make_key(query, context)
+        hit, data = await self.claude_cache.lookup_async(key, count_miss=False)
+        if not hit:
+            task = self._claude_tasks.get(key)
+            if task is not None:
+                self.claude_cache.count("coalesced")
+            elif self._claude_calls >= self.claude_max_concurrency:
+                self.claude_cache.count("misses")
+                self.claude_cache.count("skipped_busy")
+                parsed["fallback"] = "llm_busy"
+                return parsed
+            else:
+                self.claude_cache.count("misses")
+                self._claude_calls += 1
+                task = asyncio.ensure_future(self._claude_request_async(key, query, context))
+                self._track_claude_future(key, task)
+
+            try:
+                data = await asyncio.wait_for(asyncio.shield(task),
+                                              self._claude_budget(latency_budget))
+            except asyncio.TimeoutError:
+                self.claude_cache.count("budget_timeouts")
+                parsed["fallback"] = "llm_timeout"
+                return parsed
+            except Exception as exc:
+                logger.warning("Claude NLP fallback failed: %s", exc)
+                return parsed
+
+        result = self._claude_result(query, data, context)
+        result["source"] = "claude"
+        return result
+
+    async def process_chat_batch_async(self, queries: List[str], context: Dict[str, Any] = None,
+                                       latency_budget: float = None) -> List[Dict[str, Any]]:
+        """
+        Parse many queries: all go through the regex scanner, only the
+        low-confidence ones reach Claude — cache hits first, the rest packed
+        `_CLAUDE_BATCH_SIZE` per call into one prompt whose JSON array is split
+        back per query. Same latency budget / concurrency cap as
+        process_chat_query_async; each answer is cached per query.
+        """
+        results = [self._regex_parse(q, context) for q in queries]
+        if self.claude_async_client is None:
+            return results
+
+        candidates: Dict[str, List[int]] = {}  # key → vị trí các query (trùng nhau thì gộp)
+        for i, parsed in enumerate(results):
+            if parsed["confidence"] >= _CONFIDENCE_THRESHOLD:
+                continue
+            key = self.claude_cache.make_key(queries[i], context)
+            if key in candidates:
+                candidates[key].append(i)
+                self.claude_cache.count("coalesced")
+            else:
+                candidates[key] = [i]
+        cached = await self.claude_cache.lookup_many_async(list(candidates), count_miss=False)
+        waiting: Dict[str, List[int]] = {}
+        for key, positions in candidates.items():
+            if key in cached:
+                self._apply_claude(results, positions, queries, cached[key], context)
+            else:
+                waiting[key] = positions
+        if not waiting:
+            return results
+
+        loop = asyncio.get_running_loop()
+        new_jobs: Dict[str, str] = {}
+        for key, positions in waiting.items():
+            if key in self._claude_tasks:
+                self.claude_cache.count("coalesced")
+            else:
+                self.claude_cache.count("misses")
+                new_jobs[key] = queries[positions[0]]
+
+        keys = list(new_jobs)
+        for start in range(0, len(keys), _CLAUDE_BATCH_SIZE):
+            chunk = keys[start:start + _CLAUDE_BATCH_SIZE]
+            if self._claude_calls >= self.claude_max_concurrency:
+                self.claude_cache.count("skipped_busy", len(keys) - start)
+                for key in keys[start:]:
+                    for i in waiting.pop(key):
+                        results[i]["fallback"] = "llm_busy"
+                break
+            self._claude_calls += 1
+            futures = {key: loop.create_future() for key in chunk}
+            for key, future in futures.items():
+                self._track_claude_future(key, future)
+            batch = asyncio.ensure_future(self._claude_batch_request_async(
+                {key: new_jobs[key] for key in chunk}, futures, context))
+            self._claude_batches.add(batch)  # giữ tham chiếu tới khi xong
+            batch.add_done_callback(self._claude_batches.discard)
+
+        if not waiting:
+            return results
+        pending = {asyncio.shield(self._claude_tasks[key]): key
+                   for key in waiting if key in self._claude_tasks}
+        done, not_done = (await asyncio.wait(set(pending), timeout=self._claude_budget(latency_budget))
+                          if pending else (set(), set()))
+        for future in done:
+            key = pending[future]
+            if future.exception() is None:
+                self._apply_claude(results, waiting[key], queries, future.result(), context)
+        if not_done:
+            self.claude_cache.count("budget_timeouts", len(not_done))
+            for future in not_done:
+                for i in waiting[pending[future]]:
+                    results[i]["fallback"] = "llm_timeout"
+        return results
+
+    def _apply_claude(self, results: List[Dict[str, Any]], positions: List[int],
+                      queries: List[str], data: Dict[str, Any],
+                      context: Dict[str, Any] = None) -> None:
+        for i in positions:
+            results[i] = self._claude_result(queries[i], data, context)
+            results[i]["source"] = "claude"
+
+    def claude_stats(self) -> Dict[str, Any]:
+        """Claude fallback cache counters + async call state"""
+        return {
+            **self.claude_cache.stats(),
+            "outstanding_calls": self._claude_calls,
+            "pending_queries": len(self._claude_tasks),
+            "max_concurrency": self.claude_max_concurrency,
+            "latency_budget": self.claude_latency_budget,
+        }
+
+    def _regex_parse(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        analysis = self.analyze_query(query.lower().strip())
+        parsed = {
+            "intent": analysis["intent"],
+            "entities": analysis["entities"],
+            "original_query": query,
+            "confidence": analysis["confidence"],
+            "timestamp": datetime.now().isoformat(),
+            "source": "regex",
+        }
+        parsed["query_structure"] = self._generate_query_structure(parsed, context)
+        return parsed
+
     def _claude_parse(self, query: str, context: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
-        """Call Claude haiku to parse intent/entities when regex confidence is low."""
+        """Parse intent/entities with Claude when regex confidence is low (cached, coalesced)."""
+        key = self.claude_cache.make_key(query, context)
+        data = self.claude_cache.get_or_call(key, lambda: self._claude_request(query, context))
+        return self._claude_result(query, data, context)
+
+    def _claude_result(self, query: str, data: Dict[str, Any],
+                       context: Dict[str, Any] = None) -> Dict[str, Any]:
+        data = copy.deepcopy(data)  # giá trị trong cache dùng chung giữa các request
+        return {
+            "intent": data.get("intent", "unknown"),
+            "entities": data.get("entities", {"dates": [], "numbers": [], "columns": [], "keywords": []}),
+            "original_query": query,
+            "confidence": float(data.get("confidence", 0.75)),
+            "response": data.get("response", ""),
+            "timestamp": datetime.now().isoformat(),
+            "query_structure": self._generate_query_structure(
+                {"intent": data.get("intent", "unknown"), "entities": data.get("entities", {})},
+                context,
+            ),
+        }
+
+    def _claude_request(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Call Claude haiku; returns the parsed JSON object."""
+        message = self.claude_client.messages.create(**self._claude_message_args(query, context))
+        return _parse_claude_json(message.content[0].text)
+
+    async def _claude_request_async(self, key: str, query: str,
+                                    context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Async Claude call; the result is cached even if every waiter gave up"""
+        try:
+            message = await self.claude_async_client.messages.create(
+                **self._claude_message_args(query, context))
+            data = _parse_claude_json(message.content[0].text)
+        except Exception:
+            self.claude_cache.count("errors")
+            raise
+        finally:
+            self._claude_calls -= 1
+        await self.claude_cache.set_async(key, data)
+        return data
+
+    async def _claude_batch_request_async(self, jobs: Dict[str, str],
+                                          futures: Dict[str, "asyncio.Future"],
+                                          context: Dict[str, Any] = None) -> None:
+        """One Claude call for several queries (key → query); resolves one future per key"""
+        try:
+            message = await self.claude_async_client.messages.create(
+                **self._claude_batch_message_args(list(jobs.values()), context))
+            answers = _parse_claude_json(message.content[0].text)
+            if not isinstance(answers, list):
+                raise ValueError("batch answer is not a JSON array")
+        except Exception as exc:
+            self.claude_cache.count("errors")
+            logger.warning("Claude NLP batch fallback failed: %s", exc)
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            self._claude_calls -= 1
+
+        by_index = {}
+        for position, answer in enumerate(answers):
+            if isinstance(answer, dict):
+                try:
+                    by_index[int(answer.pop("index", position))] = answer
+                except (TypeError, ValueError):
+                    by_index[position] = answer
+        for i, key in enumerate(jobs):
+            data = by_index.get(i)
+            if data is None:
+                futures[key].set_exception(ValueError(f"no answer for query #{i}"))
+                continue
+            futures[key].set_result(data)
+            await self.claude_cache.set_async(key, data)
+
+    def _track_claude_future(self, key: str, future: "asyncio.Future") -> None:
+        self._claude_tasks[key] = future
+        future.add_done_callback(lambda f: self._claude_future_done(key, f))
+
+    def _claude_future_done(self, key: str, future: "asyncio.Future") -> None:
+        self._claude_tasks.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # đã log ở nơi gọi; tránh "exception was never retrieved"
+
+    def _claude_budget(self, latency_budget: float = None) -> float:
+        if latency_budget is None:
+            return self.claude_latency_budget
+        return min(self.claude_latency_budget, latency_budget)
+
+    @staticmethod
+    def _claude_batch_message_args(queries: List[str], context: Dict[str, Any] = None) -> Dict[str, Any]:
+        system_prompt = (
+            "You are a data query intent parser. "
+            "You receive several numbered user queries. Return ONLY a JSON array with "
+            "one object per query, in the same order, each with these fields:\n"
+            "  index: the query number\n"
+            "  intent: one of [query_data, filter, aggregate, compare, trend, search, unknown]\n"
+            "  entities: {dates: [], numbers: [], columns: [], keywords: []}\n"
+            "  confidence: float 0.0-1.0\n"
+            "  response: short natural-language answer (1-2 sentences, Vietnamese or English matching the query)\n"
+            "Return nothing except the JSON array."
+        )
+        context_note = ""
+        if context:
+            context_note = f"Context: {json.dumps(context, ensure_ascii=False)[:300]}\n"
+        numbered = "\n".join(f"{i}. {json.dumps(q, ensure_ascii=False)}" for i, q in enumerate(queries))
+        return {
+            "model": _CLAUDE_MODEL,
+            "max_tokens": min(4096, 200 + 250 * len(queries)),
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": f"{context_note}Queries:\n{numbered}"}],
+        }
+
+    @staticmethod
+    def _claude_message_args(query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         system_prompt = (
             "You are a data query intent parser. "
             "Given a user query, return ONLY valid JSON with these fields:\n"
@@ -173,90 +704,29 @@ class NLPProcessor:
         context_note = ""
         if context:
             context_note = f"\nContext: {json.dumps(context, ensure_ascii=False)[:300]}"
-
-        message = _claude_client.messages.create(
-            model=_CLAUDE_MODEL,
-            max_tokens=400,
-            system=system_prompt,
-            messages=[{"role": "user", "content": f"Query: {query}{context_note}"}],
-        )
-        raw = message.content[0].text.strip()
-        # Strip markdown code fences if present
-        if raw.startswith("```"):
-            raw = re.sub(r"^```[a-z]*\n?", "", raw).rstrip("`").strip()
-        data = json.loads(raw)
         return {
-            "intent": data.get("intent", "unknown"),
-            "entities": data.get("entities", {"dates": [], "numbers": [], "columns": [], "keywords": []}),
-            "original_query": query,
-            "confidence": float(data.get("confidence", 0.75)),
-            "response": data.get("response", ""),
-            "timestamp": datetime.now().isoformat(),
-            "query_structure": self._generate_query_structure(
-                {"intent": data.get("intent", "unknown"), "entities": data.get("entities", {})},
-                context,
-            ),
+            "model": _CLAUDE_MODEL,
+            "max_tokens": 400,
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": f"Query: {query}{context_note}"}],
         }
 
     def _detect_intent(self, query: str) -> str:
         """Detect user intent from query"""
-        scores = {}
-
-        for intent, patterns in self.intent_patterns.items():
-            score = 0
-            for pattern in patterns:
-                if re.search(pattern, query, re.IGNORECASE):
-                    score += 1
-            scores[intent] = score
-
-        # Return intent with highest score
-        if scores:
-            return max(scores, key=scores.get)
-        return "unknown"
+        return self.analyze_query(query)["intent"]
 
     def _extract_entities(self, query: str) -> Dict[str, Any]:
         """Extract entities from query"""
-        entities = {
-            "dates": [],
-            "numbers": [],
-            "columns": [],
-            "keywords": [],
-        }
-
-        # Extract dates
-        for pattern in self.entity_patterns["date"]:
-            matches = re.findall(pattern, query, re.IGNORECASE)
-            entities["dates"].extend(matches)
-
-        # Extract numbers
-        for pattern in self.entity_patterns["number"]:
-            matches = re.findall(pattern, query, re.IGNORECASE)
-            entities["numbers"].extend(matches)
-
-        # Extract column names
-        for pattern in self.entity_patterns["column"]:
-            matches = re.findall(pattern, query, re.IGNORECASE)
-            entities["columns"].extend(matches)
-
-        # Extract keywords (non-stop words)
-        stop_words = {"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by"}
-        words = re.findall(r"\b\w+\b", query.lower())
-        entities["keywords"] = [w for w in words if w not in stop_words and len(w) > 2]
-
-        return entities
+        return self.analyze_query(query)["entities"]
 
     def _calculate_confidence(self, query: str, intent: str) -> float:
         """Calculate confidence score for intent detection"""
-        if intent == "unknown":
+        if intent == "unknown" or intent not in self._scanner.intents:
             return 0.0
-
-        patterns = self.intent_patterns.get(intent, [])
-        matches = sum(1 for pattern in patterns if re.search(pattern, query, re.IGNORECASE))
-
-        if not patterns:
-            return 0.0
-
-        return min(matches / len(patterns), 1.0)
+        scores, _, _ = self._scanner.scan(query.lower())
+        best = self._scanner.intents.index(intent)
+        size = self._scanner.intent_sizes[best]
+        return min(scores[best] / size, 1.0) if size else 0.0
 
     def _generate_query_structure(self, parsed: Dict[str, Any], context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Generate query structure from parsed intent"""
@@ -309,41 +779,25 @@ class NLPProcessor:
 
         return structure
 
-    def generate_summary(self, data: List[Dict[str, Any]], max_length: int = 200) -> str:
-        """Generate auto summary from data"""
-        if not data:
+    def generate_summary(self, data, max_length: int = 200) -> str:
+        """
+        Generate auto summary from data (rows or ColumnarFrame) in one pass:
+        count / sum / min / max per numeric field, min / max of the first
+        date-like field — memory O(columns), no per-field value lists
+        """
+        if data is None or len(data) == 0:
             return "No data available for summary."
 
-        summary_parts = []
-
-        # Basic statistics
-        total_items = len(data)
-        summary_parts.append(f"Analysis of {total_items} data points")
-
-        # Numeric statistics
-        numeric_fields = {}
-        for row in data:
-            for key, value in row.items():
-                if isinstance(value, (int, float)):
-                    if key not in numeric_fields:
-                        numeric_fields[key] = []
-                    numeric_fields[key].append(value)
-
-        if numeric_fields:
-            for field, values in numeric_fields.items():
-                if values:
-                    avg = sum(values) / len(values)
-                    summary_parts.append(
-                        f"{field}: avg {avg:.2f}, min {min(values)}, max {max(values)}"
-                    )
-
-        # Date range
-        date_fields = [k for k in data[0].keys() if "date" in k.lower() or "time" in k.lower()]
-        if date_fields:
-            for field in date_fields[:1]:  # First date field
-                dates = [row.get(field) for row in data if field in row and row.get(field)]
-                if dates:
-                    summary_parts.append(f"Date range: {min(dates)} to {max(dates)}")
+        if HAS_SEARCH_INDEX and isinstance(data, ColumnarFrame):
+            numeric_fields, date_range = _summarize_columns(data)
+        else:
+            numeric_fields, date_range = _summarize_rows(data)
+
+        summary_parts = [f"Analysis of {len(data)} data points"]
+        for field, (count, total, low, high) in numeric_fields.items():
+            summary_parts.append(f"{field}: avg {total / count:.2f}, min {low}, max {high}")
+        if date_range is not None:
+            summary_parts.append(f"Date range: {date_range[0]} to {date_range[1]}")
 
         summary = ". ".join(summary_parts)
 
@@ -353,9 +807,33 @@ class NLPProcessor:
 
         return summary
 
-    def smart_search(self, query: str, data: List[Dict[str, Any]],
-                    columns: List[str] = None) -> List[Dict[str, Any]]:
-        """Smart search across all data"""
+    def smart_search(self, query: str, data, columns: List[str] = None,
+                     top_k: int = 50, dataset_key: str = None,
+                     mode: str = "keyword") -> List[Dict[str, Any]]:
+        """
+        Smart search across all data over a cached per-dataset index
+        (rows or ColumnarFrame; `dataset_key` = dataset id, else content hash):
+        mode="keyword" → BM25 on tokens, mode="vector" → char n-gram TF-IDF
+        cosine (similar wording, e.g. "ao thun trang" ~ "ao phong mau trang")
+        """
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}' (expected one of {self.SEARCH_MODES})")
+        if data is None or len(data) == 0:
+            return []
+        if not HAS_SEARCH_INDEX:
+            return self._scan_search(query, data, columns)[:top_k]
+
+        key = dataset_key or table_fingerprint(data, columns)
+        index_class = NgramVectorIndex if mode == "vector" else BM25Index
+        index = self._search_indexes.get(key, data, columns, index_class)
+        hits = [doc for doc, _ in index.search(query, top_k)]
+        if isinstance(data, ColumnarFrame):
+            return data.to_rows(hits)
+        return [data[i] for i in hits]
+
+    def _scan_search(self, query: str, data: List[Dict[str, Any]],
+                     columns: List[str] = None) -> List[Dict[str, Any]]:
+        """Substring scoring over every row (fallback without NumPy)"""
         if not data:
             return []
 
@@ -3,10 +3,17 @@ Pattern Recognition Model
 Data pattern recognition trong Google Sheets
 """
 
+import warnings
+
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
 from datetime import datetime
 
+from .series import ColumnarFrame, ColumnarSeries, as_series, extract_matrix
+
+# Rows (List[Dict]), bảng dạng cột (ColumnarFrame) hoặc ColumnarSeries đã extract sẵn
+SeriesInput = Union[List[Dict[str, Any]], ColumnarFrame, ColumnarSeries]
+
 
 class PatternRecognizer:
     """
@@ -20,52 +27,29 @@ class PatternRecognizer:
     def __init__(self):
         self.patterns = []
 
-    def recognize_trends(self, data: List[Dict[str, Any]], value_column: str) -> Dict[str, Any]:
+    def recognize_trends(self, data: SeriesInput, value_column: str) -> Dict[str, Any]:
         """Recognize trend patterns in data"""
-        if not data or len(data) < 2:
+        if data is None or len(data) < 2:
             return {"trend": "insufficient_data", "confidence": 0}
 
-        values = [row.get(value_column, 0) for row in data if value_column in row]
-        if len(values) < 2:
+        y = as_series(data, value_column).valid_values
+        if len(y) < 2:
             return {"trend": "insufficient_data", "confidence": 0}
 
-        x = np.arange(len(values))
-        y = np.array(values, dtype=float)
+        x = np.arange(len(y))
 
         slope = np.polyfit(x, y, 1)[0]
         mean_value = float(np.mean(y))
         std_value = float(np.std(y)) if len(y) > 1 else 0.0
+        return _trend_result(slope, mean_value, std_value, float(y[0]), float(y[-1]))
 
-        if std_value == 0:
-            trend = "stable"
-            confidence = 1.0
-        elif abs(slope) < 0.01 * abs(mean_value) + 1e-9:
-            trend = "stable"
-            confidence = 0.8
-        elif slope > 0:
-            trend = "increasing"
-            confidence = min(abs(slope) / (0.1 * abs(mean_value) + 1), 1.0)
-        else:
-            trend = "decreasing"
-            confidence = min(abs(slope) / (0.1 * abs(mean_value) + 1), 1.0)
-
-        return {
-            "trend": trend,
-            "slope": float(slope),
-            "confidence": float(confidence),
-            "mean": mean_value,
-            "std": std_value,
-            "change_percentage": float((values[-1] - values[0]) / (values[0] + 1) * 100)
-            if values[0] != 0
-            else 0,
-        }
-
-    def detect_anomalies(self, data: List[Dict[str, Any]], value_column: str) -> List[Dict[str, Any]]:
+    def detect_anomalies(self, data: SeriesInput, value_column: str) -> List[Dict[str, Any]]:
         """Detect anomalies in data"""
-        if not data:
+        if data is None or len(data) == 0:
             return []
 
-        values = [float(row.get(value_column, 0)) for row in data if value_column in row]
+        series = as_series(data, value_column)
+        values = series.valid_values
         if len(values) < 3:
             return []
 
@@ -75,152 +59,397 @@ class PatternRecognizer:
         if std == 0:
             return []
 
-        anomalies = []
-        threshold = 2 * std
-
-        for i, row in enumerate(data):
-            value = float(row.get(value_column, 0))
-            z_score = abs((value - mean) / std) if std > 0 else 0
-
-            if z_score > 2:
-                anomaly_type = "spike" if value > mean else "drop"
-                anomalies.append(
-                    {
-                        "index": i,
-                        "value": value,
-                        "expected_range": [mean - threshold, mean + threshold],
-                        "z_score": float(z_score),
-                        "type": anomaly_type,
-                        "severity": "high" if z_score > 3 else "medium",
-                        "timestamp": row.get("timestamp")
-                        or row.get("date")
-                        or datetime.now().isoformat(),
-                    }
-                )
-
-        return anomalies
+        z_scores = np.abs((values - mean) / std)
+        return _anomaly_records(series, values, z_scores, mean, std)
 
     def detect_cycles(
-        self, data: List[Dict[str, Any]], value_column: str, date_column: str = None
+        self, data: SeriesInput, value_column: str, date_column: str = None,
+        top_k: int = 3, min_confidence: float = 0.3, max_period: int = None,
     ) -> Dict[str, Any]:
-        """Detect cyclical patterns (daily, weekly, monthly)"""
-        if not data or len(data) < 7:
+        """Detect cyclical patterns of any period via FFT autocorrelation"""
+        if data is None or len(data) < 7:
             return {"cycle": "insufficient_data", "period": None}
 
-        values = [float(row.get(value_column, 0)) for row in data]
-        values_array = np.array(values)
-
-        # Daily cycle — lag-1 (cần ≥ 2 điểm)
-        if len(values) >= 2:
-            lag_1 = values_array[1:]
-            original_1 = values_array[:-1]
-            if np.std(original_1) > 0 and np.std(lag_1) > 0:
-                correlation_1 = float(np.corrcoef(original_1, lag_1)[0, 1])
-                if correlation_1 > 0.7:
-                    return {
-                        "cycle": "daily",
-                        "period": 1,
-                        "confidence": round(correlation_1, 4),
-                        "pattern": "repeating_daily",
-                    }
-
-        if len(values) >= 14:
-            lag_7 = values_array[7:]
-            original = values_array[:-7]
-
-            if len(original) > 0 and np.std(original) > 0 and np.std(lag_7) > 0:
-                correlation_7 = np.corrcoef(original, lag_7)[0, 1]
-
-                if correlation_7 > 0.5:
-                    return {
-                        "cycle": "weekly",
-                        "period": 7,
-                        "confidence": float(correlation_7),
-                        "pattern": "repeating_weekly",
-                    }
-
-        if len(values) >= 60:
-            lag_30 = values_array[30:]
-            original = values_array[:-30]
-
-            if len(original) > 0 and np.std(original) > 0 and np.std(lag_30) > 0:
-                correlation_30 = np.corrcoef(original, lag_30)[0, 1]
-
-                if correlation_30 > 0.5:
-                    return {
-                        "cycle": "monthly",
-                        "period": 30,
-                        "confidence": float(correlation_30),
-                        "pattern": "repeating_monthly",
-                    }
-
-        return {"cycle": "no_clear_cycle", "period": None, "confidence": 0}
-
-    def find_correlations(self, data: List[Dict[str, Any]], columns: List[str]) -> Dict[str, Any]:
-        """Find correlations between columns"""
-        if not data or len(columns) < 2:
+        series = as_series(data, value_column, date_column)
+        values = series.valid_values
+        if len(values) < 7:
+            return {"cycle": "insufficient_data", "period": None}
+
+        acf = _autocorrelation(_detrend(values))
+        return _cycle_result(acf, len(values), series.sample_spacing(),
+                             top_k, min_confidence, max_period)
+
+    def find_correlations(self, data, columns: List[str], top_n: int = None,
+                          min_periods: int = 3) -> Dict[str, Any]:
+        """
+        Find correlations between columns.
+
+        `data` is a list of rows, a ColumnarFrame or a ready (rows × columns) float matrix with
+        NaN for missing values. The whole matrix is computed in one BLAS pass
+        with pairwise-complete masking: each pair uses the rows where both
+        columns have a value. `top_n` keeps only the strongest pairs.
+        """
+        if data is None or len(data) == 0 or len(columns) < 2:
             return {"correlations": []}
 
-        column_data = {}
-        for col in columns:
-            column_data[col] = [float(row.get(col, 0)) for row in data if col in row]
+        matrix = data if isinstance(data, np.ndarray) else extract_matrix(data, columns)
+        corr, counts = _pairwise_correlation(matrix, min_periods)
+
+        rows, cols = np.triu_indices(len(columns), k=1)
+        values = corr[rows, cols]
+        keep = ~np.isnan(values)
+        rows, cols, values = rows[keep], cols[keep], values[keep]
+
+        if top_n is not None and 0 < top_n < len(values):
+            strength = np.abs(values)
+            top = np.argpartition(-strength, top_n - 1)[:top_n]
+            top = top[np.argsort(-strength[top], kind="stable")]
+            rows, cols, values = rows[top], cols[top], values[top]
 
         correlations = []
-        for i, col1 in enumerate(columns):
-            for col2 in columns[i + 1 :]:
-                if col1 in column_data and col2 in column_data:
-                    values1 = column_data[col1]
-                    values2 = column_data[col2]
-
-                    if len(values1) == len(values2) and len(values1) > 1:
-                        if np.std(values1) > 0 and np.std(values2) > 0:
-                            corr = np.corrcoef(values1, values2)[0, 1]
-                            if not np.isnan(corr):
-                                correlations.append(
-                                    {
-                                        "column1": col1,
-                                        "column2": col2,
-                                        "correlation": float(corr),
-                                        "strength": "strong"
-                                        if abs(corr) > 0.7
-                                        else "moderate"
-                                        if abs(corr) > 0.4
-                                        else "weak",
-                                    }
-                                )
+        for i, j, corr_value in zip(rows.tolist(), cols.tolist(), values.tolist()):
+            correlations.append(
+                {
+                    "column1": columns[i],
+                    "column2": columns[j],
+                    "correlation": corr_value,
+                    "sample_size": int(counts[i, j]),
+                    "strength": "strong"
+                    if abs(corr_value) > 0.7
+                    else "moderate"
+                    if abs(corr_value) > 0.4
+                    else "weak",
+                }
+            )
 
         return {"correlations": correlations, "total_pairs": len(correlations)}
 
+    def analyze_batch(
+        self, series_map: Dict[str, ColumnarSeries], analyses: List[str] = None,
+        top_k: int = 3, min_confidence: float = 0.3,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Trend / anomaly / cycle analysis of many series at once.
+
+        Valid values of every series are packed left-aligned into one
+        NaN-padded 2-D array, so regression, z-scores and the FFT
+        autocorrelation run as single vectorized passes over all series.
+        """
+        analyses = analyses or ["trends", "anomalies", "cycles"]
+        names = list(series_map)
+        results: Dict[str, Dict[str, Any]] = {name: {} for name in names}
+        if not names:
+            return results
+
+        valid = [series_map[name].valid_values for name in names]
+        lengths = np.array([len(v) for v in valid])
+        width = max(int(lengths.max()), 1)
+        matrix = np.full((len(names), width), np.nan)
+        for r, values in enumerate(valid):
+            matrix[r, : len(values)] = values
+        present = ~np.isnan(matrix)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            counts = np.maximum(lengths, 1)
+            means = np.where(present, matrix, 0.0).sum(axis=1) / counts
+            centered = np.where(present, matrix - means[:, None], 0.0)
+            stds = np.sqrt((centered * centered).sum(axis=1) / counts)
+
+        if "trends" in analyses:
+            x = np.where(present, np.arange(width) - (lengths[:, None] - 1) / 2.0, 0.0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                slopes = (x * centered).sum(axis=1) / (x * x).sum(axis=1)
+            for r, name in enumerate(names):
+                if lengths[r] < 2:
+                    results[name]["trends"] = {"trend": "insufficient_data", "confidence": 0}
+                    continue
+                results[name]["trends"] = _trend_result(
+                    slopes[r], float(means[r]), float(stds[r]),
+                    float(matrix[r, 0]), float(matrix[r, lengths[r] - 1]),
+                )
+
+        if "anomalies" in analyses:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                z_scores = np.abs(centered / stds[:, None])
+            for r, name in enumerate(names):
+                if lengths[r] < 3 or stds[r] == 0:
+                    results[name]["anomalies"] = []
+                    continue
+                results[name]["anomalies"] = _anomaly_records(
+                    series_map[name], valid[r], z_scores[r, : lengths[r]],
+                    float(means[r]), float(stds[r]),
+                )
+
+        if "cycles" in analyses:
+            acf = _autocorrelation(_detrend_rows(centered, lengths))
+            for r, name in enumerate(names):
+                if lengths[r] < 7:
+                    results[name]["cycles"] = {"cycle": "insufficient_data", "period": None}
+                    continue
+                results[name]["cycles"] = _cycle_result(
+                    acf[r], int(lengths[r]), series_map[name].sample_spacing(),
+                    top_k, min_confidence,
+                )
+
+        return results
+
     def analyze_patterns(
-        self, data: List[Dict[str, Any]], value_column: str, date_column: str = None
+        self, data: SeriesInput, value_column: str, date_column: str = None
     ) -> Dict[str, Any]:
         """Comprehensive pattern analysis"""
         results = {
             "timestamp": datetime.now().isoformat(),
-            "data_points": len(data),
+            "data_points": 0 if data is None else len(data),
             "trends": {},
             "anomalies": [],
             "cycles": {},
             "summary": {},
         }
 
-        if not data:
+        if data is None or len(data) == 0:
             return results
 
-        results["trends"] = self.recognize_trends(data, value_column)
-        results["anomalies"] = self.detect_anomalies(data, value_column)
-        results["cycles"] = self.detect_cycles(data, value_column, date_column)
-
-        results["summary"] = {
-            "has_trend": results["trends"].get("trend") != "insufficient_data",
-            "trend_direction": results["trends"].get("trend", "unknown"),
-            "anomaly_count": len(results["anomalies"]),
-            "has_cycle": results["cycles"].get("cycle")
-            not in ["insufficient_data", "no_clear_cycle"],
-            "cycle_type": results["cycles"].get("cycle", "none"),
-        }
+        # Extract the column once; all three analyses share the arrays
+        series = as_series(data, value_column, date_column)
+        results["trends"] = self.recognize_trends(series, value_column)
+        results["anomalies"] = self.detect_anomalies(series, value_column)
+        results["cycles"] = self.detect_cycles(series, value_column, date_column)
+
+        results["summary"] = pattern_summary(
+            results["trends"], results["anomalies"], results["cycles"])
 
         return results
 
 
+def pattern_summary(trends: Dict[str, Any], anomalies: List[Dict[str, Any]],
+                    cycles: Dict[str, Any]) -> Dict[str, Any]:
+    """analyze_patterns "summary" block from the three analyses"""
+    return {
+        "has_trend": trends.get("trend") != "insufficient_data",
+        "trend_direction": trends.get("trend", "unknown"),
+        "anomaly_count": len(anomalies),
+        "has_cycle": cycles.get("cycle") not in ["insufficient_data", "no_clear_cycle"],
+        "cycle_type": cycles.get("cycle", "none"),
+    }
+
+
+def _trend_result(slope: float, mean_value: float, std_value: float,
+                  first: float, last: float) -> Dict[str, Any]:
+    """Classify a fitted slope into the recognize_trends result shape"""
+    if std_value == 0:
+        trend = "stable"
+        confidence = 1.0
+    elif abs(slope) < 0.01 * abs(mean_value) + 1e-9:
+        trend = "stable"
+        confidence = 0.8
+    elif slope > 0:
+        trend = "increasing"
+        confidence = min(abs(slope) / (0.1 * abs(mean_value) + 1), 1.0)
+    else:
+        trend = "decreasing"
+        confidence = min(abs(slope) / (0.1 * abs(mean_value) + 1), 1.0)
+
+    return {
+        "trend": trend,
+        "slope": float(slope),
+        "confidence": float(confidence),
+        "mean": mean_value,
+        "std": std_value,
+        "change_percentage": float((last - first) / (first + 1) * 100)
+        if first != 0
+        else 0,
+    }
+
+
+def _anomaly_records(series: ColumnarSeries, values: np.ndarray, z_scores: np.ndarray,
+                     mean: float, std: float) -> List[Dict[str, Any]]:
+    """Build anomaly dicts for |z| > 2 (index = original row position)"""
+    anomalies = []
+    threshold = 2 * std
+    positions = series.valid_index
+
+    for k in np.flatnonzero(z_scores > 2):
+        value = float(values[k])
+        z_score = float(z_scores[k])
+        index = int(positions[k])
+        anomaly_type = "spike" if value > mean else "drop"
+        anomalies.append(
+            {
+                "index": index,
+                "value": value,
+                "expected_range": [mean - threshold, mean + threshold],
+                "z_score": z_score,
+                "type": anomaly_type,
+                "severity": "high" if z_score > 3 else "medium",
+                "timestamp": series.timestamp_at(index)
+                or datetime.now().isoformat(),
+            }
+        )
+
+    return anomalies
+
+
+def _cycle_result(acf: np.ndarray, n: int, spacing: float, top_k: int,
+                  min_confidence: float, max_period: int = None) -> Dict[str, Any]:
+    """Turn one series' ACF into the detect_cycles result shape"""
+    max_lag = n // 2  # cần ít nhất 2 chu kỳ đầy đủ
+    if max_period:
+        max_lag = min(max_lag, int(max_period))
+
+    periods = []
+    for lag, strength in _significant_peaks(acf, max_lag, min_confidence, n, top_k):
+        label = _period_label(lag, spacing)
+        entry = {"period": lag, "confidence": round(strength, 4), "cycle": label}
+        if spacing:
+            entry["period_seconds"] = lag * spacing
+        periods.append(entry)
+
+    if periods:
+        best = periods[0]
+        return {
+            "cycle": best["cycle"],
+            "period": best["period"],
+            "confidence": best["confidence"],
+            "pattern": f"repeating_{best['cycle']}",
+            "periods": periods,
+            "method": "fft_autocorrelation",
+        }
+
+    # Không có chu kỳ rõ — giữ tín hiệu lag-1 persistence như trước; nhãn theo
+    # khoảng cách mẫu ("daily" khi không có timestamp)
+    if len(acf) > 1 and acf[1] > 0.7:
+        label = _period_label(1, spacing)
+        return {
+            "cycle": label,
+            "period": 1,
+            "confidence": round(float(acf[1]), 4),
+            "pattern": f"repeating_{label}",
+            "periods": [],
+            "method": "fft_autocorrelation",
+        }
+
+    return {
+        "cycle": "no_clear_cycle",
+        "period": None,
+        "confidence": 0,
+        "periods": [],
+        "method": "fft_autocorrelation",
+    }
+
+
+def _pairwise_correlation(matrix: np.ndarray, min_periods: int = 3):
+    """Pearson correlation of every column pair over pairwise-complete rows"""
+    valid = ~np.isnan(matrix)
+    weights = valid.astype(float)
+    counts = weights.T @ weights
+
+    # Center trước để tránh sai số khi cộng dồn giá trị lớn
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        means = np.nanmean(matrix, axis=0)
+    centered = np.where(valid, matrix - np.nan_to_num(means), 0.0)
+
+    sums = centered.T @ weights               # Σ x_i trên các dòng có cả i và j
+    squares = (centered * centered).T @ weights
+    products = centered.T @ centered          # Σ x_i·x_j
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        safe_counts = np.where(counts > 0, counts, 1.0)
+        cov = products - sums * sums.T / safe_counts
+        var_i = squares - sums * sums / safe_counts
+        var_j = var_i.T
+        tol = 1e-12 * np.maximum(squares, 1.0)
+        ok = (counts >= max(2, min_periods)) & (var_i > tol) & (var_j > tol.T)
+        corr = np.where(ok, cov / np.sqrt(np.where(ok, var_i * var_j, 1.0)), np.nan)
+    return np.clip(corr, -1.0, 1.0), counts
+
+
+def _detrend(values: np.ndarray) -> np.ndarray:
+    """Remove mean and linear trend along the last axis"""
+    n = values.shape[-1]
+    x = np.arange(n, dtype=float) - (n - 1) / 2.0
+    centered = values - values.mean(axis=-1, keepdims=True)
+    denom = float(np.dot(x, x)) or 1.0
+    slope = (centered @ x) / denom
+    return centered - np.multiply.outer(slope, x)
+
+
+def _detrend_rows(centered: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """_detrend for left-aligned, zero-padded rows of different lengths"""
+    width = centered.shape[-1]
+    present = np.arange(width) < lengths[:, None]
+    x = np.where(present, np.arange(width) - (lengths[:, None] - 1) / 2.0, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.nan_to_num((x * centered).sum(axis=1) / (x * x).sum(axis=1))
+    return np.where(present, centered - slope[:, None] * x, 0.0)
+
+
+def _autocorrelation(values: np.ndarray) -> np.ndarray:
+    """Normalized autocorrelation for all lags in O(n log n) (Wiener–Khinchin)"""
+    n = values.shape[-1]
+    nfft = 1 << (2 * n - 1).bit_length()  # zero-pad → không bị wrap-around
+    spectrum = np.fft.rfft(values, nfft, axis=-1)
+    acf = np.fft.irfft(spectrum * np.conj(spectrum), nfft, axis=-1)[..., :n]
+    var = acf[..., :1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acf = np.where(var > 0, acf / np.where(var > 0, var, 1.0), 0.0)
+    return acf
+
+
+def _significant_peaks(acf: np.ndarray, max_lag: int, min_confidence: float,
+                       n: int, top_k: int) -> List[tuple]:
+    """Local maxima of the ACF above the significance bound, strongest first"""
+    if max_lag < 3:
+        return []
+    window = acf[: max_lag + 2]
+    # Bỏ qua "lobe" đầu tiên quanh lag 0 — chỉ xét sau khi ACF cắt xuống ≤ 0
+    crossings = np.flatnonzero(window[1:] <= 0)
+    if not len(crossings):
+        return []
+    lags = np.arange(max(2, int(crossings[0]) + 1), min(max_lag, len(window) - 2) + 1)
+    if not len(lags):
+        return []
+    is_peak = (window[lags] > window[lags - 1]) & (window[lags] >= window[lags + 1])
+    # ~95% bound cho white noise: 2/sqrt(n)
+    bound = max(min_confidence, 2.0 / np.sqrt(n))
+    candidates = lags[is_peak & (window[lags] > bound)]
+    order = candidates[np.argsort(-window[candidates], kind="stable")]
+
+    peaks: List[tuple] = []
+    for lag in order:
+        # Bỏ đỉnh nhiễu sát chu kỳ đã chọn và các hài bậc cao (2p, 3p, ...)
+        if any(_near_multiple(lag, p) for p, _ in peaks):
+            continue
+        peaks.append((int(lag), float(window[lag])))
+        if len(peaks) >= top_k:
+            break
+    return peaks
+
+
+def _near_multiple(lag: int, period: int) -> bool:
+    multiple = round(lag / period)
+    return multiple >= 1 and abs(lag - multiple * period) <= max(1.0, 0.1 * lag)
+
+
+_DAY = 86400.0
+_NAMED_PERIODS = [
+    ("hourly", 3600.0),
+    ("daily", _DAY),
+    ("weekly", 7 * _DAY),
+    ("biweekly", 14 * _DAY),
+    ("monthly", 30 * _DAY),
+    ("quarterly", 91 * _DAY),
+    ("yearly", 365 * _DAY),
+]
+
+
+def _period_label(period: int, spacing: float = None) -> str:
+    """Name a period; without timestamps samples are assumed to be daily"""
+    seconds = period * (spacing or _DAY)
+    for name, target in _NAMED_PERIODS:
+        if abs(seconds - target) <= 0.08 * target:
+            return name
+    return f"period_{period}"
+
+
 pattern_recognizer = PatternRecognizer()
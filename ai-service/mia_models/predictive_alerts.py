@@ -6,7 +6,92 @@ Predictive alerts based on trends
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import numpy as np
-from .pattern_recognizer import pattern_recognizer
+from .column_stats import describe
+from .pattern_recognizer import pattern_recognizer, pattern_summary
+from .series import ColumnarFrame, ColumnarSeries, as_series
+
+
+class AnalysisContext:
+    """
+    One metric's series, extracted once, with its analyses computed lazily
+    and memoized — every alert generator of a request reads the same
+    trend fit / anomaly list / cycle result instead of redoing them.
+    """
+
+    __slots__ = ("series", "value_column", "_results")
+
+    def __init__(self, series: ColumnarSeries, value_column: str):
+        self.series = series
+        self.value_column = value_column
+        self._results: Dict[str, Any] = {}
+
+    @classmethod
+    def of(cls, data, value_column: str, date_column: str = None) -> "AnalysisContext":
+        """`data` itself if it is already a context, else rows / frame / series → context"""
+        if isinstance(data, cls):
+            return data
+        return cls(as_series(data, value_column, date_column), value_column)
+
+    @classmethod
+    def many(cls, data, value_columns: List[str],
+             date_column: str = None) -> Dict[str, "AnalysisContext"]:
+        """Contexts for several metrics of one table (timestamps extracted once)"""
+        if isinstance(data, ColumnarFrame):
+            timestamps = data.timestamps(date_column)
+            series_map = {}
+            for col in value_columns:
+                values = data.floats(col)
+                series_map[col] = ColumnarSeries(values, ~np.isnan(values), timestamps, col)
+        else:
+            series_map = ColumnarSeries.many_from_rows(data or [], value_columns, date_column)
+        return {col: cls(series, col) for col, series in series_map.items()}
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    @property
+    def trend(self) -> Dict[str, Any]:
+        if "trends" not in self._results:
+            self._results["trends"] = pattern_recognizer.recognize_trends(
+                self.series, self.value_column)
+        return self._results["trends"]
+
+    @property
+    def anomalies(self) -> List[Dict[str, Any]]:
+        if "anomalies" not in self._results:
+            self._results["anomalies"] = pattern_recognizer.detect_anomalies(
+                self.series, self.value_column)
+        return self._results["anomalies"]
+
+    @property
+    def cycles(self) -> Dict[str, Any]:
+        if "cycles" not in self._results:
+            self._results["cycles"] = pattern_recognizer.detect_cycles(
+                self.series, self.value_column)
+        return self._results["cycles"]
+
+    @property
+    def statistics(self) -> Optional[Dict[str, Any]]:
+        """count / sum / avg / min / max / std / p50 / p95 / p99 of the valid values"""
+        if "statistics" not in self._results:
+            self._results["statistics"] = describe(self.series.valid_values)
+        return self._results["statistics"]
+
+    def patterns(self) -> Dict[str, Any]:
+        """PatternRecognizer.analyze_patterns result, from the memoized analyses"""
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "data_points": len(self),
+            "trends": self.trend,
+            "anomalies": self.anomalies,
+            "cycles": self.cycles,
+            "summary": pattern_summary(self.trend, self.anomalies, self.cycles),
+        }
+
+    def prime(self, results: Dict[str, Any]) -> None:
+        """Seed memoized results (e.g. from PatternRecognizer.analyze_batch)"""
+        for name, result in results.items():
+            self._results.setdefault(name, result)
 
 
 class PredictiveAlerts:
@@ -16,6 +101,10 @@ class PredictiveAlerts:
     - Anomaly detection
     - Threshold crossing predictions
     - Pattern-based forecasting
+
+    Generators take rows, a ColumnarFrame, a ColumnarSeries or an
+    AnalysisContext; analyze_and_alert builds one context and passes it
+    to all of them.
     """
 
     def set_threshold(self, metric: str, min_value: float = None, max_value: float = None, alert_type: str = "warning") -> dict:
@@ -25,30 +114,22 @@ class PredictiveAlerts:
     def predict_threshold_crossing(self, data: List[Dict[str, Any]], value_column: str,
                                    threshold: float, direction: str = "above") -> Optional[Dict[str, Any]]:
         """Predict when a threshold will be crossed"""
-        if not data or len(data) < 3:
+        if data is None or len(data) < 3:
             return None
 
-        values = [float(row.get(value_column, 0)) for row in data if value_column in row]
+        context = AnalysisContext.of(data, value_column)
+        values = context.series.valid_values
         if len(values) < 3:
             return None
 
         # Analyze trend
-        trend_analysis = pattern_recognizer.recognize_trends(data, value_column)
+        trend_analysis = context.trend
         slope = trend_analysis.get("slope", 0)
-        last_value = values[-1]
+        last_value = float(values[-1])
 
         # Predict future values using linear projection
-        days_to_cross = None
-        predicted_value = last_value
-
-        if direction == "above" and slope > 0 and last_value < threshold:
-            # Project when it will cross above threshold
-            days_to_cross = (threshold - last_value) / slope if slope > 0 else None
-            predicted_value = threshold
-        elif direction == "below" and slope < 0 and last_value > threshold:
-            # Project when it will cross below threshold
-            days_to_cross = (last_value - threshold) / abs(slope) if slope < 0 else None
-            predicted_value = threshold
+        days_to_cross = steps_to_threshold(slope, last_value, threshold, direction)
+        predicted_value = threshold if days_to_cross is not None else last_value
 
         if days_to_cross and days_to_cross > 0 and days_to_cross < 365:  # Within 1 year
             predicted_date = datetime.now() + timedelta(days=int(days_to_cross))
@@ -71,10 +152,10 @@ class PredictiveAlerts:
         """Generate alerts based on trend analysis"""
         alerts = []
 
-        if not data or len(data) < 2:
+        if data is None or len(data) < 2:
             return alerts
 
-        trend_analysis = pattern_recognizer.recognize_trends(data, value_column)
+        trend_analysis = AnalysisContext.of(data, value_column).trend
         trend = trend_analysis.get("trend", "unknown")
         change_pct = trend_analysis.get("change_percentage", 0)
         confidence = trend_analysis.get("confidence", 0)
@@ -106,10 +187,10 @@ class PredictiveAlerts:
         """Generate alerts based on anomaly detection"""
         alerts = []
 
-        if not data:
+        if data is None or len(data) == 0:
             return alerts
 
-        anomalies = pattern_recognizer.detect_anomalies(data, value_column)
+        anomalies = AnalysisContext.of(data, value_column).anomalies
         metric_name = metric_name or value_column
 
         for anomaly in anomalies:
@@ -128,62 +209,72 @@ class PredictiveAlerts:
 
     def generate_pattern_alerts(self, data: List[Dict[str, Any]], value_column: str,
                                metric_name: str = None) -> List[Dict[str, Any]]:
-        """Generate alerts based on pattern recognition"""
+        """Generate alerts based on pattern recognition (FFT autocorrelation cycles)"""
         alerts = []
 
-        if not data:
+        if data is None or len(data) == 0:
             return alerts
 
-        cycle_analysis = pattern_recognizer.detect_cycles(data, value_column)
+        cycle_analysis = AnalysisContext.of(data, value_column).cycles
         metric_name = metric_name or value_column
 
-        # Alert on detected cycles
-        if cycle_analysis.get("cycle") not in ["insufficient_data", "no_clear_cycle"]:
-            cycle_type = cycle_analysis.get("cycle", "unknown")
-            confidence = cycle_analysis.get("confidence", 0)
+        # Periodic cycles: one alert per significant period
+        for period in cycle_analysis.get("periods", []):
+            if period["confidence"] > 0.6:
+                alerts.append({
+                    "type": "pattern",
+                    "metric": metric_name,
+                    "severity": "low",
+                    "alert_type": "info",
+                    "message": f"Detected {period['cycle']} pattern in {metric_name} "
+                               f"(period {period['period']})",
+                    "pattern": {**period, "method": cycle_analysis.get("method")},
+                    "confidence": period["confidence"],
+                    "timestamp": datetime.now().isoformat(),
+                    "recommendation": f"Consider scheduling based on {period['cycle']} pattern"
+                })
 
+        # Lag-1 persistence ("daily") has no periods list
+        if not alerts and cycle_analysis.get("period") == 1:
+            confidence = cycle_analysis.get("confidence", 0)
             if confidence > 0.6:
                 alerts.append({
                     "type": "pattern",
                     "metric": metric_name,
                     "severity": "low",
                     "alert_type": "info",
-                    "message": f"Detected {cycle_type} pattern in {metric_name}",
+                    "message": f"Detected daily pattern in {metric_name}",
                     "pattern": cycle_analysis,
                     "confidence": confidence,
                     "timestamp": datetime.now().isoformat(),
-                    "recommendation": f"Consider scheduling based on {cycle_type} pattern"
+                    "recommendation": "Consider scheduling based on daily pattern"
                 })
 
         return alerts
 
     def _get_trend_recommendation(self, trend: str, change_pct: float) -> str:
         """Get recommendation based on trend"""
-        if trend == "increasing" and change_pct > 50:
-            return "Significant growth detected. Consider scaling resources."
-        elif trend == "decreasing" and change_pct < -50:
-            return "Significant decline detected. Investigate root cause immediately."
-        elif trend == "increasing":
-            return "Positive trend observed. Monitor for sustainability."
-        elif trend == "decreasing":
-            return "Declining trend. Consider intervention strategies."
-        else:
-            return "Stable trend. Continue monitoring."
+        return trend_recommendation(trend, change_pct)
 
     def analyze_and_alert(self, data: List[Dict[str, Any]], value_column: str,
                          metric_name: str = None, threshold: float = None) -> List[Dict[str, Any]]:
         """Comprehensive analysis and alert generation"""
         all_alerts = []
         metric_name = metric_name or value_column
+        if data is None or len(data) == 0:
+            return all_alerts
+
+        # Extract the column once; every generator reads the same memoized analyses
+        context = AnalysisContext.of(data, value_column)
 
         # Generate different types of alerts
-        all_alerts.extend(self.generate_trend_alerts(data, value_column, metric_name))
-        all_alerts.extend(self.generate_anomaly_alerts(data, value_column, metric_name))
-        all_alerts.extend(self.generate_pattern_alerts(data, value_column, metric_name))
+        all_alerts.extend(self.generate_trend_alerts(context, value_column, metric_name))
+        all_alerts.extend(self.generate_anomaly_alerts(context, value_column, metric_name))
+        all_alerts.extend(self.generate_pattern_alerts(context, value_column, metric_name))
 
         # Threshold-based alerts
         if threshold:
-            threshold_alert = self.predict_threshold_crossing(data, value_column, threshold)
+            threshold_alert = self.predict_threshold_crossing(context, value_column, threshold)
             if threshold_alert:
                 all_alerts.append({
                     "type": "threshold_prediction",
@@ -200,6 +291,53 @@ class PredictiveAlerts:
             "high": 3, "medium": 2, "low": 1
         }.get(x.get("severity", "low"), 0), reverse=True)
 
+    def analyze_and_alert_many(self, data, value_columns: List[str],
+                               metric_names: Dict[str, str] = None,
+                               thresholds: Dict[str, float] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        analyze_and_alert for several metrics of one table: timestamps are
+        extracted once and trend / anomaly / cycle analyses of all metrics
+        run as one batched pass (PatternRecognizer.analyze_batch)
+        """
+        metric_names = metric_names or {}
+        thresholds = thresholds or {}
+        if data is None or len(data) == 0:
+            return {col: [] for col in value_columns}
+
+        contexts = AnalysisContext.many(data, value_columns)
+        batch = pattern_recognizer.analyze_batch({col: c.series for col, c in contexts.items()})
+        for col, context in contexts.items():
+            context.prime(batch[col])
+
+        return {
+            col: self.analyze_and_alert(contexts[col], col, metric_names.get(col), thresholds.get(col))
+            for col in value_columns
+        }
+
+
+def steps_to_threshold(slope: float, last_value: float, threshold: float,
+                       direction: str = "above") -> Optional[float]:
+    """Linear projection: samples until last_value reaches threshold (None if not heading there)"""
+    if direction == "above" and slope > 0 and last_value < threshold:
+        return (threshold - last_value) / slope
+    if direction == "below" and slope < 0 and last_value > threshold:
+        return (last_value - threshold) / abs(slope)
+    return None
+
+
+def trend_recommendation(trend: str, change_pct: float) -> str:
+    """Recommendation text for a trend alert"""
+    if trend == "increasing" and change_pct > 50:
+        return "Significant growth detected. Consider scaling resources."
+    elif trend == "decreasing" and change_pct < -50:
+        return "Significant decline detected. Investigate root cause immediately."
+    elif trend == "increasing":
+        return "Positive trend observed. Monitor for sustainability."
+    elif trend == "decreasing":
+        return "Declining trend. Consider intervention strategies."
+    else:
+        return "Stable trend. Continue monitoring."
+
 
 # Singleton instance
 predictive_alerts = PredictiveAlerts()
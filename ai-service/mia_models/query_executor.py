@@ -0,0 +1,436 @@
+"""
+Query Executor
+Chạy query_structure (do NLPProcessor sinh ra) trên dataset phía server:
+filter / aggregate / group_by / order_by / limit bằng NumPy, chỉ trả về kết quả.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .search_index import table_fingerprint
+from .series import ColumnarFrame, _plain_list, _take
+
+_OPERATORS = {
+    "eq": "eq", "=": "eq", "==": "eq", "equals": "eq", "is": "eq",
+    "ne": "ne", "!=": "ne", "<>": "ne", "not_equals": "ne",
+    "gt": "gt", ">": "gt",
+    "gte": "gte", ">=": "gte",
+    "lt": "lt", "<": "lt",
+    "lte": "lte", "<=": "lte",
+    "in": "in",
+    "contains": "contains", "like": "contains",
+}
+_AGGREGATES = ("sum", "avg", "mean", "min", "max", "count", "count_distinct")
+_ROW_LIMIT = 10_000
+
+
+class QueryError(ValueError):
+    """query_structure that cannot run on this table (unknown column / operator …)."""
+
+
+class _TableIndex:
+    """
+    Lazily built per-column views of one table, reused across queries:
+    - typed values (float64 for numeric columns, str otherwise)
+    - stable sort order + sorted values → equality / range filters by
+      binary search, ORDER BY on one column without sorting
+    - dense codes (np.unique inverse) for GROUP BY / multi-column ORDER BY
+    - lowercased text for "contains"
+    """
+
+    def __init__(self, frame: ColumnarFrame):
+        self.frame = frame
+        self.n = len(frame)
+        self._cache: Dict[Tuple[str, str], Any] = {}
+
+    def _memo(self, kind: str, col: str, build):
+        value = self._cache.get((kind, col))
+        if value is None:
+            value = self._cache[(kind, col)] = build()
+        return value
+
+    def has(self, col: str) -> bool:
+        return col in self.frame.header
+
+    def is_numeric(self, col: str) -> bool:
+        return self._memo("numeric", col, lambda: _numeric_column(self.frame, col))
+
+    def values(self, col: str) -> np.ndarray:
+        if self.is_numeric(col):
+            return self.frame.floats(col)
+        return self.text(col)
+
+    def text(self, col: str) -> np.ndarray:
+        def build():
+            raw = self.frame.column(col)
+            if isinstance(raw, np.ndarray) and raw.dtype.kind == "U":
+                return raw
+            cells = raw.tolist() if isinstance(raw, np.ndarray) else raw
+            return np.array(["" if v is None else str(v) for v in cells], dtype=str)
+        return self._memo("text", col, build)
+
+    def lower(self, col: str) -> np.ndarray:
+        return self._memo("lower", col, lambda: np.char.lower(self.text(col)))
+
+    def present(self, col: str) -> np.ndarray:
+        """Rows with a value (not NaN / not "")"""
+        def build():
+            values = self.values(col)
+            return ~np.isnan(values) if values.dtype.kind == "f" else values != ""
+        return self._memo("present", col, build)
+
+    def sort(self, col: str) -> Tuple[np.ndarray, np.ndarray, int]:
+        """(row order, sorted values, number of non-missing) — NaN / "" sort last"""
+        def build():
+            values = self.values(col)
+            order = np.argsort(values, kind="stable")
+            if values.dtype.kind == "f":
+                valid = int(self.present(col).sum())
+            else:
+                # "" đứng đầu khi sort text → chuyển xuống cuối như NaN
+                missing = len(order) - int(self.present(col).sum())
+                order = np.concatenate([order[missing:], order[:missing]])
+                valid = len(order) - missing
+            return order, values[order], valid
+        return self._memo("sort", col, build)
+
+    def codes(self, col: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(distinct values, code per row) — codes follow value order"""
+        return self._memo("codes", col, lambda: np.unique(self.values(col), return_inverse=True))
+
+
+class QueryExecutor:
+    """
+    Runs query_structure dicts against rows / ColumnarFrame tables:
+    - filters: eq / ne / gt / gte / lt / lte / in / contains; a "contains"
+      on a field that is not a column searches every column (free text),
+      free-text filters are OR-ed, everything else AND-ed
+    - aggregations (sum / avg / min / max / count / count_distinct),
+      optionally per group_by columns (bincount, no per-group loop)
+    - order_by: ["col", "-col"] or [{"column", "direction"}]; limit
+    - actions: select / filter / aggregate / compare / trend_analysis / search
+    Per-table indexes are cached (LRU) by dataset id or content hash.
+    """
+
+    def __init__(self, max_tables: int = 8, default_limit: int = 100):
+        self.max_tables = max_tables
+        self.default_limit = default_limit
+        self._tables: "OrderedDict[str, _TableIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def execute(self, structure: Dict[str, Any], data,
+                dataset_key: Optional[str] = None) -> Dict[str, Any]:
+        """Rows or aggregates for one query_structure"""
+        table = self._table(data, dataset_key)
+        structure = _expand_action(structure or {})
+        mask = self._filter_mask(table, structure.get("filters") or [])
+        limit = _limit(structure.get("limit"), self.default_limit)
+
+        result: Dict[str, Any] = {
+            "action": structure.get("action") or structure.get("type") or "select",
+            "total_rows": table.n,
+            "matched": int(mask.sum()),
+        }
+        if structure.get("aggregations"):
+            group_by = list(structure.get("group_by") or [])
+            _check_columns(table, group_by)
+            if group_by:
+                groups = self._grouped(table, mask, group_by, structure["aggregations"],
+                                       _order_keys(structure.get("order_by")))
+                result["group_count"] = len(groups)
+                result["groups"] = groups[:limit]
+                result["truncated"] = len(groups) > limit
+            else:
+                result["aggregates"] = self._aggregates(table, mask, structure["aggregations"])
+            return result
+
+        index = self._ordered_rows(table, mask, _order_keys(structure.get("order_by")))
+        columns = structure.get("columns") or ["*"]
+        columns = table.frame.header if "*" in columns else [c for c in columns if table.has(c)]
+        selected = index[:limit]
+        cells = [_plain_list(_take(table.frame.column(c), selected)) for c in columns]
+        result["rows"] = [dict(zip(columns, row)) for row in zip(*cells)]
+        result["returned"] = len(result["rows"])
+        result["truncated"] = len(index) > limit
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+
+    # ─── Internals ──────────────────────────────────────────────────────
+
+    def _table(self, data, dataset_key: Optional[str]) -> _TableIndex:
+        key = dataset_key or table_fingerprint(data)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                return table
+        frame = data if isinstance(data, ColumnarFrame) else ColumnarFrame.from_rows(data or [])
+        table = _TableIndex(frame)
+        with self._lock:
+            self._tables[key] = table
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return table
+
+    def _filter_mask(self, table: _TableIndex, filters: List[Dict[str, Any]]) -> np.ndarray:
+        mask = np.ones(table.n, dtype=bool)
+        free_text = None
+        for spec in filters:
+            field = spec.get("field") or spec.get("column")
+            op = _OPERATORS.get(str(spec.get("operator", "eq")).lower())
+            if op is None:
+                raise QueryError(f"Unknown operator '{spec.get('operator')}'")
+            value = spec.get("value")
+            if op == "contains" and not table.has(field):
+                hit = _contains_any_column(table, value)
+                free_text = hit if free_text is None else free_text | hit
+                continue
+            _check_columns(table, [field])
+            mask &= _column_mask(table, field, op, value)
+        if free_text is not None:
+            mask &= free_text
+        return mask
+
+    def _ordered_rows(self, table: _TableIndex, mask: np.ndarray,
+                      order: List[Tuple[str, bool]]) -> np.ndarray:
+        if not order:
+            return np.flatnonzero(mask)
+        _check_columns(table, [col for col, _ in order])
+        if len(order) == 1:
+            col, descending = order[0]
+            row_order, _, valid = table.sort(col)
+            if descending:  # giá trị thiếu vẫn ở cuối
+                row_order = np.concatenate([row_order[:valid][::-1], row_order[valid:]])
+            return row_order[mask[row_order]]
+        index = np.flatnonzero(mask)
+        keys = []
+        for col, descending in reversed(order):
+            distinct, codes = table.codes(col)
+            key = -codes[index] if descending else codes[index]
+            # NaN / "" → mã lớn hơn mọi giá trị: luôn ở cuối, cả asc lẫn desc
+            key[~table.present(col)[index]] = 1 if descending else len(distinct)
+            keys.append(key)
+        return index[np.lexsort(keys)]
+
+    def _aggregates(self, table: _TableIndex, mask: np.ndarray,
+                    aggregations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        out = {}
+        for spec in aggregations:
+            func, col, alias = _aggregate_spec(table, spec)
+            if func == "count" and col is None:
+                out[alias] = int(mask.sum())
+            elif func == "count_distinct":
+                out[alias] = int(len(np.unique(table.codes(col)[1][mask & table.present(col)])))
+            elif func == "count":
+                out[alias] = int((mask & table.present(col)).sum())
+            else:
+                values = table.values(col)[mask]
+                values = values[~np.isnan(values)]
+                out[alias] = _reduce(func, values)
+        return out
+
+    def _grouped(self, table: _TableIndex, mask: np.ndarray, group_by: List[str],
+                 aggregations: List[Dict[str, Any]],
+                 order: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+        rows = np.flatnonzero(mask)
+        key = np.zeros(len(rows), dtype=np.int64)
+        for col in group_by:
+            uniques, codes = table.codes(col)
+            key = key * len(uniques) + codes[rows]
+        _, first, group_of = np.unique(key, return_index=True, return_inverse=True)
+        n_groups = len(first)
+
+        columns: Dict[str, List[Any]] = {
+            col: _plain_list(_take(table.frame.column(col), rows[first])) for col in group_by
+        }
+        for spec in aggregations:
+            func, col, alias = _aggregate_spec(table, spec)
+            if func == "count" and col is None:
+                columns[alias] = np.bincount(group_of, minlength=n_groups).tolist()
+            elif func == "count_distinct":
+                valid = table.present(col)[rows]
+                width = len(table.codes(col)[0]) + 1
+                pairs = np.unique(group_of[valid] * width + table.codes(col)[1][rows[valid]])
+                columns[alias] = np.bincount(pairs // width, minlength=n_groups).tolist()
+            else:
+                values = table.values(col)[rows]
+                valid = table.present(col)[rows]
+                if func == "count":
+                    columns[alias] = np.bincount(group_of[valid], minlength=n_groups).tolist()
+                    continue
+                columns[alias] = _grouped_reduce(func, group_of[valid], values[valid], n_groups)
+
+        names = list(columns)
+        groups = [dict(zip(names, cells)) for cells in zip(*columns.values())]
+        for col, descending in reversed(order):
+            if col not in columns:
+                raise QueryError(f"order_by '{col}' is neither a group_by column nor an aggregate alias")
+            # None (nhóm không có giá trị) ở cuối cho cả asc lẫn desc
+            ranked = sorted((g for g in groups if g[col] is not None),
+                            key=lambda g: g[col], reverse=descending)
+            groups = ranked + [g for g in groups if g[col] is None]
+        return groups
+
+
+def _numeric_column(frame: ColumnarFrame, col: str) -> bool:
+    raw = frame.column(col)
+    if isinstance(raw, np.ndarray) and raw.dtype.kind in "fiub":
+        return True
+    if isinstance(raw, np.ndarray) and raw.dtype.kind in "UO":
+        return False  # cột text đã typed (dataset registry)
+    cells = raw.tolist() if isinstance(raw, np.ndarray) else raw
+    present = sum(1 for v in cells if v is not None and v != "")
+    if not present:
+        return False
+    return int((~np.isnan(frame.floats(col))).sum()) == present
+
+
+def _column_mask(table: _TableIndex, col: str, op: str, value: Any) -> np.ndarray:
+    mask = np.zeros(table.n, dtype=bool)
+    if op == "contains":
+        return np.char.find(table.lower(col), str(value).lower()) >= 0
+    if op == "ne":
+        return ~_column_mask(table, col, "eq", value)
+    if op == "in":
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            mask |= _column_mask(table, col, "eq", item)
+        return mask
+
+    order, ordered, valid = table.sort(col)
+    target = _coerce(table, col, value)
+    if target is None:
+        return mask  # "abc" trên cột số: không row nào khớp
+    if op == "eq" and target == "":
+        return table.text(col) == ""  # eq None / "" trên cột text: ô thiếu
+    ordered = ordered[:valid]
+    if op == "eq":
+        lo, hi = np.searchsorted(ordered, target, "left"), np.searchsorted(ordered, target, "right")
+    elif op == "gt":
+        lo, hi = np.searchsorted(ordered, target, "right"), valid
+    elif op == "gte":
+        lo, hi = np.searchsorted(ordered, target, "left"), valid
+    elif op == "lt":
+        lo, hi = 0, np.searchsorted(ordered, target, "left")
+    else:  # lte
+        lo, hi = 0, np.searchsorted(ordered, target, "right")
+    mask[order[lo:hi]] = True
+    return mask
+
+
+def _contains_any_column(table: _TableIndex, value: Any) -> np.ndarray:
+    needle = str(value).lower()
+    hit = np.zeros(table.n, dtype=bool)
+    for col in table.frame.header:
+        hit |= np.char.find(table.lower(col), needle) >= 0
+    return hit
+
+
+def _coerce(table: _TableIndex, col: str, value: Any):
+    if not table.is_numeric(col):
+        return "" if value is None else str(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _aggregate_spec(table: _TableIndex, spec: Dict[str, Any]) -> Tuple[str, Optional[str], str]:
+    func = str(spec.get("function", "count")).lower()
+    if func not in _AGGREGATES:
+        raise QueryError(f"Unknown aggregate '{func}' (expected one of {list(_AGGREGATES)})")
+    func = "avg" if func == "mean" else func
+    col = spec.get("column")
+    if col in (None, "*"):
+        if func != "count":
+            raise QueryError(f"Aggregate '{func}' needs a column")
+        return func, None, spec.get("alias") or "count"
+    _check_columns(table, [col])
+    if func in ("sum", "avg", "min", "max") and not table.is_numeric(col):
+        raise QueryError(f"Aggregate '{func}' needs a numeric column, '{col}' is text")
+    return func, col, spec.get("alias") or f"{func}_{col}"
+
+
+def _reduce(func: str, values: np.ndarray) -> Optional[float]:
+    if not len(values):
+        return None  # như SQL: sum / avg / min / max của tập rỗng là NULL
+    if func == "sum":
+        return float(values.sum())
+    if func == "avg":
+        return float(values.mean())
+    return float(values.min() if func == "min" else values.max())
+
+
+def _grouped_reduce(func: str, group_of: np.ndarray, values: np.ndarray,
+                    n_groups: int) -> List[Optional[float]]:
+    counts = np.bincount(group_of, minlength=n_groups)
+    if func == "sum":
+        out = np.bincount(group_of, weights=values, minlength=n_groups)
+    elif func == "avg":
+        sums = np.bincount(group_of, weights=values, minlength=n_groups)
+        out = sums / np.maximum(counts, 1)
+    else:
+        fill, reducer = (np.inf, np.minimum) if func == "min" else (-np.inf, np.maximum)
+        out = np.full(n_groups, fill)
+        reducer.at(out, group_of, values)
+    return np.where(counts > 0, out.astype(object), None).tolist()
+
+
+def _check_columns(table: _TableIndex, columns: List[str]) -> None:
+    missing = [c for c in columns if not table.has(c)]
+    if missing:
+        raise QueryError(f"Unknown column(s) {missing}; available: {table.frame.header}")
+
+
+def _order_keys(order_by) -> List[Tuple[str, bool]]:
+    keys = []
+    for item in order_by or []:
+        if isinstance(item, dict):
+            col = item.get("column") or item.get("field")
+            keys.append((col, str(item.get("direction", "asc")).lower() == "desc"))
+        elif isinstance(item, str) and item.startswith("-"):
+            keys.append((item[1:], True))
+        else:
+            keys.append((str(item), False))
+    return keys
+
+
+def _limit(limit, default: int) -> int:
+    try:
+        limit = int(limit) if limit is not None else default
+    except (TypeError, ValueError):
+        raise QueryError(f"Invalid limit '{limit}'")
+    return max(0, min(limit, _ROW_LIMIT))
+
+
+def _expand_action(structure: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill filters / aggregations for the action-only structures NLPProcessor emits"""
+    structure = dict(structure)
+    action = structure.get("action")
+    if action == "search" and structure.get("search_terms"):
+        structure["filters"] = list(structure.get("filters") or []) + [
+            {"field": None, "operator": "contains", "value": term}
+            for term in structure["search_terms"]
+        ]
+    elif action == "trend_analysis" and not structure.get("aggregations"):
+        time_column = structure.get("time_column") or "date"
+        structure["group_by"] = [time_column]
+        structure["aggregations"] = [{"function": "sum",
+                                      "column": structure.get("value_column") or "value",
+                                      "alias": "value"}]
+        structure["order_by"] = structure.get("order_by") or [time_column]
+    elif action == "compare" and structure.get("columns") and not structure.get("aggregations"):
+        structure["aggregations"] = [
+            {"function": func, "column": col}
+            for col in structure["columns"] if col != "*" for func in ("sum", "avg")
+        ]
+    return structure
+
+
+# Singleton instance
+query_executor = QueryExecutor()
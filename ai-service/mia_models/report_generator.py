@@ -7,11 +7,14 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import json
 
+from .column_stats import TableStatistics
+
 
 class ReportGenerator:
     """
     Generate automated reports:
-    - Summary reports
+    - Summary reports (per-column count / sum / avg / min / max / std /
+      p50 / p95 / p99, one NumPy pass per column)
     - Trend reports
     - Anomaly reports
     - Custom reports
@@ -20,9 +23,9 @@ class ReportGenerator:
     def __init__(self):
         self.reports = []
 
-    def generate_summary_report(self, data: List[Dict[str, Any]], title: str = "Data Summary") -> Dict[str, Any]:
-        """Generate summary report"""
-        if not data:
+    def generate_summary_report(self, data, title: str = "Data Summary") -> Dict[str, Any]:
+        """Generate summary report (rows, ColumnarFrame or TableStatistics)"""
+        if data is None or len(data) == 0:
             return {
                 "title": title,
                 "type": "summary",
@@ -31,66 +34,38 @@ class ReportGenerator:
                 "sections": []
             }
 
+        # Mỗi cột thống kê 1 lượt NumPy, memo trong TableStatistics
+        stats = TableStatistics.of(data)
         report = {
             "title": title,
             "type": "summary",
             "timestamp": datetime.now().isoformat(),
-            "data_points": len(data),
+            "data_points": len(stats),
             "sections": []
         }
 
-        # Basic statistics
-        if data and len(data) > 0:
-            # Calculate basic stats for numeric columns
-            numeric_columns = {}
-            for row in data:
-                for key, value in row.items():
-                    if isinstance(value, (int, float)):
-                        if key not in numeric_columns:
-                            numeric_columns[key] = []
-                        numeric_columns[key].append(value)
-
-            if numeric_columns:
-                stats_section = {
-                    "section": "Statistics",
-                    "content": {}
-                }
-                for col, values in numeric_columns.items():
-                    if values:
-                        stats_section["content"][col] = {
-                            "count": len(values),
-                            "min": min(values),
-                            "max": max(values),
-                            "avg": sum(values) / len(values),
-                            "sum": sum(values)
-                        }
-                report["sections"].append(stats_section)
-
-            # Data range
-            date_columns = [key for key in data[0].keys() if "date" in key.lower() or "time" in key.lower()]
-            if date_columns:
-                range_section = {
-                    "section": "Date Range",
-                    "content": {}
-                }
-                for col in date_columns:
-                    dates = [row.get(col) for row in data if col in row and row.get(col)]
-                    if dates:
-                        range_section["content"][col] = {
-                            "earliest": min(dates),
-                            "latest": max(dates),
-                            "span_days": (max(dates) - min(dates)).days if hasattr(max(dates), '__sub__') else None
-                        }
-                report["sections"].append(range_section)
+        numeric_columns = stats.numeric()
+        if numeric_columns:
+            report["sections"].append({
+                "section": "Statistics",
+                "content": numeric_columns
+            })
+
+        date_ranges = stats.date_ranges()
+        if date_ranges:
+            report["sections"].append({
+                "section": "Date Range",
+                "content": date_ranges
+            })
 
         return report
 
-    def generate_trend_report(self, data: List[Dict[str, Any]], value_column: str,
+    def generate_trend_report(self, data, value_column: str,
                              date_column: str = None, title: str = "Trend Analysis") -> Dict[str, Any]:
-        """Generate trend analysis report"""
-        from .pattern_recognizer import pattern_recognizer
+        """Generate trend analysis report (rows, ColumnarFrame, ColumnarSeries or AnalysisContext)"""
+        from .predictive_alerts import AnalysisContext
 
-        if not data:
+        if data is None or len(data) == 0:
             return {
                 "title": title,
                 "type": "trend",
@@ -99,13 +74,15 @@ class ReportGenerator:
             }
 
         # Analyze patterns
-        pattern_analysis = pattern_recognizer.analyze_patterns(data, value_column, date_column)
+        context = AnalysisContext.of(data, value_column, date_column)
+        pattern_analysis = context.patterns()
 
         report = {
             "title": title,
             "type": "trend",
             "timestamp": datetime.now().isoformat(),
-            "data_points": len(data),
+            "data_points": len(context),
+            "statistics": context.statistics,
             "trend_analysis": pattern_analysis.get("trends", {}),
             "cycle_analysis": pattern_analysis.get("cycles", {}),
             "anomalies": pattern_analysis.get("anomalies", []),
@@ -115,12 +92,12 @@ class ReportGenerator:
 
         return report
 
-    def generate_anomaly_report(self, data: List[Dict[str, Any]], value_column: str,
+    def generate_anomaly_report(self, data, value_column: str,
                                title: str = "Anomaly Detection") -> Dict[str, Any]:
-        """Generate anomaly detection report"""
-        from .pattern_recognizer import pattern_recognizer
+        """Generate anomaly detection report (rows, ColumnarFrame, ColumnarSeries or AnalysisContext)"""
+        from .predictive_alerts import AnalysisContext
 
-        if not data:
+        if data is None or len(data) == 0:
             return {
                 "title": title,
                 "type": "anomaly",
@@ -128,13 +105,15 @@ class ReportGenerator:
                 "error": "No data provided"
             }
 
-        anomalies = pattern_recognizer.detect_anomalies(data, value_column)
+        context = AnalysisContext.of(data, value_column)
+        anomalies = context.anomalies
 
         report = {
             "title": title,
             "type": "anomaly",
             "timestamp": datetime.now().isoformat(),
-            "data_points": len(data),
+            "data_points": len(context),
+            "statistics": context.statistics,
             "anomaly_count": len(anomalies),
             "anomalies": anomalies,
             "severity_breakdown": self._count_by_severity(anomalies),
@@ -182,10 +161,10 @@ class ReportGenerator:
 
         return report
 
-    def generate_comprehensive_report(self, data: List[Dict[str, Any]], value_column: str,
+    def generate_comprehensive_report(self, data, value_column: str,
                                      date_column: str = None, title: str = "Comprehensive Report") -> Dict[str, Any]:
-        """Generate comprehensive report with all analyses"""
-        if not data:
+        """Generate comprehensive report with all analyses (rows, ColumnarFrame or TableStatistics)"""
+        if data is None or len(data) == 0:
             return {
                 "title": title,
                 "type": "comprehensive",
@@ -193,10 +172,15 @@ class ReportGenerator:
                 "error": "No data provided"
             }
 
-        # Generate all report types
-        summary = self.generate_summary_report(data, f"{title} - Summary")
-        trend = self.generate_trend_report(data, value_column, date_column, f"{title} - Trends")
-        anomaly = self.generate_anomaly_report(data, value_column, f"{title} - Anomalies")
+        from .predictive_alerts import AnalysisContext
+
+        # Generate all report types from one table / one context: column stats,
+        # value column, trend fit and anomaly list are each computed once
+        stats = TableStatistics.of(data)
+        context = AnalysisContext(stats.series(value_column, date_column), value_column)
+        summary = self.generate_summary_report(stats, f"{title} - Summary")
+        trend = self.generate_trend_report(context, value_column, date_column, f"{title} - Trends")
+        anomaly = self.generate_anomaly_report(context, value_column, f"{title} - Anomalies")
 
         report = {
             "title": title,
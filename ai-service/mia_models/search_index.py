@@ -0,0 +1,324 @@
+"""
+Search Index
+Inverted index + BM25 cho smart_search: build 1 lần / dataset, query không quét toàn bộ rows.
+Thêm chế độ "vector": TF-IDF trên char n-gram (hashing), chạy offline, không cần model.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .series import ColumnarFrame
+from .text_fold import fold_text
+
+_TOKEN = re.compile(r"\w+")
+_NON_WORD = re.compile(r"\W+")
+_CELL_NON_WORD = re.compile(r"[^\w\x00]+")
+_EXTRA_SPACE = re.compile(r" {2,}")
+_SPACE_AROUND_SEP = re.compile(r" ?\x00 ?")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(fold_text(text))
+
+
+def _table_cells(data, columns: Optional[List[str]]):
+    """(selected columns, cell lists per column, row count)"""
+    if isinstance(data, ColumnarFrame):
+        selected = [c for c in (columns or data.header) if c in data.header]
+        return selected, [data.column(c) for c in selected], len(data)
+    selected = columns or (list(data[0].keys()) if data else [])
+    return selected, [[row.get(c) for row in data] for c in selected], len(data)
+
+
+def _fold_column(cells) -> List[str]:
+    """Folded, punctuation-free text of every cell — one regex pass over the whole column"""
+    if isinstance(cells, np.ndarray):
+        cells = cells.tolist()
+    strs = ["" if v is None or v != v else str(v) for v in cells]  # v != v: NaN
+    folded = _CELL_NON_WORD.sub(" ", fold_text("\x00".join(strs))).split("\x00")
+    if len(folded) != len(strs):  # cell chứa \x00
+        folded = [_NON_WORD.sub(" ", fold_text(v)) for v in strs]
+    return folded
+
+
+def table_fingerprint(data, columns: Optional[Sequence[str]] = None) -> str:
+    """Content hash of an inline table (cache key when there is no dataset id)"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(columns or []), ensure_ascii=False).encode("utf-8"))
+    if isinstance(data, ColumnarFrame):
+        for col in data.header:
+            digest.update(json.dumps(list(data.column(col)), default=str).encode("utf-8"))
+    else:
+        digest.update(json.dumps(data, default=str, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """
+    Tokenized inverted index over the text of selected columns:
+    - tokens folded (lowercase, no diacritics) so "don hang" matches "đơn hàng"
+    - postings in CSR arrays: term → (doc ids, term frequencies)
+    - Okapi BM25 scoring touches only the postings of the query terms
+    - query terms of 3+ chars also match longer terms they prefix
+      ("ord" → "order", "orders"), at half weight
+    """
+
+    def __init__(self, data, columns: Optional[List[str]] = None,
+                 k1: float = 1.2, b: float = 0.75, max_expansions: int = 50):
+        self.k1 = k1
+        self.b = b
+        self.max_expansions = max_expansions
+
+        self.columns, cells_by_column, self.n_docs = _table_cells(data, columns)
+
+        vocab: Dict[str, int] = {}
+        memo: Dict[str, List[int]] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        for cells in cells_by_column:
+            for doc, value in enumerate(cells):
+                if value is None or value == "" or value != value:  # value != value: NaN
+                    continue
+                text = value if type(value) is str else str(value)  # list / dict / True ≠ 1
+                ids = memo.get(text)
+                if ids is None:
+                    ids = [vocab.setdefault(t, len(vocab)) for t in tokenize(text)]
+                    memo[text] = ids
+                term_ids.extend(ids)
+                doc_ids.extend([doc] * len(ids))
+
+        self.terms = sorted(vocab)
+        self.vocab = {t: i for i, t in enumerate(self.terms)}
+        remap = np.empty(len(vocab), dtype=np.int64)
+        for term, old_id in vocab.items():
+            remap[old_id] = self.vocab[term]
+
+        terms = remap[np.asarray(term_ids, dtype=np.int64)] if term_ids else np.zeros(0, np.int64)
+        docs = np.asarray(doc_ids, dtype=np.int64)
+        self.doc_len = np.bincount(docs, minlength=self.n_docs).astype(np.float32)
+        self.avgdl = float(self.doc_len.mean()) if self.n_docs else 0.0
+
+        # (term, doc) → tf, sắp theo term rồi doc
+        pairs, tf = np.unique(terms * max(self.n_docs, 1) + docs, return_counts=True)
+        pair_terms = pairs // max(self.n_docs, 1)
+        self.postings_doc = (pairs % max(self.n_docs, 1)).astype(np.int32)
+        self.postings_tf = tf.astype(np.float32)
+        self.indptr = np.searchsorted(pair_terms, np.arange(len(self.terms) + 1)).astype(np.int64)
+
+    @property
+    def size(self) -> int:
+        """Number of postings (memory ≈ 8 bytes each)"""
+        return len(self.postings_doc)
+
+    def _expand(self, token: str) -> List[tuple]:
+        """(term id, weight) pairs for one query token"""
+        matches = []
+        exact = self.vocab.get(token)
+        if exact is not None:
+            matches.append((exact, 1.0))
+        if len(token) >= 3:
+            i = bisect_left(self.terms, token)
+            while i < len(self.terms) and len(matches) < self.max_expansions:
+                term = self.terms[i]
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    matches.append((i, 0.5))
+                i += 1
+        return matches
+
+    def _token_scores(self, token: str):
+        """(doc ids, BM25 scores) for one query token — best expansion per doc"""
+        doc_parts, score_parts = [], []
+        for term_id, weight in self._expand(token):
+            lo, hi = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.postings_doc[lo:hi]
+            tf = self.postings_tf[lo:hi]
+            df = hi - lo
+            idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / (self.avgdl or 1.0))
+            doc_parts.append(docs)
+            score_parts.append(weight * idf * tf * (self.k1 + 1) / (tf + norm))
+        if not doc_parts:
+            return None, None
+        if len(doc_parts) == 1:
+            return doc_parts[0], score_parts[0]
+        # "ord" không được cộng dồn cho cả "order" lẫn "orders" trong cùng một row
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        best = np.zeros(len(docs))
+        np.maximum.at(best, inverse, np.concatenate(score_parts))
+        return docs, best
+
+    def search(self, query: str, top_k: int = 50) -> List[tuple]:
+        """[(doc id, score)] best first"""
+        if not self.n_docs:
+            return []
+        doc_parts, score_parts = [], []
+        for token in dict.fromkeys(tokenize(query)):
+            docs, scores = self._token_scores(token)
+            if docs is not None:
+                doc_parts.append(docs)
+                score_parts.append(scores)
+        if not doc_parts:
+            return []
+
+        candidates, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+        # điểm giảm dần, hòa thì giữ thứ tự row
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+class NgramVectorIndex:
+    """
+    Offline "similar wording" search (no model, no network):
+    - each row = folded text of the selected columns, padded with spaces
+    - character n-grams hashed into `2**dim_bits` buckets with a vectorized
+      rolling hash over the code points (no Python loop per n-gram)
+    - sublinear TF × smoothed IDF, rows L2-normalized → cosine similarity
+    - stored column-major (bucket → rows), so the sparse matrix × query
+      vector product only reads the buckets present in the query; buckets
+      found in more than `max_df` of the rows (and 1000+ rows) are skipped
+      at query time
+    "ao thun trang" then ranks "ao phong mau trang" through shared n-grams
+    (" ao", "tra", "ang", …) even without an exact token match.
+    """
+
+    def __init__(self, data, columns: Optional[List[str]] = None,
+                 ngram: int = 3, dim_bits: int = 20, min_score: float = 0.1,
+                 max_df: float = 0.3):
+        self.ngram = ngram
+        self.max_df = max_df
+        self.dim_bits = dim_bits
+        self.min_score = min_score
+        self.columns, cells_by_column, self.n_docs = _table_cells(data, columns)
+
+        folded = [_fold_column(cells) for cells in cells_by_column]
+        if folded and self.n_docs:
+            # ghép các cột của một row, gộp khoảng trắng thừa (cell rỗng)
+            joined = _EXTRA_SPACE.sub(" ", "\x00".join(" ".join(parts) for parts in zip(*folded)))
+            texts = _SPACE_AROUND_SEP.sub("\x00", joined).strip(" ").split("\x00")
+        else:
+            texts = [""] * self.n_docs
+
+        buckets, docs = self._hash_ngrams(texts)
+        n_buckets = 1 << dim_bits
+        n = max(self.n_docs, 1)
+        # (bucket, row) → tf, sắp theo bucket rồi row (CSC)
+        pairs, tf = np.unique(buckets * n + docs, return_counts=True)
+        pair_buckets = pairs // n
+        self.postings_doc = (pairs % n).astype(np.int32)
+        self.indptr = np.searchsorted(pair_buckets, np.arange(n_buckets + 1)).astype(np.int64)
+
+        df = np.diff(self.indptr)
+        self.idf = (np.log((1 + self.n_docs) / (1 + df)) + 1).astype(np.float32)
+        weights = (1 + np.log(tf)) * self.idf[pair_buckets]
+        norms = np.sqrt(np.bincount(self.postings_doc, weights=weights * weights,
+                                    minlength=self.n_docs))
+        norms[norms == 0] = 1.0
+        self.postings_w = (weights / norms[self.postings_doc]).astype(np.float32)
+
+    @property
+    def size(self) -> int:
+        """Number of stored (bucket, row) weights"""
+        return len(self.postings_doc)
+
+    def _hash_ngrams(self, texts: List[str]):
+        """(bucket, row) for every character n-gram of every text"""
+        padded = [f" {t} " if t else "" for t in texts]
+        lengths = np.fromiter((len(t) for t in padded), dtype=np.int64, count=len(padded))
+        codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        row_of = np.repeat(np.arange(len(padded), dtype=np.int64), lengths)
+
+        k = self.ngram
+        if len(codes) < k:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        h = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+        for j in range(k):
+            h = h * np.uint64(1000003) + codes[j:len(codes) - k + 1 + j]
+        # Fibonacci hashing: lấy các bit cao sau khi nhân
+        h = (h * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(64 - self.dim_bits)
+        start_row = row_of[:len(h)]
+        valid = start_row == row_of[k - 1:]  # n-gram không vắt qua 2 row
+        return h[valid].astype(np.int64), start_row[valid]
+
+    def search(self, query: str, top_k: int = 50) -> List[tuple]:
+        """[(row id, cosine score)] best first, scores below `min_score` dropped"""
+        text = _NON_WORD.sub(" ", fold_text(query)).strip()
+        if not self.n_docs or not text:
+            return []
+        buckets, _ = self._hash_ngrams([text])
+        buckets, tf = np.unique(buckets, return_counts=True)
+        # n-gram có trong quá nhiều row gần như không phân biệt được gì mà lại tốn nhất
+        df = self.indptr[buckets + 1] - self.indptr[buckets]
+        selective = df <= max(self.max_df * self.n_docs, 1000)
+        if selective.any():
+            buckets, tf = buckets[selective], tf[selective]
+        q = (1 + np.log(tf)) * self.idf[buckets]
+        q_norm = float(np.sqrt((q * q).sum()))
+        if not q_norm:
+            return []
+        q /= q_norm
+
+        doc_parts, weight_parts = [], []
+        for bucket, qw in zip(buckets, q):
+            lo, hi = self.indptr[bucket], self.indptr[bucket + 1]
+            if hi > lo:
+                doc_parts.append(self.postings_doc[lo:hi])
+                weight_parts.append(self.postings_w[lo:hi] * qw)
+        if not doc_parts:
+            return []
+        candidates, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weight_parts))
+
+        keep = np.flatnonzero(scores >= self.min_score)
+        k = min(top_k, len(keep))
+        if not k:
+            return []
+        top = keep[np.argpartition(-scores[keep], k - 1)[:k]] if k < len(keep) else keep
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+class SearchIndexCache:
+    """LRU of search indexes keyed by dataset id / content hash + index type, capped by postings"""
+
+    def __init__(self, max_indexes: int = 8, max_postings: int = 20_000_000):
+        self.max_indexes = max_indexes
+        self.max_postings = max_postings
+        self._indexes: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, data, columns: Optional[List[str]] = None,
+            index_class=BM25Index):
+        key = f"{index_class.__name__}:{key}:{','.join(columns or [])}"
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        index = index_class(data, columns)
+        with self._lock:
+            self._indexes[key] = index
+            total = sum(i.size for i in self._indexes.values())
+            while len(self._indexes) > 1 and (
+                len(self._indexes) > self.max_indexes or total > self.max_postings
+            ):
+                _, evicted = self._indexes.popitem(last=False)
+                total -= evicted.size
+        return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
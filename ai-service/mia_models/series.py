@@ -0,0 +1,261 @@
+"""
+Columnar Series
+Chuyển payload List[Dict] (hoặc payload dạng cột) sang mảng NumPy một lần cho mỗi request
+"""
+
+from datetime import date, datetime
+from itertools import zip_longest
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class ColumnarSeries:
+    """
+    Columnar view of one value column:
+    - values: float64 array (NaN where the row has no usable value)
+    - mask: validity mask (key present and value convertible to float)
+    - timestamps: optional object array (date column, or "timestamp"/"date")
+
+    Build it once per request with `from_rows` and hand it to every
+    PatternRecognizer method instead of the raw rows.
+    """
+
+    __slots__ = ("values", "mask", "timestamps", "name", "_valid")
+
+    def __init__(self, values: np.ndarray, mask: Optional[np.ndarray] = None,
+                 timestamps: Optional[np.ndarray] = None, name: Optional[str] = None):
+        self.values = np.asarray(values, dtype=float)
+        self.mask = ~np.isnan(self.values) if mask is None else np.asarray(mask, dtype=bool)
+        self.timestamps = timestamps
+        self.name = name
+        self._valid = None
+
+    @classmethod
+    def from_rows(cls, data: List[Dict[str, Any]], value_column: str,
+                  date_column: str = None) -> "ColumnarSeries":
+        """Extract value (and timestamp) column from dict rows in one pass"""
+        values = to_float_array([row.get(value_column) for row in data])
+        mask = ~np.isnan(values)
+
+        if date_column:
+            timestamps = np.array([row.get(date_column) for row in data], dtype=object)
+        else:
+            timestamps = np.array(
+                [row.get("timestamp") or row.get("date") for row in data], dtype=object
+            )
+        return cls(values, mask, timestamps, value_column)
+
+    @classmethod
+    def many_from_rows(cls, data: List[Dict[str, Any]], value_columns: List[str],
+                       date_column: str = None) -> Dict[str, "ColumnarSeries"]:
+        """Extract several value columns that share one timestamp array"""
+        if date_column:
+            timestamps = np.array([row.get(date_column) for row in data], dtype=object)
+        else:
+            timestamps = np.array(
+                [row.get("timestamp") or row.get("date") for row in data], dtype=object
+            )
+        result = {}
+        for col in value_columns:
+            values = to_float_array([row.get(col) for row in data])
+            result[col] = cls(values, ~np.isnan(values), timestamps, col)
+        return result
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def valid_count(self) -> int:
+        return int(self.mask.sum())
+
+    @property
+    def valid_values(self) -> np.ndarray:
+        """Values of rows with a usable value, in row order"""
+        if self._valid is None:
+            self._valid = self.values if self.mask.all() else self.values[self.mask]
+        return self._valid
+
+    @property
+    def valid_index(self) -> np.ndarray:
+        """Original row positions of `valid_values`"""
+        return np.flatnonzero(self.mask)
+
+    def sample_spacing(self) -> Optional[float]:
+        """Median spacing of the timestamps in seconds (None if not parseable)"""
+        if self.timestamps is None:
+            return None
+        stamps = self.timestamps[self.mask]
+        stamps = stamps[stamps != None]  # noqa: E711 — elementwise trên object array
+        if len(stamps) < 2 or not isinstance(stamps[0], (str, datetime, date)):
+            return None
+        try:
+            parsed = np.array(stamps[:1000].tolist(), dtype="datetime64[s]")
+        except (TypeError, ValueError):
+            return None
+        steps = np.diff(parsed).astype(float)
+        steps = steps[steps > 0]
+        return float(np.median(steps)) if len(steps) else None
+
+    def timestamp_at(self, index: int) -> Any:
+        if self.timestamps is None:
+            return None
+        return self.timestamps[index]
+
+
+class ColumnarFrame:
+    """
+    Column-oriented table decoded straight from a compact payload:
+    - from_columns(header, column_values): one array per column
+    - from_grid(sheet_values): Google Sheets values grid, first row = header
+    - from_rows(rows): row dicts (header = union of keys)
+
+    Columns stay as raw lists until a numeric view is asked for; each column
+    is converted to float64 at most once. Rows are never materialized unless
+    a row-oriented model needs them (`to_rows`).
+    """
+
+    __slots__ = ("header", "_columns", "_floats", "_length")
+
+    def __init__(self, columns: Dict[str, Sequence[Any]]):
+        self.header = list(columns)
+        self._columns = columns
+        self._floats: Dict[str, np.ndarray] = {}
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        self._length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_columns(cls, header: List[str],
+                     column_values: List[Sequence[Any]]) -> "ColumnarFrame":
+        if len(header) != len(column_values):
+            raise ValueError(
+                f"header has {len(header)} names but {len(column_values)} columns were sent")
+        return cls(dict(zip(header, column_values)))
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "ColumnarFrame":
+        """Row dicts → columns (header = union of keys, first-seen order)"""
+        header: Dict[str, None] = {}
+        for row in rows:
+            for key in row:
+                header.setdefault(key)
+        return cls({col: [row.get(col) for row in rows] for col in header})
+
+    @classmethod
+    def from_grid(cls, sheet_values: List[List[Any]]) -> "ColumnarFrame":
+        """Transpose a values grid; short rows are padded with None"""
+        if not sheet_values:
+            return cls({})
+        header = [
+            (str(h).strip() if h is not None else "") or f"col_{i}"
+            for i, h in enumerate(sheet_values[0])
+        ]
+        width = len(header)
+        body = [row[:width] for row in sheet_values[1:]]
+        if body:
+            # Hàng ngắn hơn header → None; zip_longest chuyển vị trong C
+            body[0] = list(body[0]) + [None] * (width - len(body[0]))
+            columns = list(zip_longest(*body, fillvalue=None))
+        else:
+            columns = [()] * width
+        return cls(dict(zip(header, columns)))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def column(self, name: str) -> Sequence[Any]:
+        """Raw column values (all None if the column is missing)"""
+        values = self._columns.get(name)
+        return values if values is not None else [None] * self._length
+
+    def floats(self, name: str) -> np.ndarray:
+        """Column as float64, NaN where a cell is missing or not numeric"""
+        values = self._floats.get(name)
+        if values is None:
+            raw = self.column(name)
+            if isinstance(raw, np.ndarray) and raw.dtype.kind in "fiu":
+                # cột đã typed (vd. mmap từ dataset registry)
+                values = raw if raw.dtype.kind == "f" else raw.astype(float)
+            else:
+                values = to_float_array(list(raw))
+            self._floats[name] = values
+        return values
+
+    def timestamps(self, date_column: str = None) -> np.ndarray:
+        if not date_column:
+            date_column = "timestamp" if "timestamp" in self._columns else "date"
+        return np.array(self.column(date_column), dtype=object)
+
+    def series(self, value_column: str, date_column: str = None) -> "ColumnarSeries":
+        values = self.floats(value_column)
+        return ColumnarSeries(values, ~np.isnan(values), self.timestamps(date_column), value_column)
+
+    def matrix(self, columns: List[str]) -> np.ndarray:
+        """(rows × columns) float64 matrix"""
+        matrix = np.empty((self._length, len(columns)), dtype=float)
+        for j, col in enumerate(columns):
+            matrix[:, j] = self.floats(col)
+        return matrix
+
+    def to_rows(self, index: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Row dicts for models that still iterate rows (optionally only `index` rows)"""
+        names = self.header
+        columns = [_plain_list(_take(self._columns[n], index)) for n in names]
+        return [dict(zip(names, cells)) for cells in zip(*columns)]
+
+
+def _take(values: Sequence[Any], index: Optional[np.ndarray]) -> Sequence[Any]:
+    if index is None:
+        return values
+    if isinstance(values, np.ndarray):
+        return values[index]
+    return [values[i] for i in index]
+
+
+def _plain_list(values: Sequence[Any]) -> List[Any]:
+    """Python values for a column (NumPy arrays: NaN → None)"""
+    if not isinstance(values, np.ndarray):
+        return values
+    if values.dtype.kind == "f":
+        return np.where(np.isnan(values), None, values.astype(object)).tolist()
+    return values.tolist()
+
+
+def to_float_array(raw: List[Any]) -> np.ndarray:
+    """Convert a list of cell values to float64, unusable values → NaN"""
+    try:
+        # Fast path: numbers, numeric strings and None (→ NaN) convert in C
+        return np.array(raw, dtype=float)
+    except (TypeError, ValueError):
+        return np.fromiter((_to_float(v) for v in raw), dtype=float, count=len(raw))
+
+
+def extract_matrix(data: List[Dict[str, Any]], columns: List[str]) -> np.ndarray:
+    """(rows × columns) float64 matrix, NaN where a row lacks the key/value"""
+    if isinstance(data, ColumnarFrame):
+        return data.matrix(columns)
+    matrix = np.empty((len(data), len(columns)), dtype=float)
+    for j, col in enumerate(columns):
+        matrix[:, j] = to_float_array([row.get(col) for row in data])
+    return matrix
+
+
+def _to_float(value: Any) -> float:
+    """float() that maps unconvertible values to NaN"""
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def as_series(data, value_column: str, date_column: str = None) -> ColumnarSeries:
+    """Return `data` unchanged if it is already a ColumnarSeries, else extract it"""
+    if isinstance(data, ColumnarSeries):
+        return data
+    if isinstance(data, ColumnarFrame):
+        return data.series(value_column, date_column)
+    return ColumnarSeries.from_rows(data or [], value_column, date_column)
@@ -3,10 +3,18 @@ Smart Categorizer Model
 Smart categorization của data
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+import hashlib
+import json
+import math
+import os
+import random
 import re
-from collections import Counter
+import threading
+from collections import OrderedDict
+
+from .keyword_tagger import PRIORITIES, KeywordTagger, keyword_tagger
 
 try:
     import pandas as pd
@@ -14,6 +22,17 @@ try:
 except ImportError:
     HAS_PANDAS = False
 
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# _looks_like_date: YYYY-MM-DD, MM/DD/YYYY, DD-MM-YYYY ở đầu chuỗi (re.match)
+_DATE_PREFIX = re.compile(r"\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}")
+_STATUS_WORDS = ("active", "inactive", "completed", "pending", "done")
+_PRIORITY_VALUE_WORDS = ("urgent", "high", "low", "medium", "important")
+
 
 class SmartCategorizer:
     """
@@ -21,10 +40,23 @@ class SmartCategorizer:
     - Auto-categorize by patterns
     - Group similar items
     - Tag classification
-    - Priority classification
+    - Priority classification (keyword vocabulary: KeywordTagger)
+    - category_rules compiled to column masks (categorize_table)
+    - Bulk column profiling on a reservoir sample, cached per (dataset, column)
     """
 
-    def __init__(self):
+    OUTPUT_MODES = ("rows", "columns")
+    MAX_PROFILE_SAMPLE = 10000
+
+    def __init__(self, tagger: Optional[KeywordTagger] = None,
+                 profile_sample_size: int = None, profile_cache_size: int = None):
+        self.keyword_tagger = tagger or keyword_tagger
+        self.profile_sample_size = profile_sample_size or int(
+            os.getenv("AI_PROFILE_SAMPLE_SIZE", "200"))
+        self.profile_cache_size = profile_cache_size or int(
+            os.getenv("AI_PROFILE_CACHE_SIZE", "4096"))
+        self._profile_cache: "OrderedDict[Tuple[str, str, int], Dict[str, Any]]" = OrderedDict()
+        self._profile_lock = threading.Lock()
         self.categories = {}
         self.patterns = {
             "financial": ["price", "cost", "revenue", "profit", "expense", "budget", "$", "đ"],
@@ -72,11 +104,21 @@ class SmartCategorizer:
         if not values:
             return {"category": "unknown", "confidence": 0}
 
-        # Check data types
-        numeric_count = sum(1 for v in values if isinstance(v, (int, float)))
-        date_count = sum(1 for v in values if isinstance(v, (datetime, str)) and self._looks_like_date(str(v)))
-        email_count = sum(1 for v in values if isinstance(v, str) and "@" in str(v) and "." in str(v))
-        url_count = sum(1 for v in values if isinstance(v, str) and ("http://" in str(v) or "https://" in str(v)))
+        # Check data types — one pass, each value classified once
+        numeric_count = date_count = email_count = url_count = 0
+        date_match = _DATE_PREFIX.match
+        for v in values:
+            if isinstance(v, str):
+                if "@" in v and "." in v:
+                    email_count += 1
+                if "http://" in v or "https://" in v:
+                    url_count += 1
+                if date_match(v):
+                    date_count += 1
+            elif isinstance(v, (int, float)):
+                numeric_count += 1
+            elif isinstance(v, datetime):
+                date_count += 1
 
         total = len(values)
 
@@ -94,21 +136,16 @@ class SmartCategorizer:
 
         # Check for status/priority keywords
         value_str = " ".join(str(v).lower() for v in values[:20])
-        if any(keyword in value_str for keyword in ["active", "inactive", "completed", "pending", "done"]):
+        if any(keyword in value_str for keyword in _STATUS_WORDS):
             return {"category": "status", "confidence": 0.8}
-        if any(keyword in value_str for keyword in ["urgent", "high", "low", "medium", "important"]):
+        if any(keyword in value_str for keyword in _PRIORITY_VALUE_WORDS):
             return {"category": "priority", "confidence": 0.8}
 
         return {"category": "text", "confidence": 0.6}
 
     def _looks_like_date(self, value: str) -> bool:
         """Check if string looks like a date"""
-        date_patterns = [
-            r'\d{4}-\d{2}-\d{2}',  # YYYY-MM-DD
-            r'\d{2}/\d{2}/\d{4}',  # MM/DD/YYYY
-            r'\d{2}-\d{2}-\d{4}',  # DD-MM-YYYY
-        ]
-        return any(re.match(pattern, value) for pattern in date_patterns)
+        return _DATE_PREFIX.match(value) is not None
 
     def _get_suggested_type(self, category: str, sample_values: List[Any] = None) -> str:
         """Get suggested data type"""
@@ -123,8 +160,134 @@ class SmartCategorizer:
         }
         return type_mapping.get(category, "text")
 
+    def profile_columns(self, data, columns: List[str] = None, sample_size: int = None,
+                        dataset_key: str = None) -> Dict[str, Any]:
+        """
+        categorize_column for every column of a table (rows or ColumnarFrame)
+        in one call. Rows are reservoir-sampled once (deterministic for a
+        given row count) and each column is profiled on its non-empty cells
+        of that sample. Results are cached per (dataset, column, sample size);
+        without a dataset_key the dataset part is a hash of the sampled cells.
+        """
+        sample_size = sample_size or self.profile_sample_size
+        if not 1 <= sample_size <= self.MAX_PROFILE_SAMPLE:
+            raise ValueError(f"sample_size must be between 1 and {self.MAX_PROFILE_SAMPLE}")
+
+        is_frame = not isinstance(data, list)
+        n = len(data)
+        index = reservoir_sample_indices(n, sample_size, random.Random(n))
+        if columns is None:
+            if is_frame:
+                columns = list(data.header)
+            else:
+                header = dict.fromkeys(data[0]) if data else {}
+                for i in index:
+                    header.update(dict.fromkeys(data[i]))
+                columns = list(header)
+
+        profiles = []
+        cache_hits = 0
+        for col in columns:
+            cells = None
+            if dataset_key is None:
+                # profile chỉ phụ thuộc vào các ô được sample → hash của chúng là key chính xác
+                cells = self._sample_cells(data, col, index, is_frame)
+                key = ("sample:" + _cells_digest(cells), col, sample_size)
+            else:
+                key = (dataset_key, col, sample_size)
+            profile = self._profile_cached(key)
+            if profile is not None:
+                cache_hits += 1
+            else:
+                if cells is None:
+                    cells = self._sample_cells(data, col, index, is_frame)
+                sample = [v for v in cells if v is not None and v != "" and v == v]  # v == v: NaN
+                profile = {
+                    **self.categorize_column(str(col), sample),
+                    "sampled": len(cells),
+                    "non_empty": len(sample),
+                }
+                self._profile_store(key, profile)
+            profiles.append(dict(profile))
+
+        return {
+            "columns": profiles,
+            "rows": n,
+            "sample_size": sample_size,
+            "cache_hits": cache_hits,
+        }
+
+    @staticmethod
+    def _sample_cells(data, col: str, index: List[int], is_frame: bool) -> List[Any]:
+        if not is_frame:
+            return [data[i].get(col) for i in index]
+        raw = data.column(col)
+        if HAS_NUMPY and isinstance(raw, np.ndarray):
+            return raw[index].tolist()
+        return [raw[i] for i in index]
+
+    def _profile_cached(self, key) -> Optional[Dict[str, Any]]:
+        with self._profile_lock:
+            profile = self._profile_cache.get(key)
+            if profile is not None:
+                self._profile_cache.move_to_end(key)
+            return profile
+
+    def _profile_store(self, key, profile: Dict[str, Any]) -> None:
+        with self._profile_lock:
+            self._profile_cache[key] = profile
+            self._profile_cache.move_to_end(key)
+            while len(self._profile_cache) > self.profile_cache_size:
+                self._profile_cache.popitem(last=False)
+
     def categorize_rows(self, data: List[Dict[str, Any]], category_rules: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """Categorize rows of data based on rules"""
+        """Categorize rows of data based on rules (each row copied with `_categories`)"""
+        if hasattr(data, "to_rows"):  # ColumnarFrame
+            data = data.to_rows()
+        if not data:
+            return []
+        if not HAS_NUMPY:
+            return self._categorize_rows_loop(data, category_rules)
+
+        columns = self.categorize_table(data, category_rules)
+        return [
+            {**row, "_categories": {"tags": list(tags), "priority": priority, "category": category}}
+            for row, category, priority, tags in zip(
+                data, columns["category"], columns["priority"], columns["tags"])
+        ]
+
+    def categorize_table(self, data, category_rules: Dict[str, Any] = None) -> Dict[str, List[Any]]:
+        """
+        categorize_rows without copying rows: parallel category / priority /
+        tags arrays for rows or a ColumnarFrame. Rules are compiled once and
+        evaluated as boolean masks over factorized columns — each distinct
+        cell value is converted / tested once, not once per row and rule.
+        """
+        table = _CategorizerTable(data)
+        n = len(table)
+        if not n:
+            return {"category": [], "priority": [], "tags": []}
+
+        labels = ["uncategorized"]
+        category = np.zeros(n, dtype=np.int32)
+        for rule in compile_rules(category_rules):
+            if rule.category is None:
+                continue
+            mask = rule.evaluate(table)
+            labels.append(rule.category)
+            category[mask] = len(labels) - 1
+
+        priority, tag_bits = table.auto_categories(self.keyword_tagger)
+        tag_names = self.keyword_tagger.tag_names
+        return {
+            "category": np.array(labels, dtype=object)[category].tolist(),
+            "priority": np.array(PRIORITIES, dtype=object)[priority].tolist(),
+            "tags": [list(tag_names(bits)) for bits in tag_bits.tolist()],
+        }
+
+    def _categorize_rows_loop(self, data: List[Dict[str, Any]],
+                              category_rules: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Row-by-row categorize_rows (fallback without NumPy)"""
         if not data:
             return []
 
@@ -189,65 +352,295 @@ class SmartCategorizer:
 
     def _auto_categorize_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
         """Auto-categorize a row based on content"""
-        tags = []
-        priority = "normal"
+        level = bits = 0
 
-        # Analyze text fields for keywords
-        for key, value in row.items():
+        # Analyze text fields for keywords (one automaton pass per field)
+        for value in row.values():
             if isinstance(value, str):
-                value_lower = value.lower()
-
-                # Priority detection
-                if any(word in value_lower for word in ["urgent", "critical", "asap"]):
-                    priority = "high"
-                elif any(word in value_lower for word in ["important", "soon"]):
-                    priority = "medium"
-
-                # Tag detection
-                if any(word in value_lower for word in ["sale", "discount", "promo"]):
-                    tags.append("sales")
-                if any(word in value_lower for word in ["error", "issue", "problem"]):
-                    tags.append("issues")
-                if any(word in value_lower for word in ["new", "created"]):
-                    tags.append("new")
+                value_level, value_bits = self.keyword_tagger.scan(value)
+                if value_level:
+                    level = value_level
+                bits |= value_bits
 
         return {
-            "tags": list(set(tags)),  # Remove duplicates
-            "priority": priority
+            "tags": list(self.keyword_tagger.tag_names(bits)),
+            "priority": PRIORITIES[level]
         }
 
     def group_similar_items(self, data: List[Dict[str, Any]], group_by: List[str] = None) -> Dict[str, List[Dict[str, Any]]]:
-        """Group similar items together"""
+        """Group similar items together (rows per group; see group_indices)"""
         if not data:
             return {}
+        rows = data.to_rows() if hasattr(data, "to_rows") else data
+        return {key: [rows[i] for i in index]
+                for key, index in self.group_indices(data, group_by).items()}
+
+    def group_indices(self, data, group_by: List[str] = None) -> Dict[str, Any]:
+        """
+        group_similar_items as row-index arrays (no row copies), for rows or a
+        ColumnarFrame. Without group_by, picks the first string column of the
+        first row with 2–20 distinct values; all candidates are counted in one
+        pass with bounded sketches that drop a column once it passes 20.
+        """
+        n = len(data)
+        if not n:
+            return {}
+        is_frame = not isinstance(data, list)
 
         if group_by:
-            # Group by specified columns
-            groups = {}
-            for row in data:
-                key = tuple(str(row.get(col, "")) for col in group_by)
-                if key not in groups:
-                    groups[key] = []
-                groups[key].append(row)
-            return {str(k): v for k, v in groups.items()}
+            if is_frame:
+                cells = zip(*(data.column(col) for col in group_by))
+                keys = (tuple("" if v is None else str(v) for v in values) for values in cells)
+            else:
+                keys = (tuple(str(row.get(col, "")) for col in group_by) for row in data)
+            return {str(k): v for k, v in _index_groups(keys).items()}
+
+        # Auto-group: tìm cột string đầu tiên có cardinality thấp (≤ 20 giá trị unique)
+        col = self._auto_group_column(data, is_frame)
+        if col is None:
+            return {"all": np.arange(n) if HAS_NUMPY else list(range(n))}
+        if is_frame:
+            keys = ("other" if v is None else str(v) for v in data.column(col))
         else:
-            # Auto-group: tìm cột string đầu tiên có cardinality thấp (≤ 20 giá trị unique)
-            if not data:
-                return {"all": data}
-            sample = data[0]
-            candidate_cols = [
-                k for k, v in sample.items()
-                if isinstance(v, str) and v.strip()
-            ]
-            for col in candidate_cols:
-                unique_vals = {str(row.get(col, "")) for row in data}
-                if 2 <= len(unique_vals) <= 20:
-                    groups: Dict[str, List] = {}
-                    for row in data:
-                        key = str(row.get(col, "other"))
-                        groups.setdefault(key, []).append(row)
-                    return groups
-            return {"all": data}
+            keys = (str(row.get(col, "other")) for row in data)
+        return _index_groups(keys)
+
+    @staticmethod
+    def _auto_group_column(data, is_frame: bool, max_groups: int = 20) -> Optional[str]:
+        if is_frame:
+            first = {col: data.column(col)[0] for col in data.header}
+        else:
+            first = data[0]
+        candidates = [k for k, v in first.items() if isinstance(v, str) and v.strip()]
+        sketches = {col: _DistinctSketch(max_groups) for col in candidates}
+
+        # Một lượt theo từng khối hàng cho mọi cột ứng viên; cột nào vượt 20 thì bỏ
+        live = list(candidates)
+        for start in range(0, len(data), _SKETCH_CHUNK):
+            if is_frame:
+                for col in live:
+                    chunk = data.column(col)[start:start + _SKETCH_CHUNK]
+                    sketches[col].update("" if v is None else str(v) for v in chunk)
+            else:
+                chunk = data[start:start + _SKETCH_CHUNK]
+                for col in live:
+                    sketches[col].update(str(row.get(col, "")) for row in chunk)
+            live = [col for col in live if not sketches[col].overflowed]
+            if not live:
+                break
+
+        for col in candidates:
+            if not sketches[col].overflowed and sketches[col].count >= 2:
+                return col
+        return None
+
+
+class _CompiledRule:
+    """One category rule as a list of (field, operator, value) column predicates."""
+
+    __slots__ = ("conditions", "category")
+
+    def __init__(self, rule: Dict[str, Any]):
+        self.category = rule.get("category")
+        self.conditions = []
+        for field, expected in rule.get("conditions", {}).items():
+            if isinstance(expected, dict):
+                self.conditions.append(
+                    (field, expected.get("operator", "equals"), expected.get("value")))
+            else:
+                self.conditions.append((field, "equals", expected))
+
+    def evaluate(self, table: "_CategorizerTable") -> "np.ndarray":
+        """Boolean mask of the rows matching every condition"""
+        mask = np.ones(len(table), dtype=bool)
+        for field, operator, value in self.conditions:
+            present = table.present(field)
+            if present is None:
+                return np.zeros(len(table), dtype=bool)
+            mask &= present
+            uniques, codes = table.factorize(field)
+            if operator == "equals":
+                hit = np.fromiter((_safe_equals(u, value) for u in uniques), bool, len(uniques))
+            elif operator == "contains":
+                needle = str(value)
+                hit = np.fromiter((needle in str(u) for u in uniques), bool, len(uniques))
+            elif operator in (">", "<"):
+                numbers = table.unique_floats(field)
+                try:
+                    bound = float(value)
+                except (TypeError, ValueError):
+                    return np.zeros(len(table), dtype=bool)
+                hit = numbers > bound if operator == ">" else numbers < bound
+            else:  # toán tử lạ: _matches_rule bỏ qua điều kiện
+                continue
+            mask &= hit[codes]
+        return mask
+
+
+def compile_rules(category_rules: Optional[Dict[str, Any]]) -> List[_CompiledRule]:
+    """category_rules {"rules": [...]} → compiled rules, in evaluation order"""
+    if not category_rules:
+        return []
+    return [_CompiledRule(rule) for rule in category_rules.get("rules", [])]
+
+
+class _CategorizerTable:
+    """Rows or ColumnarFrame seen column by column, each column factorized once."""
+
+    def __init__(self, data):
+        from .series import ColumnarFrame
+
+        self._rows = None if isinstance(data, ColumnarFrame) else data
+        self._frame = data if isinstance(data, ColumnarFrame) else ColumnarFrame.from_rows(data)
+        self._cache: Dict[Any, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._frame)
+
+    def present(self, field: str) -> Optional["np.ndarray"]:
+        """Rows that have the field (None: no row has it)"""
+        if field not in self._frame.header:
+            return None
+        if self._rows is None:
+            return np.ones(len(self), dtype=bool)
+        key = ("present", field)
+        if key not in self._cache:
+            self._cache[key] = np.fromiter((field in row for row in self._rows), bool, len(self))
+        return self._cache[key]
+
+    def factorize(self, field: str):
+        """(distinct values, code per row) — Python equality/hash semantics, like row[field]"""
+        key = ("codes", field)
+        if key not in self._cache:
+            raw = self._frame.column(field)
+            cells = raw.tolist() if isinstance(raw, np.ndarray) else raw
+            index: Dict[Any, int] = {}
+            uniques: List[Any] = []
+            codes = np.empty(len(cells), dtype=np.int64)
+            for i, value in enumerate(cells):
+                try:
+                    code = index.get(value)
+                    if code is None:
+                        code = index[value] = len(uniques)
+                        uniques.append(value)
+                except TypeError:  # list / dict trong cell: không hash được
+                    code = len(uniques)
+                    uniques.append(value)
+                codes[i] = code
+            self._cache[key] = (uniques, codes)
+        return self._cache[key]
+
+    def unique_floats(self, field: str) -> "np.ndarray":
+        key = ("floats", field)
+        if key not in self._cache:
+            uniques, _ = self.factorize(field)
+            self._cache[key] = np.fromiter((_float_or_nan(u) for u in uniques), float, len(uniques))
+        return self._cache[key]
+
+    def auto_categories(self, tagger: KeywordTagger):
+        """_auto_categorize_row for every row: (priority index into PRIORITIES, tag bitmask)"""
+        bits_dtype = np.int64 if len(tagger.tags) < 63 else object
+        priority = np.zeros(len(self), dtype=np.int8)
+        tag_bits = np.zeros(len(self), dtype=bits_dtype)
+        for field in self._frame.header:
+            uniques, codes = self.factorize(field)
+            unique_priority = np.zeros(len(uniques), dtype=np.int8)
+            unique_tags = np.zeros(len(uniques), dtype=bits_dtype)
+            for j, value in enumerate(uniques):
+                if isinstance(value, str):
+                    unique_priority[j], unique_tags[j] = tagger.scan(value)
+            if not unique_priority.any() and not unique_tags.any():
+                continue
+            row_priority = unique_priority[codes]
+            # cột sau ghi đè cột trước (giống vòng lặp theo row.items())
+            priority = np.where(row_priority > 0, row_priority, priority)
+            tag_bits |= unique_tags[codes]
+        return priority, tag_bits
+
+
+_SKETCH_CHUNK = 1024
+
+
+class _DistinctSketch:
+    """
+    Distinct counter that stops (and frees its values) once past `limit`;
+    memory is bounded by limit + one update batch.
+    """
+
+    __slots__ = ("limit", "values", "overflowed")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.values = set()
+        self.overflowed = False
+
+    @property
+    def count(self) -> int:
+        return self.limit + 1 if self.overflowed else len(self.values)
+
+    def update(self, values) -> bool:
+        """Add values; False once more than `limit` distinct values have been seen"""
+        if self.overflowed:
+            return False
+        self.values.update(values)
+        if len(self.values) > self.limit:
+            self.overflowed = True
+            self.values = set()
+            return False
+        return True
+
+
+def _index_groups(keys) -> Dict[Any, Any]:
+    """key per row → {key: row indices}, groups in first-seen order"""
+    groups: Dict[Any, List[int]] = {}
+    for i, key in enumerate(keys):
+        index = groups.get(key)
+        if index is None:
+            groups[key] = [i]
+        else:
+            index.append(i)
+    if HAS_NUMPY:
+        return {key: np.array(index, dtype=np.int64) for key, index in groups.items()}
+    return groups
+
+
+def reservoir_sample_indices(n: int, k: int, rng: random.Random) -> List[int]:
+    """
+    k of range(n) uniformly at random, sorted — reservoir sampling
+    (Algorithm L: jumps over skipped items, O(k · (1 + log(n / k))))
+    """
+    if n <= k:
+        return list(range(n))
+    reservoir = list(range(k))
+    w = math.exp(math.log(rng.random() or 1e-300) / k)
+    i = k - 1
+    while True:
+        i += int(math.log(rng.random() or 1e-300) / math.log1p(-w)) + 1
+        if i >= n:
+            break
+        reservoir[rng.randrange(k)] = i
+        w *= math.exp(math.log(rng.random() or 1e-300) / k)
+    reservoir.sort()
+    return reservoir
+
+
+def _cells_digest(cells: List[Any]) -> str:
+    return hashlib.sha1(
+        json.dumps(cells, default=str, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _safe_equals(left: Any, right: Any) -> bool:
+    try:
+        return bool(left == right)
+    except Exception:
+        return False
+
+
+def _float_or_nan(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
 
 
 # Singleton instance
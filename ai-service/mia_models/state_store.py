@@ -0,0 +1,138 @@
+"""
+Metric State Store
+State theo metric (LRU trong bộ nhớ) + file SQLite tùy chọn: nhiều worker uvicorn
+dùng chung state, state còn sau khi restart. Dùng bởi alert_engine và streaming_anomaly.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class MetricStateStore:
+    """
+    Per-metric state objects (anything with to_dict / a `decode` classmethod):
+    - bounded in-memory LRU
+    - optional SQLite table (metric, version, state JSON, updated_at) in WAL
+      mode; `transaction()` holds the lock and one BEGIN IMMEDIATE, so a
+      load → mutate → store is atomic across workers. A cached object is
+      reused only while its version matches the row; versions are
+      monotonic (ns clock), so a delete + re-create never reuses one
+    """
+
+    def __init__(self, table: str, decode: Callable[[Dict[str, Any]], Any],
+                 db_path: Optional[str] = None, max_metrics: int = 1000):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name '{table}'")
+        self.table = table
+        self.decode = decode
+        self.db_path = db_path
+        self.max_metrics = max_metrics
+        self._states: "OrderedDict[str, Any]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._touched: Set[str] = set()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._open_db()
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    @contextmanager
+    def transaction(self) -> Iterator["MetricStateStore"]:
+        """Lock + BEGIN IMMEDIATE … COMMIT (ROLLBACK on error)"""
+        with self._lock:
+            self._touched.clear()
+            if self._db is None:
+                yield self
+                return
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                # Object trong cache có thể đã bị sửa dở → đọc lại từ DB lần sau
+                for metric in self._touched:
+                    self._forget(metric)
+                raise
+            self._db.execute("COMMIT")
+
+    # Các hàm dưới đây gọi bên trong transaction()
+
+    def load(self, metric: str) -> Optional[Any]:
+        self._touched.add(metric)
+        state = self._states.get(metric)
+        if self._db is not None:
+            row = self._db.execute(
+                f"SELECT version, state FROM {self.table} WHERE metric = ?", (metric,)).fetchone()
+            if row is None:
+                state = None  # đã bị reset ở worker khác
+                self._forget(metric)
+            elif state is None or self._versions.get(metric) != row[0]:
+                state = self.decode(json.loads(row[1]))
+                self._versions[metric] = row[0]
+        if state is not None:
+            self._remember(metric, state)
+        return state
+
+    def store(self, metric: str, state: Any) -> None:
+        self._touched.add(metric)
+        version = max(time.time_ns(), self._versions.get(metric, 0) + 1)
+        self._versions[metric] = version
+        self._remember(metric, state)
+        if self._db is not None:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (metric, version, state, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (metric, version, json.dumps(state.to_dict()), time.time()))
+
+    def delete(self, metric: str) -> bool:
+        existed = self._forget(metric)
+        if self._db is not None:
+            deleted = self._db.execute(
+                f"DELETE FROM {self.table} WHERE metric = ?", (metric,)).rowcount
+            existed = existed or deleted > 0
+        return existed
+
+    def cached(self) -> Dict[str, Any]:
+        """In-memory states (most recent last)"""
+        return dict(self._states)
+
+    # ─── Internals ──────────────────────────────────────────────────────
+
+    def _remember(self, metric: str, state: Any) -> None:
+        self._states[metric] = state
+        self._states.move_to_end(metric)
+        while len(self._states) > self.max_metrics:
+            evicted, _ = self._states.popitem(last=False)
+            self._versions.pop(evicted, None)
+
+    def _forget(self, metric: str) -> bool:
+        self._versions.pop(metric, None)
+        return self._states.pop(metric, None) is not None
+
+    def _open_db(self) -> None:
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5,
+                                       isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "metric TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                "state TEXT NOT NULL, updated_at REAL NOT NULL)")
+        except sqlite3.Error as exc:
+            logger.warning("State store %s: SQLite disabled (%s): %s", self.table, self.db_path, exc)
+            self._db = None
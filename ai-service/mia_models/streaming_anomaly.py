@@ -0,0 +1,186 @@
+"""
+Streaming Anomaly Detector
+Phát hiện bất thường dạng streaming: rolling median / MAD, giữ state theo metric
+(bộ nhớ + file SQLite tùy chọn, AI_ANOMALY_STATE_DB)
+"""
+
+import math
+import os
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .state_store import MetricStateStore
+
+# MAD → sigma cho phân phối chuẩn
+_MAD_TO_SIGMA = 1.4826
+
+
+class RobustWindow:
+    """
+    Rolling robust scorer for one metric:
+    - median of the last `window` points (sorted window, bisect insert/remove)
+    - scale: exponentially-weighted MAD, deviations clipped so one huge spike
+      cannot inflate it and hide the following anomalies
+    - each new point is scored against the state *before* it is absorbed
+    """
+
+    def __init__(self, window: int = 60, threshold: float = 3.5, min_points: int = 8):
+        self.window = max(3, int(window))
+        self.threshold = float(threshold)
+        self.min_points = max(3, min(int(min_points), self.window))
+        self.alpha = 2.0 / (self.window + 1)
+        self.count = 0
+        self.mad = 0.0
+        self._recent = deque()
+        self._sorted: List[float] = []
+
+    @property
+    def median(self) -> Optional[float]:
+        size = len(self._sorted)
+        if not size:
+            return None
+        mid = size // 2
+        if size % 2:
+            return self._sorted[mid]
+        return (self._sorted[mid - 1] + self._sorted[mid]) / 2.0
+
+    def push(self, value: float, timestamp: Any = None) -> Optional[Dict[str, Any]]:
+        """Score one observation, then absorb it. Returns an anomaly dict or None"""
+        value = float(value)
+        if not math.isfinite(value):
+            return None  # NaN / inf: bỏ qua, không làm hỏng median / MAD
+        index = self.count
+        anomaly = None
+
+        median = self.median
+        ready = len(self._sorted) >= self.min_points
+        if ready:
+            if self.mad == 0.0:
+                # Khởi tạo (hoặc cửa sổ hằng số): MAD chính xác trên cửa sổ
+                self.mad = self._exact_mad(median)
+            scale = _MAD_TO_SIGMA * self.mad or abs(median) * 1e-6 or 1e-9
+            z_score = (value - median) / scale
+            if abs(z_score) > self.threshold:
+                half_width = self.threshold * scale
+                anomaly = {
+                    "index": index,
+                    "value": value,
+                    "expected_range": [median - half_width, median + half_width],
+                    "z_score": float(abs(z_score)),
+                    "type": "spike" if value > median else "drop",
+                    "severity": "high" if abs(z_score) > 1.5 * self.threshold else "medium",
+                    "method": "rolling_median_mad",
+                    "timestamp": timestamp or datetime.now().isoformat(),
+                }
+            # Clip deviation at threshold·scale → scale robust với spike
+            deviation = min(abs(value - median), self.threshold * scale)
+            self.mad += self.alpha * (deviation / _MAD_TO_SIGMA - self.mad)
+
+        self._absorb(value)
+        self.count += 1
+        return anomaly
+
+    def _absorb(self, value: float) -> None:
+        self._recent.append(value)
+        insort(self._sorted, value)
+        if len(self._recent) > self.window:
+            old = self._recent.popleft()
+            del self._sorted[bisect_left(self._sorted, old)]
+
+    def _exact_mad(self, median: float) -> float:
+        deviations = sorted(abs(v - median) for v in self._sorted)
+        return deviations[len(deviations) // 2]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "window": self.window,
+            "threshold": self.threshold,
+            "min_points": self.min_points,
+            "count": self.count,
+            "mad": self.mad,
+            "recent": list(self._recent),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "RobustWindow":
+        scorer = cls(state["window"], state["threshold"], state["min_points"])
+        for value in state.get("recent", []):
+            scorer._absorb(float(value))
+        scorer.count = int(state.get("count", len(scorer._recent)))
+        scorer.mad = float(state.get("mad", 0.0))
+        return scorer
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "observations": self.count,
+            "window": self.window,
+            "window_fill": len(self._recent),
+            "median": self.median,
+            "mad": self.mad,
+            "threshold": self.threshold,
+            "ready": len(self._sorted) >= self.min_points,
+        }
+
+
+class StreamingAnomalyDetector:
+    """
+    Per-metric streaming anomaly state:
+    - push new observations without re-sending history
+    - O(log window) search + O(window) list shift per point (bisect insort /
+      del on a sorted list — a memmove, fast for windows of a few thousand);
+      O(1) amortized scale update
+    - bounded number of metrics in memory (LRU)
+    - optional SQLite file (`db_path`): state survives restarts and is shared
+      by uvicorn workers (same store as alert_engine)
+    """
+
+    def __init__(self, max_metrics: int = 1000, db_path: Optional[str] = None):
+        self._store = MetricStateStore("anomaly_state", RobustWindow.from_dict,
+                                       db_path, max_metrics)
+
+    def push(self, metric: str, values: List[float], timestamps: List[Any] = None,
+             window: int = 60, threshold: float = 3.5, min_points: int = 8) -> Dict[str, Any]:
+        """Append observations to a metric and return anomalies among them"""
+        with self._store.transaction():
+            scorer = self._store.load(metric)
+            if scorer is None:
+                scorer = RobustWindow(window, threshold, min_points)
+
+            anomalies = []
+            for i, value in enumerate(values):
+                if value is None or not math.isfinite(value):
+                    continue
+                timestamp = timestamps[i] if timestamps and i < len(timestamps) else None
+                anomaly = scorer.push(value, timestamp)
+                if anomaly:
+                    anomalies.append(anomaly)
+
+            self._store.store(metric, scorer)
+            return {"metric": metric, "anomalies": anomalies, "state": scorer.summary()}
+
+    def state(self, metric: str) -> Optional[Dict[str, Any]]:
+        with self._store.transaction():
+            scorer = self._store.load(metric)
+            return scorer.summary() if scorer else None
+
+    def reset(self, metric: str) -> bool:
+        with self._store.transaction():
+            return self._store.delete(metric)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Serializable state of every in-memory metric (restore with `restore`)"""
+        with self._store.transaction():
+            return {metric: scorer.to_dict() for metric, scorer in self._store.cached().items()}
+
+    def restore(self, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        with self._store.transaction():
+            for metric, state in snapshot.items():
+                self._store.store(metric, RobustWindow.from_dict(state))
+
+
+# Singleton instance (AI_ANOMALY_STATE_DB = file SQLite dùng chung giữa các worker)
+streaming_anomaly_detector = StreamingAnomalyDetector(
+    db_path=os.getenv("AI_ANOMALY_STATE_DB") or None,
+)
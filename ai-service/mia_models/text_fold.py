@@ -0,0 +1,19 @@
+"""
+Text Folding
+Chuẩn hóa text để so khớp không dấu (dùng chung cho search_index và keyword_tagger).
+"""
+
+import re
+import unicodedata
+
+_COMBINING = re.compile(r"[̀-ͯ]")
+# đ/Đ không tách dấu được bằng NFD
+_VIET_EXTRA = str.maketrans({"đ": "d", "Đ": "d"})
+
+
+def fold_text(text: str) -> str:
+    """Lowercase + strip Vietnamese diacritics: "Đơn hàng" → "don hang\""""
+    text = text.translate(_VIET_EXTRA).lower()
+    if text.isascii():
+        return text
+    return _COMBINING.sub("", unicodedata.normalize("NFD", text))
@@ -0,0 +1,23 @@
+"""
+Runtime helpers for ai_service.py (serving layer, not analytics).
+
+- executor: thread / process worker pools with bounded queues + queue-wait metrics
+- jobs: picklable entry points for work sent to the process pool
+- result_cache: content-addressed LRU/TTL cache for analytics and report results
+- datasets: upload-once dataset registry (mmap'd .npy columns, LRU + size cap)
+"""
+
+from .executor import WorkerPools, WorkerPoolSaturated, worker_pools
+from .result_cache import ResultCache, result_cache
+from .datasets import DatasetNotFound, DatasetRegistry, dataset_registry
+
+__all__ = [
+    "DatasetNotFound",
+    "DatasetRegistry",
+    "ResultCache",
+    "WorkerPools",
+    "WorkerPoolSaturated",
+    "worker_pools",
+    "result_cache",
+    "dataset_registry",
+]
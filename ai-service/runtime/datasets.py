@@ -0,0 +1,277 @@
+"""
+Dataset Registry
+Upload một lần, phân tích theo id: mỗi cột lưu thành file .npy trên đĩa local,
+đọc lại bằng mmap nên nhiều worker uvicorn dùng chung cùng một bản dữ liệu.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from mia_models.series import ColumnarFrame
+
+logger = logging.getLogger(__name__)
+
+_META = "meta.json"
+_DTYPE_NAMES = {"i": "integer", "f": "number", "U": "text"}
+
+
+class DatasetNotFound(KeyError):
+    """Unknown (or evicted) dataset id."""
+
+
+class DatasetRegistry:
+    """
+    Server-side datasets stored as typed column arrays:
+    - integer columns → int64, numeric → float64 (NaN = missing), text →
+      UTF-8 bytes + offsets .npy (decoded to an object array on load)
+    - id = hash of the content, so re-uploading the same table is free
+    - numeric columns are opened with mmap_mode="r": only the columns an
+      analysis touches are paged in, and the page cache is shared between processes
+    - text columns are NOT shared: every process decodes every text column
+      of a dataset it opens into its own str objects (up to open_cache_size
+      datasets kept), so text-heavy datasets cost RAM per worker
+    - LRU eviction (meta.json mtime = last use) under a byte / count cap
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int = 512 << 20,
+                 max_datasets: int = 64, open_cache_size: int = 16):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.max_datasets = max_datasets
+        self.open_cache_size = open_cache_size
+        self._open: "OrderedDict[str, ColumnarFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root_dir, exist_ok=True)
+
+    def put(self, table, name: str = None) -> Dict[str, Any]:
+        """Store rows or a ColumnarFrame; returns the dataset metadata"""
+        frame = table if isinstance(table, ColumnarFrame) else ColumnarFrame.from_rows(table)
+        columns = {col: _stored_arrays(_typed_column(frame.column(col))) for col in frame.header}
+        dataset_id = _content_id(columns)
+
+        path = self._path(dataset_id)
+        if os.path.isdir(path):
+            meta = self._touch(dataset_id)
+            if meta is not None:
+                return meta
+
+        staging = os.path.join(self.root_dir, f".staging-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        try:
+            described = []
+            for i, (col, arrays) in enumerate(columns.items()):
+                entry = {"name": col, "file": f"{i}.npy", "dtype": "text"}
+                np.save(os.path.join(staging, entry["file"]), arrays[0], allow_pickle=False)
+                if len(arrays) == 1:
+                    entry["dtype"] = _DTYPE_NAMES[arrays[0].dtype.kind]
+                else:
+                    entry["offsets"] = f"{i}.offsets.npy"
+                    np.save(os.path.join(staging, entry["offsets"]), arrays[1], allow_pickle=False)
+                described.append(entry)
+            meta = {
+                "dataset_id": dataset_id,
+                "name": name,
+                "rows": len(frame),
+                "columns": described,
+                "bytes": int(sum(a.nbytes for arrays in columns.values() for a in arrays)),
+                "created_at": time.time(),
+            }
+            with open(os.path.join(staging, _META), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            try:
+                os.rename(staging, path)  # atomic; worker khác có thể vừa ghi cùng id
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self._evict(keep=dataset_id)
+        return meta
+
+    def load(self, dataset_id: str) -> ColumnarFrame:
+        """Memory-mapped ColumnarFrame for a stored dataset"""
+        meta = self._touch(dataset_id)
+        if meta is None:
+            with self._lock:
+                self._open.pop(dataset_id, None)
+            raise DatasetNotFound(dataset_id)
+
+        with self._lock:
+            frame = self._open.get(dataset_id)
+            if frame is not None:
+                self._open.move_to_end(dataset_id)
+                return frame
+
+        path = self._path(dataset_id)
+        mmap_mode = "r" if meta["rows"] else None  # không mmap được file rỗng
+        columns = {col["name"]: _load_column(path, col, mmap_mode) for col in meta["columns"]}
+        frame = ColumnarFrame(columns)
+        with self._lock:
+            self._open[dataset_id] = frame
+            while len(self._open) > self.open_cache_size:
+                self._open.popitem(last=False)
+        return frame
+
+    def describe(self, dataset_id: str) -> Dict[str, Any]:
+        meta = self._read_meta(dataset_id)
+        if meta is None:
+            raise DatasetNotFound(dataset_id)
+        return meta
+
+    def list(self) -> List[Dict[str, Any]]:
+        metas = [m for m in (self._read_meta(d) for d in self._ids()) if m is not None]
+        return sorted(metas, key=lambda m: m["created_at"], reverse=True)
+
+    def delete(self, dataset_id: str) -> bool:
+        with self._lock:
+            self._open.pop(dataset_id, None)
+        path = self._path(dataset_id)
+        if not os.path.isdir(path):
+            return False
+        # mmap đang mở ở worker khác vẫn đọc được sau khi unlink
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        metas = self.list()
+        return {
+            "datasets": len(metas),
+            "bytes": sum(m["bytes"] for m in metas),
+            "max_bytes": self.max_bytes,
+            "max_datasets": self.max_datasets,
+            "open": len(self._open),
+        }
+
+    # ─── Internals ──────────────────────────────────────────────────────
+
+    def _path(self, dataset_id: str) -> str:
+        if not dataset_id.isalnum():
+            raise DatasetNotFound(dataset_id)
+        return os.path.join(self.root_dir, dataset_id)
+
+    def _ids(self) -> List[str]:
+        try:
+            return [d for d in os.listdir(self.root_dir) if not d.startswith(".")]
+        except OSError:
+            return []
+
+    def _read_meta(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._path(dataset_id), _META), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError, DatasetNotFound):
+            return None
+
+    def _touch(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        """Read metadata and mark the dataset as recently used"""
+        meta = self._read_meta(dataset_id)
+        if meta is not None:
+            try:
+                os.utime(os.path.join(self._path(dataset_id), _META))
+            except OSError:
+                pass
+        return meta
+
+    def _evict(self, keep: str = None) -> None:
+        entries = []
+        for dataset_id in self._ids():
+            meta_path = os.path.join(self.root_dir, dataset_id, _META)
+            meta = self._read_meta(dataset_id)
+            if meta is None:
+                continue
+            try:
+                last_used = os.stat(meta_path).st_mtime
+            except OSError:
+                continue
+            entries.append((last_used, dataset_id, meta["bytes"]))
+
+        entries.sort()
+        total = sum(e[2] for e in entries)
+        count = len(entries)
+        for _, dataset_id, size in entries:
+            if total <= self.max_bytes and count <= self.max_datasets:
+                break
+            if dataset_id == keep:
+                continue
+            logger.info("Dataset registry: evicting %s (%d bytes)", dataset_id, size)
+            self.delete(dataset_id)
+            total -= size
+            count -= 1
+
+
+def _typed_column(raw) -> np.ndarray:
+    """
+    dtype from the Python cell types: int64 if every cell is an int, float64
+    if every present cell is an int / float (None, "" → NaN), else text
+    (object array of str, None → ""). bool and numeric-looking strings stay
+    text, so IDs like "000123" round-trip unchanged.
+    """
+    if isinstance(raw, np.ndarray) and raw.dtype.kind in "iuf":
+        return raw.astype(np.int64 if raw.dtype.kind in "iu" else float)
+    raw = raw.tolist() if isinstance(raw, np.ndarray) else list(raw)
+    present = [v for v in raw if v is not None and v != ""]
+    try:
+        if raw and all(type(v) is int for v in raw):
+            return np.array(raw, dtype=np.int64)
+        if present and all(type(v) in (int, float) for v in present):
+            return np.array([np.nan if v is None or v == "" else v for v in raw], dtype=float)
+    except OverflowError:  # int ngoài int64 → text
+        pass
+    return np.array(["" if v is None else str(v) for v in raw], dtype=object)
+
+
+def _stored_arrays(values: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Arrays written for a column: numeric → itself; text → (UTF-8 bytes,
+    int64 offsets), so one long cell does not widen every row as <U{max}> would
+    """
+    if values.dtype.kind != "O":
+        return (values,)
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _load_column(path: str, col: Dict[str, Any], mmap_mode: Optional[str]) -> np.ndarray:
+    if "offsets" not in col:
+        return np.load(os.path.join(path, col["file"]), mmap_mode=mmap_mode)  # số, hoặc text <U cũ
+    # text: decode toàn bộ vào bộ nhớ riêng của process (không chia sẻ qua mmap);
+    # ColumnarFrame cần list / ndarray object nên chưa decode lazy được
+    blob = np.load(os.path.join(path, col["file"])).tobytes()
+    offsets = np.load(os.path.join(path, col["offsets"])).tolist()
+    cells = [blob[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+    column = np.empty(len(cells), dtype=object)
+    column[:] = cells
+    return column
+
+
+def _content_id(columns: Dict[str, Tuple[np.ndarray, ...]]) -> str:
+    digest = hashlib.sha256()
+    for col, arrays in columns.items():
+        digest.update(col.encode("utf-8"))
+        for values in arrays:
+            digest.update(values.dtype.str.encode())
+            digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()[:32]
+
+
+# Singleton instance (AI_DATASET_DIR / AI_DATASET_MAX_MB / AI_DATASET_MAX_COUNT)
+dataset_registry = DatasetRegistry(
+    root_dir=os.getenv("AI_DATASET_DIR")
+    or os.path.join(tempfile.gettempdir(), "ai-service-datasets"),
+    max_bytes=int(os.getenv("AI_DATASET_MAX_MB", "512")) << 20,
+    max_datasets=int(os.getenv("AI_DATASET_MAX_COUNT", "64")),
+)
@@ -0,0 +1,180 @@
+"""
+Worker Pools
+Chạy handler CPU-bound ngoài event loop: thread pool cho NumPy (nhả GIL),
+process pool cho code Python thuần (COBYQA).
+"""
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPoolSaturated(Exception):
+    """Raised when a pool already has `max_queue` jobs waiting (→ HTTP 503)."""
+
+
+def _call_timed(fn: Callable, submitted_at: float, args: tuple, kwargs: dict):
+    """Run fn in the worker; returns (result, queue wait, run time) in seconds (wall clock)."""
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return result, max(0.0, started_at - submitted_at), time.time() - started_at
+
+
+class _EndpointStats:
+    """Queue-wait / run-time counters for one endpoint."""
+
+    __slots__ = ("calls", "rejected", "errors", "wait_total", "wait_max",
+                 "run_total", "run_max", "recent_waits")
+
+    def __init__(self, window: int = 500):
+        self.calls = 0
+        self.rejected = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+        self.recent_waits = deque(maxlen=window)
+
+    def record(self, wait: float, run: float) -> None:
+        self.calls += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.run_total += run
+        self.run_max = max(self.run_max, run)
+        self.recent_waits.append(wait)
+
+    def as_dict(self) -> Dict[str, Any]:
+        waits = sorted(self.recent_waits)
+        p95 = waits[max(0, math.ceil(0.95 * len(waits)) - 1)] if waits else 0.0
+        return {
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "queue_wait_ms": {
+                "avg": round(1000 * self.wait_total / self.calls, 2) if self.calls else 0.0,
+                "p95": round(1000 * p95, 2),
+                "max": round(1000 * self.wait_max, 2),
+            },
+            "run_ms": {
+                "avg": round(1000 * self.run_total / self.calls, 2) if self.calls else 0.0,
+                "max": round(1000 * self.run_max, 2),
+            },
+        }
+
+
+class WorkerPools:
+    """
+    Bounded executor layer for async handlers:
+    - kind="thread": NumPy-heavy work (releases the GIL)
+    - kind="process": Python-heavy work; fn and args must be picklable
+    - at most `workers + max_queue` jobs in flight per pool, else WorkerPoolSaturated
+    - per-endpoint queue-wait / run-time metrics
+    """
+
+    def __init__(self, thread_workers: int = None, process_workers: int = None,
+                 max_queue: int = None):
+        cpus = os.cpu_count() or 1
+        self.thread_workers = thread_workers or int(
+            os.getenv("AI_THREAD_WORKERS", str(min(8, cpus + 2))))
+        self.process_workers = process_workers if process_workers is not None else int(
+            os.getenv("AI_PROCESS_WORKERS", str(min(2, cpus))))
+        self.max_queue = max_queue if max_queue is not None else int(
+            os.getenv("AI_MAX_QUEUE", "32"))
+
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._in_flight = {"thread": 0, "process": 0}
+        self._stats: Dict[str, _EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, kind: str):
+        if kind == "process" and self.process_workers > 0:
+            if self._processes is None:
+                # spawn: an toàn khi process cha đang chạy nhiều thread
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._processes, "process", self.process_workers
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=self.thread_workers, thread_name_prefix="ai-worker")
+        return self._threads, "thread", self.thread_workers
+
+    def _stats_for(self, endpoint: str) -> _EndpointStats:
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats[endpoint] = _EndpointStats()
+        return stats
+
+    async def run(self, endpoint: str, fn: Callable, *args, kind: str = "thread", **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on a pool; raises WorkerPoolSaturated if the queue is full"""
+        with self._lock:
+            pool, pool_kind, workers = self._pool(kind)
+            stats = self._stats_for(endpoint)
+            if self._in_flight[pool_kind] >= workers + self.max_queue:
+                stats.rejected += 1
+                raise WorkerPoolSaturated(
+                    f"{pool_kind} pool busy ({self._in_flight[pool_kind]} jobs in flight)")
+            self._in_flight[pool_kind] += 1
+
+        submitted_at = time.time()
+        future = None
+        try:
+            future = pool.submit(_call_timed, fn, submitted_at, args, kwargs)
+            # Giảm in_flight khi job xong thật sự: request bị hủy thì job vẫn chạy
+            future.add_done_callback(lambda _: self._release(pool_kind))
+            result, wait, run = await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            with self._lock:
+                stats.errors += 1
+                self._processes = None  # tạo lại ở lần gọi sau
+            raise
+        except Exception:
+            with self._lock:
+                stats.errors += 1
+            raise
+        finally:
+            if future is None:  # submit lỗi: không có job nào giữ chỗ
+                self._release(pool_kind)
+
+        with self._lock:
+            stats.record(wait, run)
+        return result
+
+    def _release(self, pool_kind: str) -> None:
+        with self._lock:
+            self._in_flight[pool_kind] -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "thread_workers": self.thread_workers,
+                "process_workers": self.process_workers,
+                "max_queue": self.max_queue,
+                "in_flight": dict(self._in_flight),
+                "endpoints": {name: s.as_dict() for name, s in self._stats.items()},
+            }
+
+    def shutdown(self) -> None:
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+
+# Singleton instance (config từ AI_THREAD_WORKERS / AI_PROCESS_WORKERS / AI_MAX_QUEUE)
+worker_pools = WorkerPools()
@@ -0,0 +1,69 @@
+"""
+Process-pool jobs
+Entry points cho WorkerPools(kind="process") — phải là hàm module-level
+(picklable), nhận và trả dữ liệu thuần (dict / list).
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def _make_objective(obj_type: str, coefficients=None):
+    if obj_type == "rosenbrock":
+        return lambda x: sum(
+            100 * (x[i + 1] - x[i] ** 2) ** 2 + (1 - x[i]) ** 2
+            for i in range(len(x) - 1)
+        )
+    elif obj_type == "linear" and coefficients:
+        c = np.array(coefficients)
+        return lambda x: float(np.dot(c, x))
+    else:  # "sum_squares" or fallback
+        return lambda x: float(np.sum(x ** 2))
+
+
+def solve_optimization(objective_type: str, initial_guess: List[float],
+                       bounds: Optional[List[List[float]]] = None,
+                       constraints: Optional[List[Dict[str, Any]]] = None,
+                       options: Optional[Dict[str, Any]] = None,
+                       coefficients: Optional[List[float]] = None) -> Dict[str, Any]:
+    """Run COBYQA for a named objective; the objective is built inside the worker"""
+    from scipy.optimize import Bounds
+
+    from optimization import cobyqa_minimize
+
+    bounds_obj = None
+    if bounds:
+        bounds_array = np.array(bounds)
+        bounds_obj = Bounds(bounds_array[:, 0], bounds_array[:, 1])
+
+    r = cobyqa_minimize(
+        fun=_make_objective(objective_type, coefficients),
+        x0=np.array(initial_guess),
+        bounds=bounds_obj,
+        constraints=constraints or [],
+        options=options or {},
+    )
+
+    return {
+        "optimal_point": (
+            r.x.tolist() if hasattr(r, "x") else None
+        ),
+        "optimal_value": (
+            float(r.fun) if hasattr(r, "fun") else None
+        ),
+        "success": (
+            bool(r.success) if hasattr(r, "success") else False
+        ),
+        "message": (
+            str(r.message)
+            if hasattr(r, "message")
+            else "Optimization completed"
+        ),
+        "iterations": (
+            int(r.nit) if hasattr(r, "nit") else None
+        ),
+        "function_evaluations": (
+            int(r.nfev) if hasattr(r, "nfev") else None
+        ),
+    }
@@ -0,0 +1,172 @@
+"""
+Result Cache
+Cache kết quả analytics/report theo hash nội dung request:
+LRU + TTL trong bộ nhớ, thêm tầng đĩa (tùy chọn) để sống qua restart.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Content-addressed response cache:
+    - key = sha256(endpoint, canonical JSON payload, params)
+    - in-memory LRU with TTL
+    - optional on-disk tier (one pickle file per key) that survives restarts
+    - hit / miss / store counters
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600,
+                 disk_dir: Optional[str] = None, disk_max_entries: int = 2048):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(endpoint: str, payload: Any, params: Optional[Dict[str, Any]] = None) -> str:
+        """Hash of (endpoint, canonicalized payload, params)"""
+        canonical = json.dumps(
+            {"endpoint": endpoint, "payload": payload, "params": params or {}},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return True, value
+                del self._entries[key]
+
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is not None:
+                expires_at, value = value
+                self._remember(key, expires_at, value)
+                self._counters["disk_hits"] += 1
+                return True, value
+            self._counters["misses"] += 1
+        return False, None
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._counters["stores"] += 1
+        self._disk_set(key, expires_at, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    _silent_remove(os.path.join(self.disk_dir, name))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["hits"] + self._counters["disk_hits"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "disk_tier": bool(self.disk_dir),
+            }
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ─── Disk tier ──────────────────────────────────────────────────────
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:  # file hỏng / ghi dở
+            logger.warning("Result cache: unreadable %s (%s)", path, exc)
+            _silent_remove(path)
+            return None
+        if expires_at <= now:
+            _silent_remove(path)
+            return None
+        return expires_at, value
+
+    def _disk_set(self, key: str, expires_at: float, value: Any) -> None:
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump((expires_at, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)  # atomic — nhiều worker uvicorn dùng chung thư mục
+        except Exception as exc:
+            logger.warning("Result cache: cannot write %s (%s)", path, exc)
+            _silent_remove(tmp_path)
+            return
+        self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        try:
+            files = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".pkl")]
+        except OSError:
+            return
+        if len(files) <= self.disk_max_entries:
+            return
+        files.sort(key=lambda e: e.stat().st_mtime)
+        for entry in files[: len(files) - self.disk_max_entries]:
+            _silent_remove(entry.path)
+
+
+def _silent_remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# Singleton instance (AI_CACHE_MAX_ENTRIES / AI_CACHE_TTL / AI_CACHE_DIR)
+result_cache = ResultCache(
+    max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("AI_CACHE_TTL", "600")),
+    disk_dir=os.getenv("AI_CACHE_DIR") or None,
+)
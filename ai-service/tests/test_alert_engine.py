@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mia_models.alert_engine import AlertEngine
+
+
+def _statuses(result, kind):
+    return [e["status"] for e in result["events"] if e["type"] == kind]
+
+
+class TestAlertEngineCooldown(unittest.TestCase):
+    def test_recross_inside_cooldown_is_sent_after_it(self):
+        engine = AlertEngine(cooldown_seconds=100)
+        engine.push("m", [10.0] * 5, threshold=50, now=0)
+
+        crossed = engine.push("m", [60.0], now=10)
+        self.assertEqual(_statuses(crossed, "threshold_crossed"), ["raised"])
+
+        recovered = engine.push("m", [10.0], now=20)
+        self.assertEqual(_statuses(recovered, "threshold_crossed"), ["resolved"])
+
+        # Vượt lại trong cool-down: chặn
+        recrossed = engine.push("m", [60.0], now=30)
+        self.assertEqual(_statuses(recrossed, "threshold_crossed"), [])
+
+        # Vẫn vượt sau cool-down: phải gửi đúng 1 lần
+        still = engine.push("m", [61.0], now=120)
+        self.assertEqual(_statuses(still, "threshold_crossed"), ["raised"])
+        again = engine.push("m", [62.0], now=130)
+        self.assertEqual(_statuses(again, "threshold_crossed"), [])
+
+        resolved = engine.push("m", [10.0], now=140)
+        self.assertEqual(_statuses(resolved, "threshold_crossed"), ["resolved"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mia_models.column_stats import TableStatistics
+
+
+class TestDateRanges(unittest.TestCase):
+    def test_mixed_cell_types_use_the_common_kind(self):
+        stats = TableStatistics.of([
+            {"date": "2024-01-03"},
+            {"date": 20240102},
+            {"date": "2024-01-01"},
+        ])
+        self.assertEqual(stats.date_ranges()["date"]["earliest"], "2024-01-01")
+        self.assertEqual(stats.date_ranges()["date"]["latest"], "2024-01-03")
+
+    def test_one_of_each_kind_does_not_raise(self):
+        stats = TableStatistics.of([{"date": "2024-01-01"}, {"date": 20240102}])
+        self.assertEqual(stats.date_ranges()["date"]["earliest"], "2024-01-01")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mia_models.nlp_processor import NLPProcessor, _prefilter
+
+nlp_module = sys.modules["mia_models.nlp_processor"]
+
+# Literal gate của từng intent pattern (cùng thứ tự với intent_patterns)
+INTENT_GATES = {
+    "query_data": [("show ",), ("get ",), ("list ",), ("find ",), ("what data",), ("display data",)],
+    "filter": [("filter ",), ("show ",), ("where",), ("find",)],
+    "aggregate": [("sum ",), ("total",), ("average",), ("mean",), ("count",), ("how many",)],
+    "compare": [("compare",), ("difference ",), ("vs",), ("versus",), ("which ",)],
+    "trend": [("trend",), ("change ",), ("increase",), ("decrease",), ("growth",)],
+    "search": [("search ",), ("find",), ("look ",), ("where ",)],
+}
+
+
+class TestPrefilter(unittest.TestCase):
+    def test_intent_pattern_gates(self):
+        patterns = NLPProcessor().intent_patterns
+        self.assertEqual(list(patterns), list(INTENT_GATES))
+        for intent, gates in INTENT_GATES.items():
+            extracted = [_prefilter(p) for p in patterns[intent]]
+            self.assertEqual(extracted, [(g, False) for g in gates], intent)
+
+    def test_digit_and_branch_gates(self):
+        self.assertEqual(_prefilter(r"\d{4}-\d{2}-\d{2}"), (("-",), True))
+        self.assertEqual(_prefilter(r"(today|yesterday|tomorrow)"),
+                         (("today", "yesterday", "tomorrow"), False))
+
+    def test_parser_change_disables_prefilter(self):
+        query = "show me data where total > 5 since 2024-01-02"
+        expected = NLPProcessor().analyze_query(query)
+        with mock.patch.object(nlp_module, "_sre_parse", None):
+            self.assertEqual(_prefilter(r"show (me )?data"), (None, False))
+            self.assertEqual(NLPProcessor().analyze_query(query), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
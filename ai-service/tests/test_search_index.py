@@ -0,0 +1,32 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mia_models.nlp_processor import NLPProcessor
+
+
+class TestSmartSearchCells(unittest.TestCase):
+    def setUp(self):
+        self.nlp = NLPProcessor()
+        self.rows = [
+            {"a": 1, "tags": ["red", "blue"], "meta": None},
+            {"a": True, "tags": [], "meta": {"kind": "green"}},
+            {"a": 2, "tags": None, "meta": None},
+        ]
+
+    def _hits(self, query):
+        return [r["a"] for r in self.nlp.smart_search(query, self.rows)]
+
+    def test_list_and_dict_cells_are_searchable(self):
+        self.assertEqual(self._hits("blue"), [1])
+        self.assertEqual(self._hits("green"), [True])
+
+    def test_bool_and_int_cells_are_distinct(self):
+        self.assertEqual([type(a) for a in self._hits("true")], [bool])
+        self.assertEqual([type(a) for a in self._hits("1")], [int])
+
+
+if __name__ == "__main__":
+    unittest.main()
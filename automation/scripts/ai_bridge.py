@@ -4,8 +4,10 @@
 AI Bridge — gửi dữ liệu đã consolidate lên ai-service để phân tích.
 
 Đọc:
-  data/daily_revenue_YYYYMMDD.json   → POST /ai/analyze/trends + /ai/anomalies
-  data/orders_latest.csv             → POST /ai/sla/check (theo platform)
+  data/daily_revenue_YYYYMMDD.json   → POST /ai/analyze/batch
+                                       (fallback: /ai/analyze/trends + /ai/analyze/anomalies)
+  data/orders_latest.csv             → POST /ai/datasets (1 lần)
+                                       → POST /ai/sla/check (theo platform, dataset_id)
 
 Ghi:
   data/ai_analysis_YYYYMMDD.json     — kết quả phân tích từ ai-service
@@ -151,6 +153,68 @@ def detect_anomalies(ai_url, headers, daily_revenue):
         return {"error": str(e)}
 
 
+def analyze_revenue_batch(ai_url, headers, daily_revenue):
+    """POST /ai/analyze/batch — trends + anomalies trong 1 request.
+
+    Trả về (trends, anomalies) cùng shape với 2 endpoint riêng lẻ,
+    hoặc None nếu ai-service chưa có endpoint batch.
+    """
+    if not daily_revenue:
+        return None
+    payload = {
+        "data": [{"date": r["date"], "value": r["value"]} for r in daily_revenue],
+        "value_columns": ["value"],
+        "date_column": "date",
+        "analyses": ["trends", "anomalies"],
+    }
+    try:
+        resp = requests.post(
+            f"{ai_url}/ai/analyze/batch", json=payload, headers=headers, timeout=15
+        )
+        if resp.status_code == 404:
+            return None
+        result = resp.json()["results"]["value"]
+    except Exception as e:
+        logger.warning("analyze_batch failed, falling back to single calls: %s", e)
+        return None
+
+    trends = {"trend_analysis": result.get("trends", {})}
+    anomalies = {
+        "anomalies": result.get("anomalies", []),
+        "risk_level": result.get("risk_level"),
+        "count": result.get("count", 0),
+        "recommendations": result.get("recommendations", []),
+    }
+    logger.info(
+        "Batch: trend=%s | anomalies=%d | risk=%s",
+        trends["trend_analysis"].get("trend", "?"),
+        anomalies["count"],
+        anomalies["risk_level"],
+    )
+    return trends, anomalies
+
+
+def upload_orders_dataset(ai_url, headers, orders):
+    """POST /ai/datasets (dạng cột) — trả dataset_id, hoặc None nếu lỗi."""
+    columns = ["id", "platform", "status", "created_at"]
+    payload = {
+        "header": columns,
+        "column_values": [[o[c] for o in orders] for c in columns],
+        "name": "orders_latest",
+    }
+    try:
+        resp = requests.post(
+            f"{ai_url}/ai/datasets", json=payload, headers=headers, timeout=30
+        )
+        resp.raise_for_status()
+        dataset_id = resp.json()["dataset_id"]
+        logger.info("Orders dataset uploaded: %s (%d rows)", dataset_id, len(orders))
+        return dataset_id
+    except Exception as e:
+        logger.warning("Dataset upload failed (%s) — sending orders inline", e)
+        return None
+
+
 def check_sla_by_platform(ai_url, headers, orders):
     """POST /ai/sla/check cho từng platform trong dataset."""
     if not orders:
@@ -171,16 +235,25 @@ def check_sla_by_platform(ai_url, headers, orders):
             "created_at": o.get("date_str") or o.get("created_date") or "",
         })
 
+    # Upload một lần rồi check từng platform theo dataset_id
+    dataset_id = upload_orders_dataset(
+        ai_url, headers, [o for rows in by_platform.values() for o in rows]
+    )
+
     results = {}
     for platform, platform_orders in by_platform.items():
         if platform in ("unknown", "other") and len(platform_orders) > 50:
             # Too many unknowns — skip to avoid noisy alerts
             results[platform] = {"skipped": True, "reason": "platform unknown"}
             continue
+        if dataset_id:
+            payload = {"dataset_id": dataset_id, "platform": platform}
+        else:
+            payload = {"orders": platform_orders, "platform": platform}
         try:
             resp = requests.post(
                 f"{ai_url}/ai/sla/check",
-                json={"orders": platform_orders, "platform": platform},
+                json=payload,
                 headers=headers,
                 timeout=15,
             )
@@ -265,8 +338,12 @@ def run_analysis(ai_url=_DEFAULT_AI_URL, api_key=_DEFAULT_API_KEY, data_dir="dat
     }
 
     if daily_revenue:
-        results["trends"] = analyze_trends(ai_url, hdrs, daily_revenue)
-        results["anomalies"] = detect_anomalies(ai_url, hdrs, daily_revenue)
+        batch = analyze_revenue_batch(ai_url, hdrs, daily_revenue)
+        if batch:
+            results["trends"], results["anomalies"] = batch
+        else:
+            results["trends"] = analyze_trends(ai_url, hdrs, daily_revenue)
+            results["anomalies"] = detect_anomalies(ai_url, hdrs, daily_revenue)
 
     if orders:
         results["sla"] = check_sla_by_platform(ai_url, hdrs, orders)
@@ -252,6 +252,15 @@ class AIService {
     }
   }
 
+  /** Parse nhiều câu hỏi trong 1 request (saved queries) — kết quả theo đúng thứ tự. */
+  async chatBatch(queries, context = {}) {
+    const result = await fetchJson("/ai/chat/batch", {
+      method: "POST",
+      body: JSON.stringify({ queries, context }),
+    });
+    return result?.results || [];
+  }
+
   async analyzeSheets(sheetData) {
     return fetchJson("/ai/summary", {
       method: "POST",
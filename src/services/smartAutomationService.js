@@ -63,21 +63,33 @@ class SmartAutomationService {
   }
 
   /**
-   * Backend chỉ có categorize/column — gắn _categories cho từng row từ meta cột.
+   * Profile mọi cột của bảng trong 1 request (server sample + cache).
+   * `table`: mảng rows hoặc grid Google Sheets (hàng đầu = header).
+   */
+  async categorizeColumns(table, { columns = null, sampleSize = null } = {}) {
+    const isGrid = Array.isArray(table?.[0]);
+    return postLegacy("/api/ml/legacy/categorize/columns", {
+      ...(isGrid ? { sheet_values: table } : { data: table || [] }),
+      columns,
+      sample_size: sampleSize,
+    });
+  }
+
+  /**
+   * Gắn _categories cho từng row từ meta cột (1 request categorize/columns cho cả bảng).
    */
   async categorizeRows(data, categoryRules = null) {
     if (!data?.length) return [];
     const keys = Object.keys(data[0]).filter((k) => !k.startsWith("_"));
     const columnMeta = {};
-    for (const key of keys) {
-      const samples = data
-        .slice(0, 25)
-        .map((row) => row[key])
-        .filter((v) => v !== undefined && v !== null);
-      try {
-        columnMeta[key] = await this.categorizeColumn(key, samples);
-      } catch (e) {
-        console.warn("categorizeColumn", key, e.message);
+    try {
+      const profile = await this.categorizeColumns(data, { columns: keys });
+      for (const meta of profile?.columns || []) {
+        columnMeta[meta.column] = meta;
+      }
+    } catch (e) {
+      console.warn("categorizeColumns", e.message);
+      for (const key of keys) {
         columnMeta[key] = { category: "other", confidence: 0.5 };
       }
     }